@@ -1,22 +1,33 @@
+import time
+# 起動時間の計測の基準（このモジュールの読み込み開始時刻）
+_STARTED = time.perf_counter()
 import os
 import tkinter as tk
-from tkinter import filedialog, ttk, scrolledtext
-from mutagen import File as MutagenFile
-import threading, traceback
-
-# --- get_credit.py 相当 ---
-import re, html, requests
-from mutagen.id3 import ID3, ID3NoHeaderError, TXXX, TCOM, COMM, TDRC
-from mutagen.flac import FLAC
-from mutagen.mp4 import MP4, MP4Tags, MP4FreeForm
-
-# FLAC 用の一時保持キャッシュ
-flac_pending = {}
-
-USER_AGENT = "PythonTagEnricher/1.0"
-HEADERS = {"User-Agent": USER_AGENT}
-SEARCH_URL = "https://www.uta-net.com/search/?Aselect=2&Keyword={}"
-SONG_PAGE_URL = "https://www.uta-net.com/song/{}/"
+from tkinter import filedialog, scrolledtext
+import importlib, json, threading, traceback
+
+# --- get_credit.py 相当（取得・タグ読み書きは credit_core に分離） ---
+from credit_core import (
+    read_tag_row, run_enrichment, default_options, new_batch_resolver, DEFAULT_B_TEMPLATE,
+    SOURCE_NETWORK, SOURCE_LOCAL_FIRST, SOURCE_LOCAL_ONLY,
+)
+from credit_store import get_credit_store, format_store_stats
+from batch_resolver import format_batch_stats
+from change_plan import plan_record, load_plan, apply_plan
+from run_journal import open_run_journal, format_journal_skip, WATCH_PATH
+from lookup_cache import get_lookup_cache, format_cache_stats
+from library_scanner import LibraryScanner, DEFAULT_SCAN_WORKERS
+from library_index import get_library_index
+from ui_queue import UIUpdateQueue
+from track_table import VirtualTrackTable
+from enrich_engine import format_progress, DEFAULT_CONCURRENCY, MAX_CONCURRENCY
+from cancel_token import CancelToken
+from folder_watcher import FolderWatcher, watch
+from metrics import get_metrics, timed, format_metrics, DEFAULT_JSON_PATH as METRICS_JSON_PATH, \
+    DEFAULT_PROM_PATH as METRICS_PROM_PATH
+
+# ウィンドウを表示してから裏で読み込んでおくモジュール（mutagen と requests は読み込みに時間がかかる）
+PRELOAD_MODULES = ("mutagen.id3", "mutagen.flac", "mutagen.mp4", "http_client")
 
 
 class Tooltip:
@@ -100,343 +111,18 @@ class Tooltip:
                 pass
             self.tipwindow = None
 
-def build_integrated_composer(ext, info):
-    composer = info.get("composer", "").strip()
-    if ext == ".m4a":
-        remixer = info.get("arranger", "").strip()
-        if remixer == composer:
-            return composer
-        elif remixer:
-            return f"{composer} / {remixer}"
-        return composer
-    elif ext == ".flac":
-        lyricist = info.get("lyricist", "").strip()
-        if lyricist == composer:
-            return composer
-        elif lyricist:
-            return f"{lyricist} / {composer}"
-        return composer
-    return composer
-
-def build_composer_tag(lyricist=None, composer=None, arranger=None):
-    parts = []
-    if lyricist:
-        parts.append(f'作詞="{lyricist}"')
-    if composer:
-        parts.append(f'作曲="{composer}"')
-    if arranger:
-        parts.append(f'編曲="{arranger}"')
-    return " ".join(parts)
-
-def normalize(s):
-    if not s:
-        return ""
-    # CV表記削除
-    t = re.sub(r'\s*\(CV[:\s][^\)]+\)', '', s)
-    # 全角スペースを半角に統一
-    t = t.replace("　", " ")
-    # スペースはすべて削除
-    t = re.sub(r"\s+", "", t)
-    # 小文字化
-    return t.strip().lower()
-
-def get_uta_net_song_id(title, artist):
-    q = requests.utils.quote(title)
-    search_url = SEARCH_URL.format(q)
-    try:
-        resp = requests.get(search_url, headers=HEADERS, timeout=10)
-        resp.raise_for_status()
-    except Exception as e:
-        return None, f"検索ページ取得エラー: {e}"
-
-    html_text = resp.text
-    pattern = re.compile(
-        r'(?si)<tr[^>]*class="border-bottom"[^>]*>.*?'
-        r'/song/(\d+)/".*?songlist-title[^>]*>([^<]+)</span>.*?'
-        r'/artist/\d+/"[^>]*>([^<]+)</a>',
-        re.DOTALL
-    )
-    matches = pattern.findall(html_text)
-    if not matches:
-        return None, "候補が見つかりませんでした。"
-
-    candidates = [{"Id": int(m[0]), "Title": m[1].strip(), "Artist": m[2].strip()} for m in matches]
-    ntitle = normalize(title)
-    nartist = normalize(artist)
-    pref = nartist[:3] if len(nartist) >= 3 else nartist
-
-    # タイトル一致条件
-    exact = [c for c in candidates if normalize(c["Title"]) == ntitle]
-    front_match = [c for c in candidates if normalize(c["Title"]).startswith(ntitle)]
-    partial = [c for c in candidates if ntitle in normalize(c["Title"])]
-
-    # --- 修正ポイント ---
-    # 「or」ではなく合体させることで全候補を対象にする
-    stage1 = []
-    stage1.extend(exact)
-    stage1.extend(front_match)
-    stage1.extend(partial)
-
-    if not stage1:
-        return None, "候補が見つかりませんでした。"
-
-    # --- アーティスト名の先頭2文字が一致するもののみを選択 ---
-    by_artist = [c for c in stage1 if normalize(c["Artist"]).startswith(pref)]
-    if by_artist:
-        return by_artist[0]["Id"], None
-
-    # 一致しなければスキップ
-    return None, f"アーティスト名の先頭2文字が一致する候補が見つかりませんでした。{matches}"
-
-
-def get_song_page_info(song_id):
-    url = SONG_PAGE_URL.format(song_id)
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        resp.raise_for_status()
-    except Exception as e:
-        return None, f"曲ページ取得エラー: {e}"
-
-    html_text = resp.text
-    info = {"anime": "", "lyricist": "", "composer": "", "arranger": ""}
-
-    # アニメ情報
-    p_anime = re.search(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+mb-0[^"]*"[^>]*>(.*?)</p>', html_text)
-    if p_anime:
-        anime = re.sub(r'\s+', ' ', html.unescape(p_anime.group(1))).strip()
-        info["anime"] = anime
-
-    # 詳細情報 (作詞・作曲・編曲)
-    p_detail = re.search(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+detail\s+mb-0[^"]*"[^>]*>(.*?)</p>', html_text)
-    if p_detail:
-        text = re.sub(r'<[^>]+>', ' ', p_detail.group(1))
-        text = re.sub(r'\s+', ' ', html.unescape(text)).strip()
-
-    # 作詞
-    m = re.search(r'作詞：\s*(.+?)(?=\s*(作曲：|編曲：|発売日：|$))', text)
-    if m:
-        info["lyricist"] = m.group(1).strip()
-
-    # 作曲
-    m2 = re.search(r'作曲：\s*(.+?)(?=\s*(作詞：|編曲：|発売日：|$))', text)
-    if m2:
-        info["composer"] = m2.group(1).strip()
-
-    # 編曲
-    m3 = re.search(r'編曲：\s*(.+?)(?=\s*(作詞：|作曲：|発売日：|$))', text)
-    if m3:
-        info["arranger"] = m3.group(1).strip()
-    
-    # 発売日
-    m4 = re.search(r'発売日：\s*([0-9]{4})/([0-9]{2})/([0-9]{2})', text)
-    if m4:
-        info["release_date"] = m4.group(0).replace("発売日：", "").strip()
-        info["year"] = m4.group(1)
-    else:
-        info["release_date"] = ""
-        info["year"] = ""
-
-    msg = f"取得結果 → アニメ='{info['anime']}', 作詞='{info['lyricist']}', 作曲='{info['composer']}', 編曲='{info['arranger']}'"
-    if not info["anime"]:
-        msg = "タイアップ情報が見つかりませんでした。 " + msg
-    return info, msg
-
-
-
-
-def set_credit_tag(filepath, role, value, force_overwrite=False):
-    """
-    role: "作詞者" / "作曲者" / "コメント" / "リミキサー" / "発売年"
-    value: 書き込みたい値
-    force_overwrite: True の場合、既存値があっても強制的に上書きする
-    """
-    if not value:
-        return f"[{os.path.basename(filepath)}] {role} の値なし → スキップ"
-
-    ext = os.path.splitext(filepath)[1].lower()
-    updated = False
-    msg = ""
-
-    try:
-        if ext == ".mp3":
-            try:
-                id3 = ID3(filepath)
-            except ID3NoHeaderError:
-                id3 = ID3()
-                msg += "ID3ヘッダなし → 新規作成; "
-
-            if role == "作詞者":
-                frames = id3.getall("TXXX:LYRICIST")
-                existing = frames[0].text[0] if frames and frames[0].text else ""
-                if force_overwrite or existing in ("", "0"):
-                    id3.delall("TXXX:LYRICIST")
-                    id3.add(TXXX(encoding=3, desc="LYRICIST", text=[value]))
-                    updated = True
-                    msg = f"作詞者 上書き (既存='{existing}') → '{value}'"
-                else:
-                    msg = f"作詞者 既存='{existing}' → スキップ"
-
-            elif role == "作曲者":
-                existing = id3.getall("TCOM")[0].text[0] if id3.getall("TCOM") and id3.getall("TCOM")[0].text else ""
-                if force_overwrite or existing in ("", "0"):
-                    id3.delall("TCOM")
-                    id3.add(TCOM(encoding=3, text=[value]))
-                    updated = True
-                    msg = f"作曲者 上書き (既存='{existing}') → '{value}'"
-                else:
-                    msg = f"作曲者 既存='{existing}' → スキップ"
-
-            elif role == "コメント":
-                comms = [c for c in id3.getall("COMM") if c.lang == "eng" and c.desc == ""]
-                if not comms:
-                    id3.add(COMM(encoding=3, lang="eng", desc="", text=[value]))
-                    updated = True
-                    msg = f"コメント 新規書き込み → '{value}'"
-                else:
-                    existing = " ".join(str(t) for t in comms[0].text if t).strip()
-                    if force_overwrite or existing in ("", "0"):
-                        comms[0].encoding = 3
-                        comms[0].text = [value]
-                        updated = True
-                        msg = f"コメント 上書き (既存='{existing}') → '{value}'"
-                    else:
-                        msg = f"コメント 既存='{existing}' → スキップ"
-
-            elif role == "リミキサー":
-                frames = id3.getall("TXXX:MIXARTIST")
-                existing = frames[0].text[0] if frames and frames[0].text else ""
-                if force_overwrite or existing in ("", "0"):
-                    id3.delall("TXXX:MIXARTIST")
-                    id3.add(TXXX(encoding=3, desc="MIXARTIST", text=[value]))
-                    updated = True
-                    msg = f"リミキサー 上書き (既存='{existing}') → '{value}'"
-                else:
-                    msg = f"リミキサー 既存='{existing}' → スキップ"
-
-            elif role == "発売年":
-                # TDRC フレームで扱う（ID3v2.3/2.4 の Year/Recording time）
-                existing = id3.getall("TDRC")[0].text[0] if id3.getall("TDRC") and id3.getall("TDRC")[0].text else ""
-                if force_overwrite or existing in ("", "0"):
-                    # 既存の TDRC を削除して新規追加
-                    id3.delall("TDRC")
-                    id3.add(TDRC(encoding=3, text=[value]))
-                    updated = True
-                    msg = f"発売年 上書き (既存='{existing}') → '{value}'"
-                else:
-                    msg = f"発売年 既存='{existing}' → スキップ"
-
-            id3.save(filepath, v2_version=3)
-
-        elif ext == ".flac":
-            flac = FLAC(filepath)
-
-            if role == "作詞者":
-                None
-            elif role == "作曲者":
-                existing = flac.get("COMPOSER", [""])[0] if "COMPOSER" in flac else ""
-                if force_overwrite or not existing:
-                    flac["COMPOSER"] = value
-                    updated = True
-                    msg = f"作曲者 書き込み → '{value}'"
-                else:
-                    msg = f"作曲者 既存='{existing}' → スキップ"
-
-            elif role == "コメント":
-                existing = flac.get("COMMENT", [""])[0] if "COMMENT" in flac else ""
-                if force_overwrite or not existing:
-                    flac["COMMENT"] = value
-                    updated = True
-                    msg = f"コメント 書き込み → '{value}'"
-                else:
-                    msg = f"コメント 既存='{existing}' → スキップ"
-
-            elif role == "リミキサー":
-                existing = flac.get("MIXARTIST", [""])[0] if "MIXARTIST" in flac else ""
-                if force_overwrite or not existing:
-                    flac["MIXARTIST"] = value
-                    updated = True
-                    msg = f"リミキサー 書き込み → '{value}'"
-                else:
-                    msg = f"リミキサー 既存='{existing}' → スキップ"
-
-            elif role == "発売年":
-                existing = flac.get("DATE", [""])[0] if "DATE" in flac else ""
-                if force_overwrite or not existing:
-                    flac["DATE"] = value
-                    updated = True
-                    msg = f"発売年 書き込み → '{value}'"
-                else:
-                    msg = f"発売年 既存='{existing}' → スキップ"
-
-            flac.save()
-
-        elif ext == ".m4a":
-            mp4 = MP4(filepath)
-            tags = mp4.tags or MP4Tags()
-
-            if role == "作詞者":
-                existing = tags.get("©lyr", [""])[0] if "©lyr" in tags else ""
-                if force_overwrite or existing in ("", "0"):
-                    tags["©lyr"] = [value]
-                    updated = True
-                    msg = f"作詞者 書き込み → '{value}'"
-                else:
-                    msg = f"作詞者 既存='{existing}' → スキップ"
-
-            elif role == "作曲者":
-                existing = tags.get("©wrt", [""])[0] if "©wrt" in tags else ""
-                if force_overwrite or existing in ("", "0"):
-                    tags["©wrt"] = [value]
-                    updated = True
-                    msg = f"作曲者 書き込み → '{value}'"
-                else:
-                    msg = f"作曲者 既存='{existing}' → スキップ"
-
-            elif role == "コメント":
-                existing = tags.get("©cmt", [""])[0] if "©cmt" in tags else ""
-                if force_overwrite or existing in ("", "0"):
-                    tags["©cmt"] = [value]
-                    updated = True
-                    msg = f"コメント 書き込み → '{value}'"
-                else:
-                    msg = f"コメント 既存='{existing}' → スキップ"
-
-            elif role == "リミキサー":
-                None
-
-            elif role == "発売年":
-                existing = tags.get("©day", [""])[0] if "©day" in tags else ""
-                if force_overwrite or existing in ("", "0"):
-                    tags["©day"] = [value]
-                    updated = True
-                    msg = f"発売年 書き込み → '{value}'"
-                else:
-                    msg = f"発売年 既存='{existing}' → スキップ"
-
-            mp4.tags = tags
-            mp4.save()
-
-        else:
-            msg = f"未対応フォーマット '{ext}'"
-
-    except Exception as e:
-        msg = f"{role} 書き込み中エラー: {e}"
-
-    return f"[{os.path.basename(filepath)}] {msg}"
-
-
-
-
 # --- GUI 部分 ---
 class AudioTagGUI:
     def show_credits(self):
-        """クレジットウィンドウ（モーダル風）"""
-        try:
-            if hasattr(self, "_credits_win") and self._credits_win.winfo_exists():
-                self._credits_win.lift()
-                return
-        except Exception:
-            pass
+        """クレジットウィンドウ（モーダル風）。初回に作ったウィンドウを閉じるときは隠し、次からはそれを表示する"""
+        win = getattr(self, "_credits_win", None)
+        if win is not None and win.winfo_exists():
+            if win.state() == "withdrawn":
+                win.deiconify()
+                win.grab_set()
+                self._credits_close_btn.focus_set()
+            win.lift()
+            return
 
         win = tk.Toplevel(self.root)
         self._credits_win = win
@@ -543,10 +229,12 @@ class AudioTagGUI:
                 win.grab_release()
             except Exception:
                 pass
-            win.destroy()
+            win.withdraw()
 
         btn_close = tk.Button(btns, text="閉じる", command=_close)
         btn_close.pack(side="right", padx=(6,0))
+        self._credits_close_btn = btn_close
+        win.protocol("WM_DELETE_WINDOW", _close)
 
         # 任意: 寄付ボタン（外部リンクを開く場合は webbrowser.open を使う）
         # import webbrowser
@@ -565,6 +253,12 @@ class AudioTagGUI:
         self.root.title("あんたの音源、勝手にタグ書い太郎")
         self.file_list = []
         self.stop_flag = False  # 中断フラグ追加
+        self._cancel = None  # 実行中の run_action の CancelToken
+        self._stop_requested_at = None
+        self.busy = False  # スキャン・実行中は並べ替えを無効にする
+        self.scan_workers = DEFAULT_SCAN_WORKERS
+        self._scan_gen = 0
+        self._sort_state = (None, False)
 
         # フォルダパス表示バー
         frame_path = tk.Frame(root)
@@ -579,8 +273,23 @@ class AudioTagGUI:
         frame_top.pack(fill=tk.X, padx=5, pady=5)
         self.btn_run = tk.Button(frame_top, text="実行", command=self.start_process)
         self.btn_run.pack(side=tk.LEFT, padx=5)
+        # 前回完了済みで変更のないファイルを飛ばして続ける
+        self.btn_resume = tk.Button(frame_top, text="続きから実行",
+                                    command=lambda: self.start_process(lambda: self.run_action(resume=True)))
+        self.btn_resume.pack(side=tk.LEFT, padx=5)
         self.btn_stop = tk.Button(frame_top, text="中断", command=self.stop_process, state="disabled")
         self.btn_stop.pack(side=tk.LEFT, padx=5)
+        # フォルダを監視し、追加・変更されたファイルだけを処理し続ける（中断ボタンで終了）
+        self.btn_watch = tk.Button(frame_top, text="フォルダを監視", command=self.start_watch)
+        self.btn_watch.pack(side=tk.LEFT, padx=5)
+        # 書き込まずに変更予定を JSONL に書き出す / 確認したプランを書き込む
+        self.btn_plan = tk.Button(frame_top, text="変更プランを作成...", command=self.start_plan)
+        self.btn_plan.pack(side=tk.LEFT, padx=5)
+        self.btn_apply = tk.Button(frame_top, text="プランを適用...", command=self.start_apply)
+        self.btn_apply.pack(side=tk.LEFT, padx=5)
+        # CSV / JSONL の曲情報をローカルのストアに取り込む（取得元で「取り込んだ曲情報」を選ぶと使われる）
+        self.btn_import = tk.Button(frame_top, text="曲情報を取り込む...", command=self.start_import)
+        self.btn_import.pack(side=tk.LEFT, padx=5)
         # クレジットボタン（frame_top に右寄せで配置）
         self.btn_credits = tk.Button(frame_top, text="クレジット", command=self.show_credits)
         self.btn_credits.pack(side=tk.RIGHT, padx=5)
@@ -592,8 +301,7 @@ class AudioTagGUI:
         self.frame_mode = tk.Frame(root)
         self.frame_mode.pack(fill=tk.X, padx=5, pady=2)
         self.write_mode = tk.StringVar(value="A")  # デフォルトはタイプA
-        default_fmt = '作詞="{lyricist}" 作曲="{composer}" 編曲="{arranger}"'
-        self.b_template_var = tk.StringVar(value=default_fmt)
+        self.b_template_var = tk.StringVar(value=DEFAULT_B_TEMPLATE)
         self.lbl_bfmt = tk.Label(self.frame_mode, text="作曲者タグへの書き込み書式テンプレート:")
         self.entry_bfmt = tk.Entry(self.frame_mode, textvariable=self.b_template_var, width=70)
         # pack だけ作るが、最初は呼び出さず隠しておく
@@ -656,33 +364,147 @@ class AudioTagGUI:
         for label, var in self.overwrite_flags.items():
             tk.Checkbutton(self.frame_overwrite, text=label, variable=var).pack(side=tk.LEFT)
 
+        # キャッシュを読まずに uta-net から取り直す（取得結果はキャッシュに保存される）
+        self.bypass_cache = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.frame_overwrite, text="キャッシュを使わずに再取得", variable=self.bypass_cache).pack(side=tk.RIGHT)
+
+        # 同じアーティストの曲は歌手ページの曲一覧から選び、曲ごとの検索を減らす
+        self.batch_by_artist = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.frame_overwrite, text="アーティスト単位でまとめて検索", variable=self.batch_by_artist).pack(side=tk.RIGHT)
+
+        # 同時に問い合わせるファイル数（uta-net への頻度は http_client 側で制限される）
+        self.concurrency_var = tk.StringVar(value=str(DEFAULT_CONCURRENCY))
+        tk.Spinbox(self.frame_overwrite, from_=1, to=MAX_CONCURRENCY, width=3, textvariable=self.concurrency_var).pack(side=tk.RIGHT)
+        tk.Label(self.frame_overwrite, text="同時処理数:").pack(side=tk.RIGHT, padx=(10,0))
+
+        # 曲情報の取得元（取り込んだ曲情報を使うと、見つかった曲は通信しない）
+        self.source_labels = {
+            "uta-net": SOURCE_NETWORK,
+            "取り込んだ曲情報 → uta-net": SOURCE_LOCAL_FIRST,
+            "取り込んだ曲情報のみ": SOURCE_LOCAL_ONLY,
+        }
+        self.source_var = tk.StringVar(value="uta-net")
+        tk.OptionMenu(self.frame_overwrite, self.source_var, *self.source_labels).pack(side=tk.RIGHT)
+        tk.Label(self.frame_overwrite, text="取得元:").pack(side=tk.RIGHT, padx=(10,0))
+
         frame_mid = tk.Frame(root)
         frame_mid.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         columns = ("タイトル", "アーティスト", "コメント", "作詞者", "作曲者", "リミキサー", "発売年", "サイズ")
-        self.tree = ttk.Treeview(frame_mid, columns=columns, show="headings")
-
-        for col in columns:
-            self.tree.heading(col, text=col)
-            self.tree.column(col, width=150, anchor=tk.W)
-
-        # スクロールバー追加
-        scrollbar = ttk.Scrollbar(frame_mid, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.columns = columns
+        # 行データはメモリ上に持ち、Treeview には見えている行だけを置く（スクロールバー込み）
+        self.table = VirtualTrackTable(frame_mid, columns, heading_command=self.sort_by_column)
+        self.table.pack(fill=tk.BOTH, expand=True)
+
+        # 処理ごとの件数・所要時間（実行中も定期的に更新する）
+        frame_stats = tk.LabelFrame(root, text="処理時間の統計")
+        frame_stats.pack(fill=tk.X, padx=5, pady=2)
+        self.stats_label = tk.Label(frame_stats, text="", font="TkFixedFont", justify=tk.LEFT, anchor="w")
+        self.stats_label.pack(fill=tk.X)
+        self._stats_version = None
 
         frame_bottom = tk.Frame(root)
         frame_bottom.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.log = scrolledtext.ScrolledText(frame_bottom, height=10, state="disabled")
         self.log.pack(fill=tk.BOTH, expand=True)
 
+        # ワーカースレッドからの UI 更新はこのキュー経由でメインスレッドがまとめて反映する
+        self.ui = UIUpdateQueue(root, {
+            "log": self._ui_log,
+            "insert": self._ui_insert,
+            "update": self._ui_update,
+            "progress": self._ui_progress,
+            "call": self._ui_call,
+        }, on_error=self._ui_error)
+        self.ui.start()
+        self._refresh_stats()
+
+        # 起動時間（画面表示まで・モジュールの読み込み完了まで、秒）。表示されたら計測する
+        self.startup = {}
+        self._map_binding = root.bind("<Map>", self._on_first_map, add="+")
+
+    def _on_first_map(self, event):
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>", self._map_binding)
+        # 表示したウィンドウの描画は idle で行われるので、その後で計測する
+        self.root.after_idle(self._on_first_paint)
+
+    def _on_first_paint(self):
+        elapsed = time.perf_counter() - _STARTED
+        self.startup["first_paint"] = elapsed
+        get_metrics().observe("startup", elapsed)
+        self.log_message(f"起動: 画面表示まで {elapsed * 1000:.0f} ms")
+        threading.Thread(target=self._preload, daemon=True).start()
+
+    def _preload(self):
+        """取得・タグの読み書きに使うモジュールを裏で読み込み、最初の実行を待たせない"""
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                self.log_message(f"モジュールを読み込めません: {e}")
+        elapsed = time.perf_counter() - _STARTED
+        self.startup["preload"] = elapsed
+        self.log_message(f"起動: モジュールの読み込み完了まで {elapsed * 1000:.0f} ms")
+
+    # ログ欄に残す最大行数（超えた分は古い行から削除する）
+    MAX_LOG_LINES = 20000
+
     def log_message(self, msg):
+        """どのスレッドから呼んでもよい。実際の追記はメインスレッドでまとめて行う"""
+        self.ui.put("log", msg)
+
+    # --- UIUpdateQueue のハンドラ（メインスレッドで実行される） ---
+
+    def _ui_log(self, batch):
         self.log.config(state="normal")
-        self.log.insert(tk.END, msg + "\n")
+        self.log.insert(tk.END, "\n".join(msg for (msg,) in batch) + "\n")
+        lines = int(self.log.index("end-1c").split(".")[0])
+        if lines > self.MAX_LOG_LINES:
+            self.log.delete("1.0", f"{lines - self.MAX_LOG_LINES + 1}.0")
         self.log.see(tk.END)
         self.log.config(state="disabled")
 
+    def _ui_error(self, kind, text):
+        """UI 更新の失敗をログ欄に出す（ログ欄への追記自体が失敗した場合は UIUpdateQueue が logging に出す）"""
+        self._ui_log([(f"画面の更新に失敗しました（{kind}）:\n{text}",)])
+
+    def _ui_insert(self, batch):
+        # 古いスキャンの行は捨てる
+        with timed("tree_refresh"):
+            self.table.append_rows([(iid, values) for gen, iid, values in batch if gen == self._scan_gen])
+
+    def _ui_update(self, batch):
+        # 同じ行への更新が続いた場合は最後の値だけ反映する
+        with timed("tree_refresh"):
+            for iid, values in dict(batch).items():
+                self.table.update_row(iid, values)
+
+    def _ui_progress(self, batch):
+        self.progress_label.config(text=batch[-1][0])
+
+    def _ui_call(self, batch):
+        for (fn,) in batch:
+            fn()
+
+    STATS_INTERVAL_MS = 1000
+
+    def _refresh_stats(self):
+        """統計欄を更新する（計測値が変わったときだけ描き直す）"""
+        metrics = get_metrics()
+        if metrics.version != self._stats_version:
+            self._stats_version = metrics.version
+            self.stats_label.config(text="\n".join(format_metrics(metrics.snapshot())))
+        self.root.after(self.STATS_INTERVAL_MS, self._refresh_stats)
+
+    def _export_metrics(self):
+        """実行の終わりに計測値を JSON と Prometheus の textfile に書き出す"""
+        try:
+            get_metrics().export(METRICS_JSON_PATH, METRICS_PROM_PATH)
+        except OSError as e:
+            self.log_message(f"計測値を書き出せません: {e}")
+
     def select_folder(self):
         folder = filedialog.askdirectory(mustexist=True)
         if not folder:
@@ -692,106 +514,146 @@ class AudioTagGUI:
         self.load_files(folder)
 
     def load_files(self, folder):
-        def task():
-            self.file_list = []
-            self.tree.delete(*self.tree.get_children())
-            exts = (".mp3", ".flac", ".m4a")
-
-            all_files = [os.path.join(root, f)
-                        for root, _, files in os.walk(folder)
-                        for f in files if f.lower().endswith(exts)]
-            total = len(all_files)
+        # 前回のスキャンが残っていれば、その結果は捨てる
+        self._scan_gen += 1
+        gen = self._scan_gen
+        self.file_list = []
+        self.table.clear()
+        self.busy = True
+        get_metrics().reset()
+
+        index = get_library_index()
+        known = {}
+        fresh = []
+        reused = [0]
+
+        def cached(filepath, size, mtime):
+            # サイズと更新時刻が前回と同じならタグを読み直さない
+            entry = known.get(os.path.abspath(filepath))
+            if entry and entry[0] == size and entry[1] == mtime:
+                reused[0] += 1
+                return entry[2]
+            return None
+
+        def read_fn(filepath, size, mtime):
+            tags = self.read_tags(filepath, size=size)
+            # 読み取りに失敗した行（サイズ列が空）は登録せず、次回も読み直す
+            if tags[7]:
+                fresh.append((filepath, size, mtime, tags))
+            return tags
 
-            for idx, filepath in enumerate(all_files, 1):
-                self.file_list.append(filepath)
-                tags = self.read_tags(filepath)
+        def task():
+            started = time.perf_counter()
+            if index:
+                known.update(index.load_folder(folder))
+            scanner = LibraryScanner(read_fn, workers=self.scan_workers,
+                                     should_stop=lambda: gen != self._scan_gen, cached=cached)
+            file_list = []
+            for idx, (filepath, tags) in enumerate(scanner.scan(folder), 1):
+                file_list.append(filepath)
+
+                # TreeView更新はUIスレッドでまとめて（発見順に挿入する）
+                self.ui.put("insert", gen, filepath, tags)
+
+                # 進捗ラベルもUIスレッドで更新（最新の値だけが反映される）
+                if idx % 20 == 0:
+                    self.ui.put("progress", f"{idx} 件 読み込み中...")
+
+            if index:
+                index.put_many(fresh)
+            if gen != self._scan_gen:
+                return
+            get_metrics().observe("scan", time.perf_counter() - started)
+            self.file_list = file_list
+            total = len(file_list)
+            if index:
+                removed = index.prune(folder, file_list)
+                self.log_message(
+                    f"インデックス: 再利用 {reused[0]} 件 / 読み込み {len(fresh)} 件 / 削除 {removed} 件")
+
+            def _finish():
+                self.busy = False
+                self.progress_label.config(text=f"{total} 件のファイルを読み込みました")
+            self.ui.put("call", _finish)
 
-                # TreeView更新はUIスレッドで
-                self.root.after(0, lambda tags=tags: self.tree.insert("", tk.END, values=tags))
+        threading.Thread(target=task, daemon=True).start()
 
-                # 進捗ラベルをUIスレッドで更新
-                if idx % 20 == 0 or idx == total:
-                    self.root.after(0, lambda i=idx: self.progress_label.config(
-                        text=f"{i}/{total} 件 読み込み完了"))
+    def sort_by_column(self, col):
+        """列見出しクリックで並べ替える（スキャン・実行中は無効）。file_list も同じ順に揃える"""
+        if self.busy:
+            return
+        descending = self._sort_state == (col, False)
+        self._sort_state = (col, descending)
+        index = self.columns.index(col)
 
-            self.root.after(0, lambda: self.progress_label.config(
-                text=f"{total} 件のファイルを読み込みました"))
+        def key(values):
+            value = str(values[index])
+            if col == "サイズ":
+                try:
+                    return (0, float(value.split()[0]), "")
+                except (ValueError, IndexError):
+                    return (1, 0.0, value)
+            return (0, 0.0, value.lower())
 
-        threading.Thread(target=task, daemon=True).start()
+        self.table.sort(key, reverse=descending)
+        self.file_list = self.table.ids()
 
-    def read_tags(self, filepath):
-        try:
-            ext = os.path.splitext(filepath)[1].lower()
-            audio = MutagenFile(filepath, easy=True)
-            title, artist, comment, lyricist, composer, remixer, year = "", "", "", "", "", "", ""
-
-            if not audio:
-                return [os.path.basename(filepath), "", "", "", "", "", "", ""]
-
-            if ext == ".mp3":
-                id3 = ID3(filepath)
-                title = audio.get("title", [""])[0]
-                artist = audio.get("artist", [""])[0]
-                comment = ""
-                comms = [c for c in id3.getall("COMM") if c.lang == "eng" and c.desc == ""]
-                if comms and comms[0].text:
-                    comment = " ".join(str(t) for t in comms[0].text if t).strip()
-                lyricist = ""
-                frames = id3.getall("TXXX:LYRICIST")
-                if frames and frames[0].text:
-                    lyricist = frames[0].text[0]
-                composer = id3.getall("TCOM")[0].text[0] if id3.getall("TCOM") else ""
-                frames = id3.getall("TXXX:MIXARTIST")
-                if frames and frames[0].text:
-                    remixer = frames[0].text[0]
-                # 発売年
-                yframes = id3.getall("TDRC")
-                if yframes and yframes[0].text:
-                    year = yframes[0].text[0]
-
-            elif ext == ".flac":
-                flac = FLAC(filepath)
-                title = flac.get("TITLE", [""])[0]
-                artist = flac.get("ARTIST", [""])[0]
-                comment = flac.get("COMMENT", [""])[0] if "COMMENT" in flac else ""
-                lyricist = flac.get("LYRICIST", [""])[0] if "LYRICIST" in flac else ""
-                composer = flac.get("COMPOSER", [""])[0] if "COMPOSER" in flac else ""
-                remixer = flac.get("MIXARTIST", [""])[0] if "MIXARTIST" in flac else ""
-                year = flac.get("DATE", [""])[0] if "DATE" in flac else ""
-
-            elif ext == ".m4a":
-                mp4 = MP4(filepath)
-                title = mp4.tags.get("©nam", [""])[0] if "©nam" in mp4.tags else ""
-                artist = mp4.tags.get("©ART", [""])[0] if "©ART" in mp4.tags else ""
-                comment = mp4.tags.get("©cmt", [""])[0] if "©cmt" in mp4.tags else ""
-                lyricist = mp4.tags.get("©lyr", [""])[0] if "©lyr" in mp4.tags else ""
-                composer = mp4.tags.get("©wrt", [""])[0] if "©wrt" in mp4.tags else ""
-                remixer = ""  # m4a 非対応
-                year = mp4.tags.get("©day", [""])[0] if "©day" in mp4.tags else ""
-
-            size = f"{os.path.getsize(filepath)/1024:.1f} KB"
-            self.log_message(
-                f"title:{title} artist:{artist} year:{year} comment:{comment} lyricist:{lyricist} composer:{composer} size:{size}"
-            )
-            return [title, artist, comment, lyricist, composer, remixer, year, size]
-
-        except Exception:
-            self.log_message(f"タグ読み取りエラー: {filepath} → {traceback.format_exc()}")
-            return [os.path.basename(filepath), "", "", "", "", "", "", ""]
+    def read_tags(self, filepath, log=None, size=None):
+        return read_tag_row(filepath, log=log or self.log_message, size=size)
 
     def stop_process(self):
-        """中断ボタン押下時にフラグをセット"""
+        """中断ボタン押下時にフラグをセットし、通信中のリクエストを打ち切る（書き込み中のファイルは最後まで処理する）"""
+        self._stop_requested_at = time.monotonic()
         self.stop_flag = True
+        if self._cancel:
+            self._cancel.cancel()
         self.log_message("処理中断要求を受け付けました。")
 
-    def start_process(self):
+    def _log_stopped(self):
+        """中断ボタンを押してから処理が止まるまでの時間をログに出す"""
+        latency = time.monotonic() - self._stop_requested_at
+        get_metrics().observe("stop", latency)
+        self.log_message(f"処理を中断しました。（中断要求から停止まで {latency * 1000:.0f} ms）")
+
+    def start_process(self, action=None):
+        folder = self.entry_path.get().strip()
+        if not folder or not os.path.isdir(folder):
+            self.log_message("有効なフォルダを指定してください。")
+            return
+        self._begin(action or self.run_action)
+
+    def start_watch(self):
         folder = self.entry_path.get().strip()
         if not folder or not os.path.isdir(folder):
             self.log_message("有効なフォルダを指定してください。")
             return
+        self._begin(lambda: self.watch_action(folder))
+
+    def start_plan(self):
+        path = filedialog.asksaveasfilename(title="変更プランの保存先", defaultextension=".jsonl",
+                                            filetypes=[("JSONL", "*.jsonl"), ("すべて", "*.*")])
+        if path:
+            self.start_process(lambda: self.run_action(plan_path=path))
+
+    def start_apply(self):
+        path = filedialog.askopenfilename(title="適用する変更プラン",
+                                          filetypes=[("JSONL", "*.jsonl"), ("すべて", "*.*")])
+        if path:
+            self._begin(lambda: self.apply_action(path))
+
+    def start_import(self):
+        path = filedialog.askopenfilename(title="取り込む曲情報",
+                                          filetypes=[("CSV / JSONL", "*.csv *.jsonl"), ("すべて", "*.*")])
+        if path:
+            self._begin(lambda: self.import_action(path))
+
+    def _begin(self, action):
         self.stop_flag = False
+        self._stop_requested_at = None
+        self.busy = True
         # 操作不可にする
-        self.btn_run.config(state="disabled")
+        for btn in (self.btn_run, self.btn_resume, self.btn_plan, self.btn_apply, self.btn_import, self.btn_watch):
+            btn.config(state="disabled")
         self.btn_stop.config(state="normal")
         # ラジオ・チェックを無効化
         for w in self.frame_mode.winfo_children():
@@ -805,115 +667,255 @@ class AudioTagGUI:
             except Exception:
                 pass
 
-        threading.Thread(target=self.run_action, daemon=True).start()
+        threading.Thread(target=action, daemon=True).start()
 
 
-    def run_action(self):
-        self.log_message("Web情報を取得してタグを書き込みます...")
-        for i, filepath in enumerate(self.file_list):
+    def run_action(self, plan_path=None, resume=False):
+        """
+        plan_path を指定した場合は書き込まず、変更プランをそのファイルに書き出す。
+        resume=True なら前回完了済みで変更のないファイルを飛ばす
+        """
+        if plan_path:
+            self.log_message("Web情報を取得して変更プランを作成します（タグは書き込みません）...")
+        else:
+            self.log_message("Web情報を取得してタグを書き込みます...")
+        journal = plan = None
+        # どこで失敗しても _end() でボタンを戻し、開いたファイルを閉じる
+        try:
+            options, concurrency, cache, store = self._prepare_run(dry_run=bool(plan_path))
+            resolver = new_batch_resolver(options)
+            files = self.file_list
+            # ドライランはジャーナルに記録しない（書き込んでいないので完了扱いにできない）
+            journal = None if plan_path else open_run_journal(options, resume=resume)
+            if journal and resume:
+                files = journal.pending(files)
+                self.log_message(format_journal_skip(len(self.file_list) - len(files), journal))
+            total = len(files)
+            done = [0]
+            plan = open(plan_path, "w", encoding="utf-8") if plan_path else None
+
+            def on_result(job):
+                self._on_job(job, plan, journal)
+                done[0] += 1
+
+            def on_progress(snapshot):
+                text = f"{done[0]}/{total} 件 処理完了 | {format_progress(snapshot)}"
+                self.ui.put("progress", text)
+
+            # 読み込み・取得・書き込みを別スレッドで動かし、ディスクと通信の待ちを重ねる
+            self._cancel = CancelToken()
             if self.stop_flag:
-                self.log_message("処理を中断しました。")
-                break
+                # 開始前に中断ボタンが押されていた
+                self._cancel.cancel()
+            stopped = run_enrichment(files, options, on_result, concurrency=concurrency,
+                                     should_stop=lambda: self.stop_flag, on_progress=on_progress, resolver=resolver,
+                                     cancel=self._cancel)
+            self._cancel = None
+            if plan:
+                plan.close()
+            if journal:
+                journal.close()
+            if stopped:
+                self._log_stopped()
+            if plan:
+                self.log_message(f"変更プランを書き出しました: {plan_path}")
+            self._log_run_stats(cache, resolver, store)
+            self._export_metrics()
+        except OSError as e:
+            self.log_message(f"実行を続けられません: {e}")
+        finally:
+            self._cancel = None
             try:
-                ext = os.path.splitext(filepath)[1].lower()
-                title, artist = "", ""
-                if ext == ".mp3":
-                    audio = ID3(filepath)
-                    title = audio.get("TIT2").text[0] if audio.get("TIT2") else ""
-                    artist = audio.get("TPE1").text[0] if audio.get("TPE1") else ""
-                elif ext == ".flac":
-                    audio = FLAC(filepath)
-                    title = audio.get("TITLE", [""])[0]
-                    artist = audio.get("ARTIST", [""])[0]
-                elif ext == ".m4a":
-                    audio = MP4(filepath)
-                    title = audio.tags.get("©nam", [""])[0] if "©nam" in audio.tags else ""
-                    artist = audio.tags.get("©ART", [""])[0] if "©ART" in audio.tags else ""
-
-                if not title or not artist:
-                    self.log_message(f"タイトル/アーティスト不足: {filepath}")
-                    continue
-
-                song_id, err = get_uta_net_song_id(title, artist)
-                if err:
-                    self.log_message(f"{os.path.basename(filepath)} → {err}")
-                    continue
-                info, msg = get_song_page_info(song_id)
-                if not info:
-                    self.log_message(f"{os.path.basename(filepath)} → {msg}")
-                    continue
-                self.log_message(f"{os.path.basename(filepath)} → {msg}")
-
-                lyricist = info.get("lyricist", "")
-                composer = info.get("composer", "")
-                arranger = info.get("arranger", "")
-                mode = self.write_mode.get()
-                ext = os.path.splitext(filepath)[1].lower()
-                # 作詞者
-                if lyricist:
-                    res = set_credit_tag(filepath, "作詞者", lyricist, force_overwrite=self.overwrite_flags["作詞者"].get())
-                    self.log_message(res)
-
-                # 作曲者
-                if mode == "B" and (composer or lyricist or arranger):
-                    # ユーザー定義の書式文字列を展開
-                    fmt = self.b_template_var.get()
-                    try:
-                        value = fmt.format(
-                            lyricist=lyricist or "",
-                            composer=composer or "",
-                            arranger=arranger or ""
-                        )
-                    except Exception as e:
-                        self.log_message(f"[{os.path.basename(filepath)}] フォーマット展開エラー: {e}")
-                        continue
-
-                    overwrite = self.overwrite_flags["作曲者"].get()
-                    res = set_credit_tag(
-                        filepath,
-                        "作曲者",
-                        value,
-                        force_overwrite=overwrite
-                    )
-                    self.log_message(res)
-                elif mode == "A":
-                    if composer and self.integrate_unwritable_tags.get():
-                        value = build_integrated_composer(ext, info)
-                        res = set_credit_tag(filepath, "作曲者", value, force_overwrite=self.overwrite_flags["作曲者"].get())
-                    elif composer:
-                        res = set_credit_tag(filepath, "作曲者", composer, force_overwrite=self.overwrite_flags["作曲者"].get())
-                        self.log_message(res)
-
-                # リミキサー（編曲者）
-                if arranger:
-                    res = set_credit_tag(filepath, "リミキサー", arranger, force_overwrite=self.overwrite_flags["リミキサー"].get())
-                    self.log_message(res)
-
-                # コメント（アニメ情報）
-                if info.get("anime"):
-                    res = set_credit_tag(filepath, "コメント", info["anime"], force_overwrite=self.overwrite_flags["コメント"].get())
-                    self.log_message(res)
-
-                # 発売年（YEARタグ）
-                year = info.get("year", "")
-                if year:
-                    res = set_credit_tag(filepath, "発売年", year, force_overwrite=self.overwrite_flags["発売年"].get())
-                    self.log_message(res)
-
-                # TreeView 更新
-                tags = self.read_tags(filepath)
-                self.root.after(0, lambda i=i, tags=tags: self.tree.item(self.tree.get_children()[i], values=tags))
-
-                self.log_message(f"更新完了: {os.path.basename(filepath)}")
-            except Exception:
-                self.log_message(f"エラー: {filepath}\n{traceback.format_exc()}")
+                if plan:
+                    plan.close()
+                if journal:
+                    journal.close()
+            except OSError as e:
+                self.log_message(f"ファイルを閉じられません: {e}")
+            self._end()
+
+    def watch_action(self, folder):
+        """folder を監視し、追加・変更されたファイルだけを取得・書き込みする（中断ボタンで終了する）"""
+        options, concurrency, cache, store = self._prepare_run()
+        resolver = new_batch_resolver(options)
+        # 監視中の結果は監視専用のジャーナルに追記する（通常の実行のジャーナルとは消し合わない）
+        journal = open_run_journal(options, resume=True, path=WATCH_PATH)
+        watcher = FolderWatcher([folder])
+        gen = self._scan_gen
+        listed = set(self.file_list)
+        done = [0]
+
+        def process(paths):
+            def on_result(job):
+                # 行は読み込み・書き込みステージのタグの値から作る（一覧のためにファイルを読み直さない）。
+                # 一覧にないファイルは行を追加し、あるファイルは新しい値に更新する
+                path = job.item
+                snapshot = job.data.get("snapshot")
+                row = snapshot.row() if snapshot is not None else [os.path.basename(path), "", "", "", "", "", "", ""]
+                if path in listed:
+                    self.ui.put("update", path, row)
+                else:
+                    listed.add(path)
+                    self.file_list.append(path)
+                    self.ui.put("insert", gen, path, row)
+                self._on_job(job, None, journal)
+                done[0] += 1
+
+            def on_progress(snapshot):
+                self.ui.put("progress", f"監視中: {done[0]} 件 処理完了 | {format_progress(snapshot)}")
+
+            stopped = run_enrichment(paths, options, on_result, concurrency=concurrency,
+                                     should_stop=lambda: self.stop_flag, on_progress=on_progress, resolver=resolver,
+                                     cancel=self._cancel)
+            self._export_metrics()
+            self.ui.put("progress", f"監視中: {done[0]} 件 処理完了")
+            return stopped
+
+        self._cancel = CancelToken()
+        if self.stop_flag:
+            self._cancel.cancel()
+        try:
+            existing = watcher.prime()
+            self.log_message(f"{folder} の監視を始めます（既存の {len(existing)} 件は処理しません）。"
+                             "終了するには中断ボタンを押してください。")
+            self.ui.put("progress", "監視中")
+            stopped = watch(watcher, process, self._cancel, on_found=lambda paths: self.log_message(
+                f"追加・変更されたファイル {len(paths)} 件を処理します..."))
+        finally:
+            self._cancel = None
+            if journal:
+                journal.close()
+        if stopped:
+            self._log_stopped()
+        self.log_message(f"フォルダの監視を終了しました（処理 {done[0]} 件）。")
+        self._log_run_stats(cache, resolver, store)
+        self._export_metrics()
+        self._end()
+
+    def _prepare_run(self, dry_run=False):
+        """
+        統計を初期化し、画面の設定から run_enrichment のオプションを作る。
+        (options, 同時処理数, キャッシュ, 曲情報ストア) を返す
+        """
+        from http_client import get_client
+        get_client().reset_stats()
+        get_metrics().reset()
+        cache = get_lookup_cache()
+        if cache:
+            cache.reset_stats()
+        source = self.source_labels[self.source_var.get()]
+        store = get_credit_store() if source != SOURCE_NETWORK else None
+        if store:
+            store.reset_stats()
+            if not store.count():
+                self.log_message("取り込んだ曲情報がありません。「曲情報を取り込む...」で CSV / JSONL を取り込んでください。")
+        elif source != SOURCE_NETWORK:
+            self.log_message("取り込んだ曲情報のストアを開けません。")
+        # Tk 変数は実行開始時に一度だけ読み、ワーカーへは値で渡す
+        options = default_options(
+            use_cache=not self.bypass_cache.get(),
+            mode=self.write_mode.get(),
+            template=self.b_template_var.get(),
+            integrate=self.integrate_unwritable_tags.get(),
+            overwrite={role: var.get() for role, var in self.overwrite_flags.items()},
+            batch_by_artist=self.batch_by_artist.get(),
+            dry_run=dry_run,
+            credit_source=source,
+        )
+        try:
+            concurrency = int(self.concurrency_var.get())
+        except ValueError:
+            concurrency = DEFAULT_CONCURRENCY
+        return options, concurrency, cache, store
+
+    def _on_job(self, job, plan, journal):
+        """完了したジョブ 1 件をログ・プラン・ジャーナル・一覧に反映する（ワーカースレッドから呼ばれる）"""
+        if job.error is not None:
+            e = job.error
+            job.lines.append(f"エラー: {job.item}\n{''.join(traceback.format_exception(type(e), e, e.__traceback__))}")
+        self.log_message("\n".join(job.lines))
+        if plan:
+            plan.write(json.dumps(plan_record(job), ensure_ascii=False) + "\n")
+        if journal:
+            journal.record(job)
+        if job.result is not None:
+            # 行 ID はファイルパスなので、完了順に関係なく正しい行へ反映される
+            self.ui.put("update", job.item, job.result)
+
+    def _log_run_stats(self, cache, resolver, store):
+        from http_client import get_client, format_stats
+        self.log_message(format_stats(get_client().stats()))
+        if cache:
+            self.log_message(format_cache_stats(cache.stats))
+        if resolver:
+            self.log_message(format_batch_stats(resolver.stats))
+        if store:
+            self.log_message(format_store_stats(store.stats))
+
+    def import_action(self, path):
+        """CSV / JSONL の曲情報をローカルのストアに取り込む（同じ曲は新しい内容で置き換える）"""
+        self.log_message(f"曲情報を取り込みます: {path}")
+        store = get_credit_store()
+        if store is None:
+            self.log_message("取り込んだ曲情報のストアを開けません。")
+            self._end()
+            return
 
+        def on_progress(n):
+            self.ui.put("progress", f"{n} 件 取り込み中")
+
+        start = time.perf_counter()
+        try:
+            added, replaced, skipped = store.import_file(path, on_progress=on_progress)
+        except (OSError, ValueError) as e:
+            self.log_message(f"曲情報を取り込めません: {e}")
+        else:
+            self.log_message(f"{added} 件を追加し、{replaced} 件を置き換えました（タイトルかアーティストがなく飛ばした行 {skipped} 件、"
+                             f"{time.perf_counter() - start:.1f} 秒）。取り込み済みは全部で {store.count()} 件です。")
+            self.ui.put("progress", "")
+        self._end()
+
+    def apply_action(self, plan_path):
+        """変更プランのうち、値が変わるファイルだけを書き込む（Web 取得は行わない）"""
+        try:
+            records = load_plan(plan_path)
+        except (OSError, ValueError) as e:
+            self.log_message(f"プランを読み込めません: {e}")
+            self._end()
+            return
+        self.log_message(f"変更プランの {len(records)} 件のファイルに書き込みます...")
+        get_metrics().reset()
+        total = len(records)
+        done = [0]
+
+        def on_result(record, lines, row):
+            self.log_message("\n".join(lines))
+            if row is not None:
+                self.ui.put("update", record["path"], row)
+            done[0] += 1
+            self.ui.put("progress", f"{done[0]}/{total} 件 処理完了")
+
+        try:
+            stopped = apply_plan(records, on_result, should_stop=lambda: self.stop_flag)
+        except Exception as e:
+            self.log_message(f"エラー: {''.join(traceback.format_exception(type(e), e, e.__traceback__))}")
+            stopped = False
+        if stopped:
+            self._log_stopped()
+        self._export_metrics()
+        self._end()
+
+    def _end(self):
         self.log_message("処理が完了しました。")
         # ボタン状態を元に戻す
-        self.root.after(0, lambda: self.btn_run.config(state="normal"))
-        self.root.after(0, lambda: self.btn_stop.config(state="disabled"))
+        def _enable_buttons():
+            for btn in (self.btn_run, self.btn_resume, self.btn_plan, self.btn_apply, self.btn_import, self.btn_watch):
+                btn.config(state="normal")
+            self.btn_stop.config(state="disabled")
+        self.ui.put("call", _enable_buttons)
         # ラジオ・チェックを再度有効化
         def _enable_inputs():
+            self.busy = False
             for w in self.frame_mode.winfo_children():
                 try:
                     w.config(state="normal")
@@ -924,7 +926,7 @@ class AudioTagGUI:
                     w.config(state="normal")
                 except Exception:
                     pass
-        self.root.after(0, _enable_inputs)
+        self.ui.put("call", _enable_inputs)
 
 
 if __name__ == "__main__":
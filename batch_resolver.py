@@ -0,0 +1,88 @@
+"""
+アーティスト単位のまとめ検索。
+
+同じアーティストの曲が続くライブラリ（アルバム単位のフォルダなど）では、
+1 曲ごとに uta-net を検索する代わりに、アーティストの最初の 1 曲だけを通常どおり検索して
+歌手 ID を調べ、その歌手ページの曲一覧を 1 回だけ取得して残りの曲を手元で照合する。
+一覧で見つからなかった曲だけ通常の検索に戻るので、検索リクエストはアーティストあたりほぼ 1 回になる。
+
+アルバムではまとめない。uta-net の曲一覧は歌手ページ（アルバムをまたいだ全曲）しかないので、
+アルバムごとに分けても同じ一覧を取り直すだけになる。別のアルバムの曲も同じ一覧から照合する。
+"""
+import threading
+
+from song_matcher import CandidateIndex, normalize
+
+
+def _empty_stats():
+    return {"artists": 0, "listings": 0, "listing_errors": 0, "local": 0, "searches": 0}
+
+
+class ArtistBatchResolver:
+    """
+    search(title, artist) -> (song_id, err, cacheable, (歌手 ID, 歌手名) または None)
+    fetch_listing(歌手 ID) -> ([(曲 ID, タイトル), ...], err)
+    resolve() は search と同じ (song_id, err, cacheable) を返す。スレッド間で共有してよい。
+    """
+
+    def __init__(self, search, fetch_listing, threshold):
+        self.search = search
+        self.fetch_listing = fetch_listing
+        self.threshold = threshold
+        self.stats = _empty_stats()
+        self._indexes = {}       # 正規化したアーティスト名（アルバムは区別しない） -> CandidateIndex（一覧を取得できなかったら None）
+        self._group_locks = {}
+        self._lock = threading.Lock()
+
+    def _group_lock(self, key):
+        with self._lock:
+            lock = self._group_locks.get(key)
+            if lock is None:
+                lock = self._group_locks[key] = threading.Lock()
+                self.stats["artists"] += 1
+            return lock
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def resolve(self, title, artist):
+        key = normalize(artist)
+        if key not in self._indexes:
+            # アーティストの最初の曲: 同じアーティストの他の曲は一覧ができるまで待たせる
+            with self._group_lock(key):
+                if key not in self._indexes:
+                    return self._first_search(key, title, artist)
+
+        index = self._indexes[key]
+        if index is not None:
+            chosen, _ = index.best(title, artist, self.threshold)
+            if chosen:
+                self._count("local")
+                return chosen.song_id, None, True
+        # 一覧で見つからなかった曲だけ通常の検索に戻る
+        self._count("searches")
+        return self.search(title, artist)[:3]
+
+    def _first_search(self, key, title, artist):
+        self._count("searches")
+        song_id, err, cacheable, found_artist = self.search(title, artist)
+        if song_id is None or found_artist is None:
+            # 歌手 ID が分からないので、次の曲でもう一度試す
+            return song_id, err, cacheable
+        artist_id, artist_name = found_artist
+        self._count("listings")
+        rows, listing_err = self.fetch_listing(artist_id)
+        if listing_err:
+            self._count("listing_errors")
+        self._indexes[key] = CandidateIndex(
+            [(sid, song_title, artist_name) for sid, song_title in rows]) if rows else None
+        return song_id, err, cacheable
+
+
+def format_batch_stats(stats):
+    """stats をログ用の 1 行にまとめる"""
+    return (
+        f"まとめ検索: アーティスト {stats['artists']} 組 / 曲一覧取得 {stats['listings']} 件"
+        f"（失敗 {stats['listing_errors']} 件） / 一覧で照合 {stats['local']} 曲 / 検索 {stats['searches']} 件"
+    )
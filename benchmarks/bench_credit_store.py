@@ -0,0 +1,104 @@
+"""
+取り込んだ曲情報（credit_store）の取り込み時間と照合時間のベンチマーク。
+
+合成した N 件（既定 100 万件）の曲情報を CSV に書き出して一時ストアに取り込み、
+ライブラリの曲に見立てた問い合わせ（完全一致・表記ゆれ・前方一致・見つからない曲）の
+1 件あたりの照合時間（p50 / p95 / 最大）を測る。
+
+例:
+    python benchmarks/bench_credit_store.py
+    python benchmarks/bench_credit_store.py --rows 200000 --queries 5000
+"""
+import argparse, csv, os, random, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from credit_store import CreditStore
+from benchmarks.corpus import TITLE_WORDS, ARTIST_WORDS, CREATOR_NAMES
+
+
+def make_rows(n, seed=0):
+    """(タイトル, アーティスト, 作詞, 作曲, 編曲, タイアップ, 発売日) を n 件作る。タイトルは番号付きで重複しない"""
+    rng = random.Random(seed)
+    for i in range(n):
+        a, b = rng.sample(TITLE_WORDS, 2)
+        yield (f"{a}の{b} {i}", rng.choice(ARTIST_WORDS), rng.choice(CREATOR_NAMES), rng.choice(CREATOR_NAMES),
+               rng.choice(CREATOR_NAMES), f"テレビアニメ「{b}」オープニングテーマ",
+               f"{rng.randrange(1995, 2025)}/{rng.randrange(1, 13):02d}/{rng.randrange(1, 29):02d}")
+
+
+def write_csv(path, n, seed):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["title", "artist", "lyricist", "composer", "arranger", "tie-up", "release"])
+        w.writerows(make_rows(n, seed))
+
+
+def make_queries(n, count, seed):
+    """(タイトル, アーティスト, 種類) を count 件。種類は exact / spacing / prefix / miss"""
+    rng = random.Random(seed + 1)
+    wanted = set(rng.sample(range(n), min(count, n)))
+    queries = []
+    for i, row in enumerate(make_rows(n, seed)):
+        if i in wanted:
+            title, artist = row[0], row[1]
+            kind = rng.choice(("exact", "spacing", "prefix", "miss"))
+            if kind == "spacing":
+                title = "　".join(title.split(" ")).upper()
+            elif kind == "prefix":
+                # 番号の末尾を落とす（同じ番号で始まる曲が候補になる）
+                title = title[:-1]
+            elif kind == "miss":
+                title = f"存在しない曲 {i}"
+            queries.append((title, artist, kind))
+    rng.shuffle(queries)
+    return queries
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="取り込む曲情報の件数")
+    parser.add_argument("--queries", type=int, default=10000, help="照合する件数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench_credit_store_")
+    try:
+        csv_path = os.path.join(tmp, "credits.csv")
+        start = time.perf_counter()
+        write_csv(csv_path, args.rows, args.seed)
+        print(f"CSV 作成: {args.rows} 件 {time.perf_counter() - start:.1f} 秒"
+              f"（{os.path.getsize(csv_path) / 1024 / 1024:.0f} MB）")
+
+        store = CreditStore(os.path.join(tmp, "store.sqlite3"))
+        start = time.perf_counter()
+        added, replaced, skipped = store.import_file(csv_path)
+        elapsed = time.perf_counter() - start
+        print(f"取り込み: {added + replaced} 件 {elapsed:.1f} 秒（{(added + replaced) / elapsed:,.0f} 件/秒）")
+
+        queries = make_queries(args.rows, args.queries, args.seed)
+        by_kind = {}
+        hits = {}
+        for title, artist, kind in queries:
+            start = time.perf_counter()
+            hit = store.lookup(title, artist)
+            by_kind.setdefault(kind, []).append(time.perf_counter() - start)
+            hits[kind] = hits.get(kind, 0) + (hit is not None)
+        everything = [t for times in by_kind.values() for t in times]
+        print(f"{'種類':<10}{'件数':>8}{'一致':>8}{'p50 ms':>10}{'p95 ms':>10}{'最大 ms':>10}")
+        for kind, times in sorted(by_kind.items()) + [("全体", everything)]:
+            print(f"{kind:<10}{len(times):>8}{hits.get(kind, sum(hits.values())):>8}"
+                  f"{percentile(times, 0.50) * 1000:>10.3f}{percentile(times, 0.95) * 1000:>10.3f}"
+                  f"{max(times) * 1000:>10.3f}")
+        store.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
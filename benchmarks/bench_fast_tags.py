@@ -0,0 +1,178 @@
+"""
+タグ読み取りの読み込み量ベンチマーク。
+
+fast_tags（タグ部分だけを読む）と mutagen（従来の読み方）で、1 ファイルあたりに
+ディスクから読んだバイト数・読み込み回数・時間を比べる。あわせて両者の結果が一致するかも確認する。
+
+例:
+    python benchmarks/bench_fast_tags.py /music/anime
+    python benchmarks/bench_fast_tags.py --generate 60 --audio-kb 8192
+
+--generate を指定すると、画像付きタグ・moov より前の大きな mdat などを含む
+合成ファイルを一時フォルダに作って計測する。
+"""
+import argparse, os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen import File as MutagenFile
+from mutagen.id3 import ID3, TIT2, TPE1, TCOM, TDRC, TXXX, COMM, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+
+from fast_tags import read_tag_values, open_counting, FastTagError
+from credit_core import open_tags, snapshot_from_tags
+from library_scanner import iter_audio_files
+from benchmarks.corpus import blank_mp3, blank_flac, blank_m4a
+
+TITLES = [("紅蓮華", "LiSA"), ("夜に駆ける", "YOASOBI"), ("Lemon", "米津玄師"), ("残酷な天使のテーゼ", "高橋洋子")]
+
+
+# --- 合成ファイル（タグの書き方の違いを含む） ---
+
+def make_mp3(path, title, artist, audio_kb, picture, v2_version):
+    blank_mp3(path, audio_kb)
+    tags = ID3()
+    tags.add(TIT2(encoding=1, text=[title]))
+    tags.add(TPE1(encoding=3, text=[artist]))
+    tags.add(TCOM(encoding=3, text=["草野華余子"]))
+    tags.add(TDRC(encoding=3, text=["2019"]))
+    tags.add(TXXX(encoding=3, desc="LYRICIST", text=[artist]))
+    tags.add(TXXX(encoding=3, desc="MIXARTIST", text=["江口亮"]))
+    tags.add(COMM(encoding=1, lang="eng", desc="", text=["テレビアニメ主題歌"]))
+    tags.add(COMM(encoding=3, lang="jpn", desc="note", text=["別のコメント"]))
+    tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=picture))
+    tags.save(path, v2_version=v2_version)
+
+
+def make_flac(path, title, artist, audio_kb, picture):
+    blank_flac(path, audio_kb)
+    audio = FLAC(path)
+    pic = Picture()
+    pic.type, pic.mime, pic.data = 3, "image/jpeg", picture
+    audio.add_picture(pic)
+    audio["TITLE"] = title
+    audio["ARTIST"] = artist
+    audio["COMPOSER"] = "草野華余子"
+    audio["MIXARTIST"] = "江口亮"
+    audio["COMMENT"] = "テレビアニメ主題歌"
+    audio["DATE"] = "2019"
+    audio.save()
+
+
+def make_m4a(path, title, artist, audio_kb, picture):
+    blank_m4a(path, audio_kb)
+    audio = MP4(path)
+    audio.add_tags()
+    audio.tags["\xa9nam"] = [title]
+    audio.tags["\xa9ART"] = [artist]
+    audio.tags["\xa9wrt"] = ["草野華余子"]
+    audio.tags["\xa9lyr"] = [artist]
+    audio.tags["\xa9cmt"] = ["テレビアニメ主題歌"]
+    audio.tags["\xa9day"] = ["2019"]
+    audio.tags["covr"] = [MP4Cover(picture, imageformat=MP4Cover.FORMAT_JPEG)]
+    audio.save()
+
+
+def generate(folder, count, audio_kb, picture_kb):
+    picture = os.urandom(picture_kb * 1024)
+    for i in range(count):
+        title, artist = TITLES[i % len(TITLES)]
+        base = os.path.join(folder, f"{i:04d}")
+        kind = i % 4
+        if kind == 0:
+            make_mp3(base + ".mp3", title, artist, audio_kb, picture, 3)
+        elif kind == 1:
+            make_mp3(base + ".mp3", title, artist, audio_kb, picture, 4)
+        elif kind == 2:
+            make_flac(base + ".flac", title, artist, audio_kb, picture)
+        else:
+            make_m4a(base + ".m4a", title, artist, audio_kb, picture)
+
+
+# --- 計測 ---
+
+def measure_fast(path):
+    stats = {}
+    start = time.perf_counter()
+    try:
+        values = read_tag_values(path, stats)
+    except FastTagError:
+        values = None
+    return values, stats.get("bytes", 0), stats.get("reads", 0), time.perf_counter() - start
+
+
+def measure_mutagen(path, legacy=False):
+    """mutagen で読んだときの読み込み量。legacy=True は従来の read_tags（easy とフォーマット別の 2 回解析）"""
+    ext = os.path.splitext(path)[1].lower()
+    total_bytes = total_reads = 0
+    start = time.perf_counter()
+    if legacy:
+        f, counter = open_counting(path)
+        with f:
+            MutagenFile(f, easy=True)
+        total_bytes += counter.bytes
+        total_reads += counter.reads
+    f, counter = open_counting(path)
+    with f:
+        cls = {".mp3": ID3, ".flac": FLAC, ".m4a": MP4}[ext]
+        cls(f)
+    total_bytes += counter.bytes
+    total_reads += counter.reads
+    return total_bytes, total_reads, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folders", nargs="*", help="計測する音源フォルダ")
+    parser.add_argument("--generate", type=int, default=0, metavar="N", help="合成ファイルを N 件作って計測する")
+    parser.add_argument("--audio-kb", type=int, default=4096, help="合成ファイルの音声データの大きさ（KB）")
+    parser.add_argument("--picture-kb", type=int, default=300, help="合成ファイルの埋め込み画像の大きさ（KB）")
+    args = parser.parse_args(argv)
+    if not args.folders and not args.generate:
+        parser.error("フォルダか --generate を指定してください")
+
+    tmp = None
+    folders = list(args.folders)
+    if args.generate:
+        tmp = tempfile.mkdtemp(prefix="bench_fast_tags_")
+        generate(tmp, args.generate, args.audio_kb, args.picture_kb)
+        folders.append(tmp)
+
+    try:
+        files = [path for folder in folders for path, _, _ in iter_audio_files(folder)]
+        totals = {"fast": [0, 0, 0.0], "mutagen": [0, 0, 0.0], "legacy": [0, 0, 0.0]}
+        size_total = 0
+        fallback = mismatch = 0
+        for path in files:
+            size_total += os.path.getsize(path)
+            values, nbytes, reads, elapsed = measure_fast(path)
+            for key, result in (("fast", (nbytes, reads, elapsed)),
+                                ("mutagen", measure_mutagen(path)),
+                                ("legacy", measure_mutagen(path, legacy=True))):
+                for i, v in enumerate(result):
+                    totals[key][i] += v
+            if values is None:
+                fallback += 1
+                continue
+            ext = os.path.splitext(path)[1].lower()
+            expected = tuple(snapshot_from_tags(ext, open_tags(path)[1], 0)[:7])
+            if values != expected:
+                mismatch += 1
+                print(f"不一致: {path}\n  fast    = {values}\n  mutagen = {expected}")
+
+        n = max(len(files), 1)
+        print(f"ファイル数: {len(files)}（平均サイズ {size_total / n / 1024:.0f} KB）")
+        print(f"{'読み方':<22}{'KB/ファイル':>12}{'読込回数':>10}{'ms/ファイル':>12}")
+        for key, label in (("legacy", "従来（mutagen 2 回）"), ("mutagen", "mutagen 1 回"), ("fast", "fast_tags")):
+            nbytes, reads, elapsed = totals[key]
+            print(f"{label:<22}{nbytes / n / 1024:>12.1f}{reads / n:>10.1f}{elapsed / n * 1000:>12.2f}")
+        print(f"mutagen への切り替え: {fallback} 件 / 結果の不一致: {mismatch} 件")
+        return 1 if mismatch else 0
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+候補マッチャーのベンチマーク。
+
+合成した検索結果（同名のカバー曲・TV サイズ・重複行などを含む数百件）に対して、
+変更前の選択処理（exact / front_match / partial を毎回正規化して連結）と
+song_matcher.CandidateIndex の 1 件あたりの時間を比べ、選ばれた曲が変わったケースを表示する。
+
+例:
+    python benchmarks/bench_matcher.py
+    python benchmarks/bench_matcher.py --candidates 800 --queries 300 --threshold 0.6
+"""
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from song_matcher import CandidateIndex, normalize, DEFAULT_THRESHOLD
+
+TITLES = ["紅蓮華", "夜に駆ける", "Lemon", "残酷な天使のテーゼ", "only my railgun", "炎", "アイドル", "God knows...",
+          "シュガーソングとビターステップ", "unravel", "創聖のアクエリオン", "Butter-Fly"]
+ARTISTS = ["LiSA", "YOASOBI", "米津玄師", "高橋洋子", "fripSide", "YOASOBI", "涼宮ハルヒ(CV:平野綾)",
+           "UNISON SQUARE GARDEN", "TK from 凛として時雨", "AKINO", "和田光司"]
+SUFFIXES = ["", " (TV size)", " -English ver.-", " Live", " (Acoustic)", "・リミックス"]
+
+
+def legacy_select(rows, title, artist):
+    """変更前の get_uta_net_song_id の候補選択（比較用にそのまま残す）"""
+    candidates = [{"Id": int(m[0]), "Title": m[1].strip(), "Artist": m[2].strip()} for m in rows]
+    ntitle = normalize(title)
+    nartist = normalize(artist)
+    pref = nartist[:3] if len(nartist) >= 3 else nartist
+    exact = [c for c in candidates if normalize(c["Title"]) == ntitle]
+    front_match = [c for c in candidates if normalize(c["Title"]).startswith(ntitle)]
+    partial = [c for c in candidates if ntitle in normalize(c["Title"])]
+    stage1 = []
+    stage1.extend(exact)
+    stage1.extend(front_match)
+    stage1.extend(partial)
+    if not stage1:
+        return None
+    by_artist = [c for c in stage1 if normalize(c["Artist"]).startswith(pref)]
+    if by_artist:
+        return by_artist[0]["Id"]
+    return None
+
+
+def make_case(rng, size):
+    """(rows, 検索タイトル, アーティスト) を作る"""
+    title = rng.choice(TITLES)
+    artist = rng.choice(ARTISTS)
+    rows = []
+    song_id = rng.randrange(10000, 90000)
+    for _ in range(size):
+        song_id += rng.randrange(1, 50)
+        t = rng.choice(TITLES)
+        if rng.random() < 0.3:
+            t = title
+        t += rng.choice(SUFFIXES)
+        a = rng.choice(ARTISTS) if rng.random() < 0.8 else artist + rng.choice(["", " feat. 他", "　"])
+        rows.append((str(song_id), f" {t} ", a))
+        # 検索ページには同じ曲が別の行として重ねて出ることがある
+        if rng.random() < 0.05:
+            rows.append((str(song_id), t, a))
+    return rng.sample(rows, len(rows)), title, artist
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--candidates", type=int, default=300, help="1 回の検索結果の件数")
+    parser.add_argument("--queries", type=int, default=200, help="照合する回数")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=14)
+    parser.add_argument("--show", type=int, default=5, help="選ばれた曲が変わったケースを表示する件数")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    cases = [make_case(rng, args.candidates) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    legacy = [legacy_select(rows, t, a) for rows, t, a in cases]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [CandidateIndex(rows).best(t, a, args.threshold) for rows, t, a in cases]
+    new_time = time.perf_counter() - start
+
+    same = accepted = 0
+    shown = 0
+    for (rows, t, a), old_id, (chosen, top) in zip(cases, legacy, results):
+        new_id = chosen.song_id if chosen else None
+        accepted += chosen is not None
+        if old_id == new_id:
+            same += 1
+            continue
+        if shown < args.show:
+            shown += 1
+            old = next((r for r in rows if int(r[0]) == old_id), None)
+            print(f"検索: {t} / {a}")
+            print(f"  従来: {old[1].strip() + ' / ' + old[2] if old else 'なし'}")
+            print(f"  新  : {chosen.candidate.title + ' / ' + chosen.candidate.artist if chosen else 'なし'}"
+                  + (f"（スコア {top.score:.2f}）" if top else ""))
+
+    n = len(cases)
+    print(f"候補 {args.candidates} 件 × {n} 回（しきい値 {args.threshold:.2f}）")
+    print(f"従来: {legacy_time / n * 1000:.3f} ms/回  新: {new_time / n * 1000:.3f} ms/回"
+          f"（{legacy_time / max(new_time, 1e-9):.1f} 倍）")
+    print(f"選択が同じ: {same}/{n} 件 / 採用: {accepted}/{n} 件")
+
+
+if __name__ == "__main__":
+    main()
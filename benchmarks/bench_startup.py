@@ -0,0 +1,117 @@
+"""
+起動時間のベンチマーク。
+
+1. python -X importtime で GUI（CreditGet_relese）とコア（credit_core）の import にかかる時間を集計し、
+   時間のかかっているモジュールと、起動時に読み込まれていないはずのモジュール（mutagen・requests）を確認する。
+   あわせてコアが tkinter なしで import できることも確認する。
+2. 新しいプロセスで GUI を起動し、プロセスの起動からウィンドウの表示（first paint）まで・
+   裏でのモジュールの読み込み完了までの時間を計る（表示環境が必要）。
+
+どれも --runs 回ずつ計り、中央値を出す。古いノート PC での起動時間の推移を見るために使う。
+
+例:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 15
+"""
+import argparse, json, os, statistics, subprocess, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 起動時には読み込まないモジュール（最初に使うときに読み込む）
+LAZY_MODULES = ("mutagen", "requests", "urllib3")
+
+# GUI を起動し、表示・読み込み完了まで待ってから時間を出力して終了する
+_PAINT_SCRIPT = """
+import time
+started = time.perf_counter()
+import sys
+# プロセスを起動してからここまで（インタプリタの初期化）にかかった時間
+launch = time.time() - float(sys.argv[1])
+import json, tkinter as tk
+import CreditGet_relese as gui
+root = tk.Tk()
+app = gui.AudioTagGUI(root)
+def poll():
+    if "preload" in app.startup:
+        offset = launch + (gui._STARTED - started)
+        print(json.dumps({k: v + offset for k, v in app.startup.items()}))
+        root.destroy()
+    else:
+        root.after(5, poll)
+root.after(5, poll)
+root.mainloop()
+"""
+
+
+def importtime(module):
+    """python -X importtime -c "import module" を実行し、{モジュール: (自身 µs, 累計 µs, 深さ)} と読み込み順を返す"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    entries = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries[name.strip()] = (int(self_us), int(cumulative), depth)
+    return entries
+
+
+def summarize_import(module, runs, top):
+    totals = []
+    samples = {}
+    for _ in range(runs):
+        entries = importtime(module)
+        totals.append(entries[module][1])
+        for name, (_, cumulative, depth) in entries.items():
+            # import した本人から見て直下のモジュールだけを並べる
+            if depth == 1:
+                samples.setdefault(name, []).append(cumulative)
+    lazy = [m for m in LAZY_MODULES if m in entries or any(n.startswith(m + ".") for n in entries)]
+    print(f"import {module}: 中央値 {statistics.median(totals) / 1000:.1f} ms（{runs} 回）")
+    ranked = sorted(((statistics.median(v), n) for n, v in samples.items()), reverse=True)[:top]
+    for us, name in ranked:
+        print(f"  {us / 1000:>7.1f} ms  {name}")
+    print(f"  起動時に読み込まれた重いモジュール: {', '.join(lazy) or 'なし'}")
+    return statistics.median(totals) / 1000, lazy
+
+
+def core_without_tkinter():
+    code = "import sys, credit_core, credit_cli; print('tkinter' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return out.stdout.strip() == "False"
+
+
+def first_paint(runs):
+    """(プロセス起動から表示まで, 読み込み完了まで) の中央値（ms）。表示環境がなければ None"""
+    paints, ready = [], []
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, "-c", _PAINT_SCRIPT, repr(time.time())], cwd=ROOT,
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            return None
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        paints.append(result["first_paint"] * 1000)
+        ready.append(result["preload"] * 1000)
+    return statistics.median(paints), statistics.median(ready)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="計測の回数")
+    parser.add_argument("--top", type=int, default=10, help="表示する時間のかかるモジュールの数")
+    args = parser.parse_args(argv)
+
+    summarize_import("CreditGet_relese", args.runs, args.top)
+    summarize_import("credit_core", args.runs, args.top)
+    print(f"コア（credit_core / credit_cli）を tkinter なしで import できる: {core_without_tkinter()}")
+    paint = first_paint(args.runs)
+    if paint is None:
+        print("画面表示までの時間: 表示環境がないため計測できません")
+    else:
+        print(f"画面表示まで: 中央値 {paint[0]:.0f} ms / モジュールの読み込み完了まで: 中央値 {paint[1]:.0f} ms"
+              "（プロセスの起動から）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""
+オフラインのスループット計測（スキャン・取得・書き込み・パイプライン全体）。
+
+合成ライブラリ（benchmarks/corpus.py）とローカルの uta-net 代替サーバー（benchmarks/utanet_standin.py）を使い、
+本物のサイトや音源ライブラリなしで次の段階を計測する。
+    scan     : load_files と同じ LibraryScanner + read_tag_row（インデックスなしの初回スキャン）
+    lookup   : get_uta_net_song_id + get_song_page_info（キャッシュなし）
+    write    : set_credit_tags（作業用のコピーに書き込む）
+    pipeline : run_enrichment（読み込み → 取得 → 書き込み。別のコピーに書き込む）
+段階ごとに 件/秒・読み書きしたバイト数（/proc/self/io がある環境のみ）・HTTP 受信量・
+1 件あたりの時間の p50/p95 を表示する。--save で結果を保存し、--baseline で前回の結果と比べて
+遅くなった段階があれば終了コード 1 を返す（リリース前の性能確認用）。
+
+キャッシュとライブラリインデックスは一時フォルダの別ファイルを使い、アプリ本体のものには触れない。
+
+例:
+    python benchmarks/bench_suite.py --files 500 --latency-ms 30 --save bench.json
+    python benchmarks/bench_suite.py --corpus /tmp/corpus --baseline bench.json --tolerance 0.2
+"""
+import argparse, json, os, shutil, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import credit_core, http_client, lookup_cache, library_index
+from credit_core import (
+    read_tag_row, get_uta_net_song_id, get_song_page_info, set_credit_tags, build_stages, default_options, ROLES,
+)
+from enrich_engine import EnrichPipeline, DEFAULT_CONCURRENCY
+from library_scanner import LibraryScanner, iter_audio_files, DEFAULT_SCAN_WORKERS
+from benchmarks.corpus import generate, load_catalog
+from benchmarks.utanet_standin import StandIn
+
+STAGES = ("scan", "lookup", "write", "pipeline")
+# --baseline で比べる指標（大きいほど良い / 小さいほど良い）
+HIGHER_IS_BETTER = ("files_per_s",)
+LOWER_IS_BETTER = ("p50_ms", "p95_ms")
+
+
+def io_counters():
+    """このプロセスが read/write したバイト数。/proc/self/io がなければ None"""
+    try:
+        with open("/proc/self/io") as f:
+            values = dict(line.split(": ") for line in f.read().splitlines())
+        return int(values["rchar"]), int(values["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+class StageTimer:
+    """1 段階分の計測。measure() の中で件ごとの時間を add() する"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+
+    def add(self, seconds, ok=True):
+        self.latencies.append(seconds)
+        self.errors += not ok
+
+    def measure(self, func):
+        client = http_client.get_client()
+        client.reset_stats()
+        io_start = io_counters()
+        start = time.perf_counter()
+        func(self)
+        self.elapsed = time.perf_counter() - start
+        io_end = io_counters()
+        self.http_bytes = client.stats()["bytes"]
+        self.io = (io_end[0] - io_start[0], io_end[1] - io_start[1]) if io_start and io_end else None
+        return self
+
+    def result(self):
+        n = len(self.latencies)
+        return {
+            "files": n,
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 3),
+            "files_per_s": round(n / self.elapsed, 2) if self.elapsed else 0.0,
+            "read_bytes": self.io[0] if self.io else None,
+            "written_bytes": self.io[1] if self.io else None,
+            "http_bytes": self.http_bytes,
+            "p50_ms": round(percentile(self.latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(self.latencies, 0.95) * 1000, 2),
+        }
+
+
+def _timed(timer, func, *args):
+    """func(*args) を呼んで時間を timer に記録する。例外は失敗として数える"""
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        ok = True
+    except Exception:
+        result, ok = None, False
+    timer.add(time.perf_counter() - start, ok)
+    return result
+
+
+# --- 各段階 ---
+
+def bench_scan(folder, workers):
+    rows = {}
+
+    def run(timer):
+        def read_fn(path, size, mtime):
+            return _timed(timer, read_tag_row, path, None, size)
+        for path, row in LibraryScanner(read_fn, workers=workers).scan(folder):
+            rows[path] = row
+    return StageTimer("scan").measure(run), rows
+
+
+def bench_lookup(rows, concurrency):
+    infos = {}
+
+    def lookup(path, row):
+        song_id, err = get_uta_net_song_id(row[0], row[1], use_cache=False)
+        if err:
+            return err
+        info, _ = get_song_page_info(song_id, use_cache=False)
+        infos[path] = info
+        return info
+
+    def run(timer):
+        targets = [(path, row) for path, row in rows.items() if row and row[0] and row[1]]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda item: _timed(timer, lookup, *item), targets))
+    return StageTimer("lookup").measure(run), infos
+
+
+def bench_write(infos, src, dst):
+    overwrite = {role: False for role in ROLES}
+
+    def run(timer):
+        for path, info in infos.items():
+            if not info:
+                continue
+            values = {"作詞者": info["lyricist"], "作曲者": info["composer"], "リミキサー": info["arranger"],
+                      "コメント": info["anime"], "発売年": info["year"]}
+            _timed(timer, set_credit_tags, os.path.join(dst, os.path.relpath(path, src)), values, overwrite)
+    return StageTimer("write").measure(run)
+
+
+def bench_pipeline(folder, concurrency):
+    """パイプライン全体。件ごとの時間は読み込みステージに入ってから完了までで、ステージごとの時間も残す"""
+    files = [path for path, _, _ in iter_audio_files(folder)]
+    options = default_options(use_cache=False)
+    stage_timers = []
+
+    def wrap(stage, first):
+        func = stage.func
+        timer = StageTimer(stage.name)
+        stage_timers.append(timer)
+
+        def timed(job):
+            start = time.perf_counter()
+            if first:
+                job.data["bench_start"] = start
+            try:
+                func(job)
+            finally:
+                timer.add(time.perf_counter() - start, job.error is None)
+        stage.func = timed
+
+    def run(timer):
+        stages = build_stages(options, concurrency)
+        for pos, stage in enumerate(stages):
+            wrap(stage, pos == 0)
+
+        def on_result(job):
+            timer.add(time.perf_counter() - job.data["bench_start"], job.error is None)
+        EnrichPipeline(stages, on_result).run(files)
+
+    timer = StageTimer("pipeline").measure(run)
+    return timer, stage_timers
+
+
+# --- 結果 ---
+
+def format_bytes(n):
+    if n is None:
+        return "-"
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.1f} KB"
+
+
+def print_results(results):
+    print(f"{'段階':<16}{'件数':>6}{'失敗':>6}{'件/秒':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'読込':>12}{'書込':>12}{'HTTP受信':>12}")
+    for name, r in results.items():
+        print(f"{name:<16}{r['files']:>6}{r['errors']:>6}{r['files_per_s']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}"
+              f"{format_bytes(r['read_bytes']):>12}{format_bytes(r['written_bytes']):>12}"
+              f"{format_bytes(r['http_bytes']):>12}")
+
+
+def compare(results, baseline, tolerance):
+    """baseline より tolerance（割合）以上悪化した指標を [(段階, 指標, 前回, 今回), ...] で返す"""
+    regressions = []
+    for name, r in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        for key in HIGHER_IS_BETTER:
+            if old.get(key) and r[key] < old[key] * (1 - tolerance):
+                regressions.append((name, key, old[key], r[key]))
+        for key in LOWER_IS_BETTER:
+            if old.get(key) and r[key] > old[key] * (1 + tolerance):
+                regressions.append((name, key, old[key], r[key]))
+    return regressions
+
+
+def _use_private_stores(tmp):
+    """キャッシュとライブラリインデックスを一時フォルダのものに差し替える（アプリ本体のファイルを汚さない）"""
+    lookup_cache._cache = lookup_cache.LookupCache(os.path.join(tmp, "lookup_cache.sqlite3"))
+    library_index._index = library_index.LibraryIndex(os.path.join(tmp, "library_index.sqlite3"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="既存の合成ライブラリ（catalog.json 付き）。省略時は --files 件を一時フォルダに作る")
+    parser.add_argument("--files", type=int, default=300, help="作るファイル数")
+    parser.add_argument("--audio-kb", type=int, default=1024, help="合成ファイルの音声データの大きさ（KB）")
+    parser.add_argument("--picture-kb", type=int, default=100, help="合成ファイルの埋め込み画像の大きさ（KB）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="代替サーバーの平均応答遅延")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="応答遅延のばらつき（±）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="代替サーバーが 503 を返す割合")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="代替サーバーが途中で接続を切る割合")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="HTTP のレート制限（件/秒、0 で無制限）")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="取得の同時実行数")
+    parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES), help="計測する段階")
+    parser.add_argument("--save", metavar="FILE", help="結果を JSON で保存する")
+    parser.add_argument("--baseline", metavar="FILE", help="前回の結果（--save で保存したもの）と比べる")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="悪化とみなす割合（既定 0.2 = 20%%）")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix="bench_suite_")
+    standin = None
+    try:
+        corpus = args.corpus
+        if not corpus:
+            corpus = os.path.join(tmp, "corpus")
+            os.makedirs(corpus)
+            print(f"合成ライブラリを作成しています（{args.files} 件）...")
+            generate(corpus, args.files, args.audio_kb, args.picture_kb, args.seed)
+        _use_private_stores(tmp)
+        standin = StandIn(load_catalog(corpus), args.latency_ms, args.jitter_ms, args.error_rate, args.reset_rate,
+                          seed=args.seed)
+        base = standin.start()
+        credit_core.SEARCH_URL = base + "/search/?Aselect=2&Keyword={}"
+        credit_core.SONG_PAGE_URL = base + "/song/{}/"
+        credit_core.ARTIST_PAGE_URL = base + "/artist/{}/"
+        http_client.configure(rate_limit=args.rate_limit)
+
+        results = {}
+        rows = infos = None
+        if {"scan", "lookup", "write"} & set(args.stages):
+            timer, rows = bench_scan(corpus, args.scan_workers)
+            if "scan" in args.stages:
+                results["scan"] = timer.result()
+        if {"lookup", "write"} & set(args.stages):
+            timer, infos = bench_lookup(rows, args.concurrency)
+            if "lookup" in args.stages:
+                results["lookup"] = timer.result()
+        if "write" in args.stages:
+            work = os.path.join(tmp, "write")
+            shutil.copytree(corpus, work)
+            results["write"] = bench_write(infos, corpus, work).result()
+        if "pipeline" in args.stages:
+            work = os.path.join(tmp, "pipeline")
+            shutil.copytree(corpus, work)
+            timer, stage_timers = bench_pipeline(work, args.concurrency)
+            results["pipeline"] = timer.result()
+            for t in stage_timers:
+                t.elapsed, t.io, t.http_bytes = timer.elapsed, None, 0
+                results[f"pipeline/{t.name}"] = t.result()
+
+        print_results(results)
+        print("代替サーバー: " + ", ".join(f"{k}={v}" for k, v in sorted(standin.stats.items())))
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            for name, key, old, new in regressions:
+                print(f"悪化: {name} {key} {old} → {new}")
+            print(f"前回との比較: 悪化 {len(regressions)} 件（許容 {args.tolerance:.0%}）")
+            return 1 if regressions else 0
+        return 0
+    finally:
+        if standin:
+            standin.stop()
+        http_client.get_client().close()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+uta-net 抽出器の確認とベンチマーク。
+
+fixtures/utanet の HTML を、変更前の抽出処理（毎回 re.search / findall で全文を解析）と
+utanet_extract の両方で解析し、結果が同じかを確認する。
+受信しながらの解析は、ローカルの HTTP サーバーから HttpClient で取得して
+チャンクの大きさを変えて確認し、受信したバイト数と解析時間も表示する。
+既定の HTTP 設定（チャンクの大きさ・読み捨ての上限）で、途中で打ち切れるページの受信量が全体より少ないことも確認する。
+
+例:
+    python benchmarks/check_utanet_extract.py
+    python benchmarks/check_utanet_extract.py --chunk-sizes 64 1024 8192 --repeat 200
+"""
+import argparse, functools, html, os, re, sys, threading, time
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import HttpClient
+from utanet_extract import (
+    SearchPageExtractor, SongPageExtractor, extract_search_rows, extract_song_info,
+)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "utanet")
+# 必要な部分がページの最後まで見つからない（全体を読むしかない）fixture
+READ_TO_END = {"search_none.html", "song_no_detail.html", "song_no_lyrics_area.html"}
+
+
+# --- 変更前の抽出処理（比較用にそのまま残す） ---
+
+def legacy_search_rows(html_text):
+    pattern = re.compile(
+        r'(?si)<tr[^>]*class="border-bottom"[^>]*>.*?'
+        r'/song/(\d+)/".*?songlist-title[^>]*>([^<]+)</span>.*?'
+        r'/artist/\d+/"[^>]*>([^<]+)</a>',
+        re.DOTALL
+    )
+    return pattern.findall(html_text)
+
+
+def legacy_song_info(html_text):
+    info = {"anime": "", "lyricist": "", "composer": "", "arranger": ""}
+    p_anime = re.search(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+mb-0[^"]*"[^>]*>(.*?)</p>', html_text)
+    if p_anime:
+        anime = re.sub(r'\s+', ' ', html.unescape(p_anime.group(1))).strip()
+        info["anime"] = anime
+    p_detail = re.search(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+detail\s+mb-0[^"]*"[^>]*>(.*?)</p>', html_text)
+    if p_detail:
+        text = re.sub(r'<[^>]+>', ' ', p_detail.group(1))
+        text = re.sub(r'\s+', ' ', html.unescape(text)).strip()
+    m = re.search(r'作詞：\s*(.+?)(?=\s*(作曲：|編曲：|発売日：|$))', text)
+    if m:
+        info["lyricist"] = m.group(1).strip()
+    m2 = re.search(r'作曲：\s*(.+?)(?=\s*(作詞：|編曲：|発売日：|$))', text)
+    if m2:
+        info["composer"] = m2.group(1).strip()
+    m3 = re.search(r'編曲：\s*(.+?)(?=\s*(作詞：|作曲：|発売日：|$))', text)
+    if m3:
+        info["arranger"] = m3.group(1).strip()
+    m4 = re.search(r'発売日：\s*([0-9]{4})/([0-9]{2})/([0-9]{2})', text)
+    if m4:
+        info["release_date"] = m4.group(0).replace("発売日：", "").strip()
+        info["year"] = m4.group(1)
+    else:
+        info["release_date"] = ""
+        info["year"] = ""
+    return info
+
+
+# --- 確認 ---
+
+class _Handler(SimpleHTTPRequestHandler):
+    extensions_map = {".html": "text/html; charset=utf-8"}
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    handler = functools.partial(_Handler, directory=FIXTURES)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def cpu_time(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 1024, 8192])
+    parser.add_argument("--repeat", type=int, default=50, help="解析時間を測る繰り返し回数")
+    args = parser.parse_args(argv)
+
+    server = start_server()
+    base = f"http://127.0.0.1:{server.server_address[1]}/"
+    clients = {n: HttpClient({"chunk_size": n, "rate_limit": 0}) for n in args.chunk_sizes}
+    clients["既定"] = HttpClient({"rate_limit": 0})
+    differences = 0
+    print(f"{'fixture':<26}{'全体KB':>8}" + "".join(f"{f'受信KB@{n}':>13}" for n in clients)
+          + f"{'従来ms':>9}{'新ms':>8}  結果")
+    try:
+        for name in sorted(os.listdir(FIXTURES)):
+            path = os.path.join(FIXTURES, name)
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            is_search = name.startswith("search")
+            legacy = legacy_search_rows if is_search else legacy_song_info
+            new = extract_search_rows if is_search else extract_song_info
+            try:
+                expected = legacy(text)
+            except NameError as e:
+                # 変更前は詳細ブロックがないページで例外になっていた
+                expected = f"従来は例外: {e}"
+            notes = []
+            if new(text) != expected:
+                notes.append("全文解析で不一致")
+
+            received = []
+            for n, client in clients.items():
+                extractor = SearchPageExtractor() if is_search else SongPageExtractor()
+                resp = client.get(base + name, consumer=extractor)
+                resp.raise_for_status()
+                received.append(resp.timing.bytes)
+                result = extractor.rows if is_search else extractor.info()
+                if result != expected:
+                    notes.append(f"受信しながらの解析で不一致 (chunk={n})")
+            if name not in READ_TO_END and received[-1] >= len(text.encode("utf-8")):
+                notes.append("既定の設定で受信を打ち切れていない")
+            if notes and not (isinstance(expected, str) and len(notes) == 1 + len(clients)):
+                differences += 1
+            note = "一致" if not notes else ("; ".join(notes) if not isinstance(expected, str) else expected)
+            old_ms = cpu_time(legacy, text, args.repeat) if not isinstance(expected, str) else float("nan")
+            new_ms = cpu_time(new, text, args.repeat)
+            print(f"{name:<26}{len(text.encode('utf-8')) / 1024:>8.1f}"
+                  + "".join(f"{b / 1024:>13.1f}" for b in received)
+                  + f"{old_ms:>9.3f}{new_ms:>8.3f}  {note}")
+    finally:
+        server.shutdown()
+        for client in clients.values():
+            client.close()
+    print(f"不一致: {differences} 件")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+ベンチマーク用の合成ライブラリ（.mp3/.flac/.m4a）の生成。
+
+アーティスト/アルバム/曲 のフォルダ構成で、実際のライブラリに近いタグ
+（タイトル・アーティスト・アルバム・トラック番号・埋め込み画像、一部は既存のクレジット付き）を書き込む。
+あわせて、uta-net の代わりに使う曲データ（catalog.json）を書き出す。
+catalog には同名のカバー曲（別アーティスト）も含み、ライブラリの一部の曲はあえて載せない（見つからない曲）。
+
+例:
+    python benchmarks/corpus.py /tmp/corpus --files 2000 --audio-kb 2048 --picture-kb 150
+"""
+import argparse, json, os, random, struct, sys
+
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TRCK, TCOM, TDRC, TXXX, COMM, APIC
+from mutagen.flac import FLAC, Picture
+from mutagen.mp4 import MP4, MP4Cover
+
+CATALOG_NAME = "catalog.json"
+
+TITLE_WORDS = ["夜", "空", "光", "紅蓮", "群青", "花火", "星屑", "夢", "風", "君", "僕ら", "恋", "青春", "約束",
+               "Summer", "Blue", "Night", "Dream", "Shine", "Rain", "Memories", "Future", "Hero", "Sky"]
+TITLE_FORMS = ["{a}", "{a}の{b}", "{a}と{b}", "{a} {b}", "{a}に駆ける", "{a}色の{b}", "{a}・{b}"]
+ARTIST_WORDS = ["LiSA", "YOASOBI", "Aimer", "ClariS", "fripSide", "May'n", "藍井エイル", "米津玄師", "Ado",
+                "緑黄色社会", "ヨルシカ", "スピッツ", "TK", "Eve", "milet", "春茶"]
+CREATOR_NAMES = ["草野華余子", "江口亮", "梶浦由記", "Ayase", "n-buna", "堀江晶太", "渡辺翔", "田淵智也",
+                 "神前暁", "澤野弘之", "岩里祐穂", "畑亜貴"]
+ANIME_FORMS = ["テレビアニメ「{t}」オープニングテーマ", "テレビアニメ「{t}」エンディングテーマ", "映画「{t}」主題歌", ""]
+# 検索で本来の曲とまぎらわしい版
+VARIANT_SUFFIXES = [" (TV size)", " -Instrumental-", " (Acoustic ver.)"]
+
+
+# --- 音声ファイルの骨組み（タグなし） ---
+
+def atom(name, data):
+    return struct.pack(">I", 8 + len(data)) + name + data
+
+
+def blank_mp3(path, audio_kb):
+    frame = b"\xff\xfb\x90\x64" + b"\x00" * 413
+    with open(path, "wb") as f:
+        f.write(frame * max(1, audio_kb * 1024 // len(frame)))
+
+
+def blank_flac(path, audio_kb):
+    si = struct.pack(">HH", 4096, 4096) + b"\x00\x00\x00" * 2
+    # サンプルレート 44100（20 ビット）・チャンネル数-1（3）・ビット深度-1（5）・総サンプル数（36）
+    v = (44100 << 44) | (1 << 41) | (15 << 36) | 0
+    si += v.to_bytes(8, "big") + b"\x00" * 16
+    with open(path, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80]) + len(si).to_bytes(3, "big") + si + b"\x00" * (audio_kb * 1024))
+
+
+def blank_m4a(path, audio_kb):
+    mvhd = atom(b"mvhd", b"\x00" * 4 + struct.pack(">IIII", 0, 0, 1000, 0) + b"\x00" * 80)
+    # サンプルテーブル相当の大きな atom（タグとは関係ないので読み飛ばせる）
+    filler = atom(b"free", b"\x00" * (audio_kb * 16))
+    with open(path, "wb") as f:
+        f.write(atom(b"ftyp", b"M4A \x00\x00\x00\x00M4A mp42isom")
+                + atom(b"mdat", b"\x00" * (audio_kb * 1024))
+                + atom(b"moov", mvhd + filler))
+
+
+# --- タグ付きファイル ---
+
+def write_mp3(path, track, audio_kb, picture):
+    blank_mp3(path, audio_kb)
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text=[track["title"]]))
+    tags.add(TPE1(encoding=3, text=[track["artist"]]))
+    tags.add(TALB(encoding=3, text=[track["album"]]))
+    tags.add(TRCK(encoding=3, text=[str(track["number"])]))
+    if track.get("composer"):
+        tags.add(TCOM(encoding=3, text=[track["composer"]]))
+    if track.get("lyricist"):
+        tags.add(TXXX(encoding=3, desc="LYRICIST", text=[track["lyricist"]]))
+    if track.get("year"):
+        tags.add(TDRC(encoding=3, text=[track["year"]]))
+    if track.get("comment"):
+        tags.add(COMM(encoding=3, lang="eng", desc="", text=[track["comment"]]))
+    if picture:
+        tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=picture))
+    tags.save(path, v2_version=3)
+
+
+def write_flac(path, track, audio_kb, picture):
+    blank_flac(path, audio_kb)
+    audio = FLAC(path)
+    if picture:
+        pic = Picture()
+        pic.type, pic.mime, pic.data = 3, "image/jpeg", picture
+        audio.add_picture(pic)
+    audio["TITLE"] = track["title"]
+    audio["ARTIST"] = track["artist"]
+    audio["ALBUM"] = track["album"]
+    audio["TRACKNUMBER"] = str(track["number"])
+    for key, field in (("COMPOSER", "composer"), ("DATE", "year"), ("COMMENT", "comment")):
+        if track.get(field):
+            audio[key] = track[field]
+    audio.save()
+
+
+def write_m4a(path, track, audio_kb, picture):
+    blank_m4a(path, audio_kb)
+    audio = MP4(path)
+    audio.add_tags()
+    audio.tags["\xa9nam"] = [track["title"]]
+    audio.tags["\xa9ART"] = [track["artist"]]
+    audio.tags["\xa9alb"] = [track["album"]]
+    audio.tags["trkn"] = [(track["number"], 0)]
+    for key, field in (("\xa9wrt", "composer"), ("\xa9lyr", "lyricist"), ("\xa9day", "year"), ("\xa9cmt", "comment")):
+        if track.get(field):
+            audio.tags[key] = [track[field]]
+    if picture:
+        audio.tags["covr"] = [MP4Cover(picture, imageformat=MP4Cover.FORMAT_JPEG)]
+    audio.save()
+
+
+WRITERS = {".mp3": write_mp3, ".flac": write_flac, ".m4a": write_m4a}
+
+
+# --- 生成 ---
+
+def _title(rng):
+    a, b = rng.sample(TITLE_WORDS, 2)
+    return rng.choice(TITLE_FORMS).format(a=a, b=b)
+
+
+def _song(rng, song_id, title, artist, artist_id):
+    anime = rng.choice(ANIME_FORMS).format(t=_title(rng))
+    return {
+        "id": song_id, "title": title, "artist": artist, "artist_id": artist_id,
+        "lyricist": rng.choice(CREATOR_NAMES + [artist]), "composer": rng.choice(CREATOR_NAMES),
+        "arranger": rng.choice(CREATOR_NAMES + [""]), "anime": anime,
+        "release": f"{rng.randrange(1995, 2025)}/{rng.randrange(1, 13):02d}/{rng.randrange(1, 29):02d}",
+    }
+
+
+def generate(folder, files, audio_kb=1024, picture_kb=100, seed=0, miss_rate=0.1, credited_rate=0.3):
+    """
+    folder に files 件の音源と catalog.json を作る。生成したファイルのパスのリストを返す。
+    miss_rate: catalog に載せない曲の割合 / credited_rate: 既にクレジットが入っている曲の割合
+    """
+    rng = random.Random(seed)
+    picture = rng.randbytes(picture_kb * 1024) if picture_kb else b""
+    artists = list(ARTIST_WORDS)
+    rng.shuffle(artists)
+    artist_ids = {name: 1000 + i for i, name in enumerate(artists)}
+    songs = []
+    next_id = 10000
+    paths = []
+    used_titles = set()
+    exts = list(WRITERS)
+
+    made = 0
+    album_no = 0
+    while made < files:
+        artist = artists[album_no % len(artists)]
+        album_no += 1
+        album = f"{_title(rng)} ({album_no})"
+        ext = exts[album_no % len(exts)]
+        album_dir = os.path.join(folder, artist, album)
+        os.makedirs(album_dir, exist_ok=True)
+        for number in range(1, min(rng.randrange(8, 15), files - made) + 1):
+            title = _title(rng)
+            while (title, artist) in used_titles:
+                title += rng.choice(["!", "～", " II"])
+            used_titles.add((title, artist))
+            track = {"title": title, "artist": artist, "album": album, "number": number}
+            if rng.random() >= miss_rate:
+                song = _song(rng, next_id, title, artist, artist_ids[artist])
+                songs.append(song)
+                next_id += 1
+                # 同名のカバー曲・別バージョン（検索結果の候補が複数になる）
+                for _ in range(rng.choice([0, 0, 1, 2])):
+                    other = rng.choice(artists)
+                    cover_title = title + (rng.choice(VARIANT_SUFFIXES) if other == artist else "")
+                    songs.append(_song(rng, next_id, cover_title, other, artist_ids[other]))
+                    next_id += 1
+                if rng.random() < credited_rate:
+                    track.update(composer=song["composer"], lyricist=song["lyricist"], year=song["release"][:4],
+                                 comment=song["anime"])
+            path = os.path.join(album_dir, f"{number:02d} {title.replace('/', '_')}{ext}")
+            WRITERS[ext](path, track, audio_kb, picture)
+            paths.append(path)
+            made += 1
+
+    rng.shuffle(songs)
+    with open(os.path.join(folder, CATALOG_NAME), "w", encoding="utf-8") as f:
+        json.dump({"songs": songs}, f, ensure_ascii=False)
+    return paths
+
+
+def load_catalog(folder):
+    with open(os.path.join(folder, CATALOG_NAME), encoding="utf-8") as f:
+        return json.load(f)["songs"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder", help="出力先フォルダ")
+    parser.add_argument("--files", type=int, default=500, help="作るファイル数")
+    parser.add_argument("--audio-kb", type=int, default=1024, help="音声データの大きさ（KB）")
+    parser.add_argument("--picture-kb", type=int, default=100, help="埋め込み画像の大きさ（KB、0 で画像なし）")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="catalog に載せない（見つからない）曲の割合")
+    parser.add_argument("--credited-rate", type=float, default=0.3, help="既にクレジットが入っている曲の割合")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    paths = generate(args.folder, args.files, args.audio_kb, args.picture_kb, args.seed,
+                     args.miss_rate, args.credited_rate)
+    print(f"{len(paths)} 件のファイルと {CATALOG_NAME} を作成しました: {args.folder}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
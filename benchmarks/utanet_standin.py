@@ -0,0 +1,211 @@
+"""
+uta-net の代わりに使うローカル HTTP サーバー（オフラインのベンチマーク用）。
+
+catalog.json（benchmarks/corpus.py が作る）の曲データから、検索ページ・曲ページ・歌手ページを返す。
+ページは fixtures/utanet の記録済み HTML を雛形にして、結果の表と曲の詳細ブロックだけを差し替えるので、
+大きさ・構造は実際のページに近い。応答の遅延（平均とばらつき）と、503・接続リセットの発生率を指定できる。
+
+単独で起動する例:
+    python benchmarks/utanet_standin.py /tmp/corpus --port 8080 --latency-ms 80 --error-rate 0.02
+"""
+import argparse, html, os, random, re, sys, threading, time
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import load_catalog
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "utanet")
+# 1 ページに載せる検索結果の上限
+MAX_ROWS = 50
+
+SONG_RE = re.compile(r"^/song/(\d+)/$")
+ARTIST_RE = re.compile(r"^/artist/(\d+)/$")
+
+
+def _split_template(name, start_marker, end_marker):
+    """雛形を (差し替える部分より前, 後) に分ける"""
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        text = f.read()
+    start = text.index(start_marker) + len(start_marker)
+    end = text.index(end_marker, start)
+    return text[:start], text[end:]
+
+
+class Catalog:
+    """曲データの索引"""
+
+    def __init__(self, songs):
+        self.songs = {s["id"]: s for s in songs}
+        self.by_artist = defaultdict(list)
+        for s in songs:
+            self.by_artist[s["artist_id"]].append(s)
+
+    def search(self, keyword):
+        keyword = keyword.lower()
+        return [s for s in self.songs.values() if keyword in s["title"].lower()][:MAX_ROWS]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # クライアントが受信を打ち切った（中断・途中終了）だけなら何も出さない
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StandIn:
+    """
+    catalog の曲を返すサーバー。start() でバックグラウンドのスレッドで動き、ベース URL を返す。
+    stats: 経路ごとのリクエスト数と、わざと返した 503・接続リセットの件数
+    """
+
+    def __init__(self, songs, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, reset_rate=0.0, seed=0,
+                 host="127.0.0.1", port=0):
+        self.catalog = Catalog(songs)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.reset_rate = reset_rate
+        self.stats = defaultdict(int)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._search_page = _split_template("search_single.html", '<tbody class="songlist-table-body">', "</tbody>")
+        self._song_page = _split_template("song_full.html", '<main class="container">', "</main>")
+        self.server = _Server((host, port), self._handler_class())
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # --- ページ ---
+
+    def _rows(self, songs):
+        parts = []
+        for s in songs:
+            parts.append(
+                '<tr class="border-bottom">\n'
+                f'<td class="sp-w-100 pt-0 pt-lg-2"><a href="/song/{s["id"]}/" class="py-2 py-lg-0">'
+                f'<span class="fw-bold songlist-title pb-1 pb-lg-0">{html.escape(s["title"])}</span>'
+                '<span class="d-block d-lg-none utaidashi text-truncate">歌い出し…</span></a></td>\n'
+                f'<td class="sp-none fw-bold"><a href="/artist/{s["artist_id"]}/">{html.escape(s["artist"])}</a></td>\n'
+                f'<td class="sp-none fw-bold">{html.escape(s["lyricist"])}</td>\n'
+                f'<td class="sp-none fw-bold">{html.escape(s["composer"])}</td>\n'
+                f'<td class="sp-none fw-bold">{html.escape(s["arranger"])}</td>\n'
+                '<td class="d-none d-lg-table-cell text-truncate">歌い出しの一節がここに入ります</td>\n'
+                '</tr>\n'
+            )
+        head, tail = self._search_page
+        return head + "\n" + "".join(parts) + tail
+
+    def _song(self, s):
+        detail = [f'作詞：<a href="/lyricist/1/">{html.escape(s["lyricist"])}</a><br>',
+                  f'作曲：<a href="/composer/2/">{html.escape(s["composer"])}</a><br>']
+        if s["arranger"]:
+            detail.append(f'編曲：<a href="/arranger/3/">{html.escape(s["arranger"])}</a><br>')
+        detail.append(f'発売日：{s["release"]}<br>\nこの曲の表示回数：1,234回')
+        anime = f'<p class="ms-2 ms-md-3 mb-0">{html.escape(s["anime"])}</p>\n' if s["anime"] else ""
+        body = (
+            f'\n<div class="song-rightside"><h2 class="ms-2 ms-md-3 kashi-title">{html.escape(s["title"])}</h2>\n'
+            f'<h3 class="ms-2 ms-md-3"><a href="/artist/{s["artist_id"]}/">{html.escape(s["artist"])}</a></h3>\n'
+            f'{anime}<p class="ms-2 ms-md-3 detail mb-0">' + "\n".join(detail) + '</p>\n</div>\n'
+            '<div id="kashi_area" itemprop="text">' + "<br>\n".join(["歌詞の一節がここに入ります"] * 30) + '</div>\n'
+        )
+        head, tail = self._song_page
+        return head + body + tail
+
+    def render(self, path, query):
+        """(ステータス, 本文, 経路名) を返す"""
+        if path.startswith("/search"):
+            keyword = query.get("Keyword", [""])[0]
+            return 200, self._rows(self.catalog.search(keyword)), "search"
+        m = SONG_RE.match(path)
+        if m:
+            song = self.catalog.songs.get(int(m.group(1)))
+            return (200, self._song(song), "song") if song else (404, "not found", "song")
+        m = ARTIST_RE.match(path)
+        if m:
+            return 200, self._rows(self.catalog.by_artist.get(int(m.group(1)), [])), "artist"
+        return 404, "not found", "other"
+
+    def _fault(self):
+        """この応答でわざと起こす障害（None / "error" / "reset"）と遅延"""
+        with self._lock:
+            r = self._rng.random()
+            delay = max(0.0, self._rng.uniform(self.latency - self.jitter, self.latency + self.jitter))
+        if r < self.error_rate:
+            return "error", delay
+        if r < self.error_rate + self.reset_rate:
+            return "reset", delay
+        return None, delay
+
+    def _handler_class(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, text, route = standin.render(url.path, parse_qs(url.query))
+                fault, delay = standin._fault()
+                with standin._lock:
+                    standin.stats[route] += 1
+                    if fault:
+                        standin.stats[fault] += 1
+                if delay:
+                    time.sleep(delay)
+                if fault == "error":
+                    status, text = 503, "Service Unavailable"
+                body = text.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if fault == "reset":
+                    # 途中まで送って切断する
+                    self.wfile.write(body[:len(body) // 3])
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("corpus", help="catalog.json のあるフォルダ（benchmarks/corpus.py で作成）")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="応答までの平均の遅延")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="遅延のばらつき（±）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す割合")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="途中で接続を切る割合")
+    args = parser.parse_args(argv)
+    standin = StandIn(load_catalog(args.corpus), args.latency_ms, args.jitter_ms, args.error_rate, args.reset_rate,
+                      port=args.port)
+    print(f"検索: {standin.base_url}/search/?Aselect=2&Keyword={{}}")
+    print(f"曲ページ: {standin.base_url}/song/{{}}/")
+    print(f"歌手ページ: {standin.base_url}/artist/{{}}/")
+    try:
+        standin.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
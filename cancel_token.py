@@ -0,0 +1,161 @@
+"""
+実行の中断と、1 ファイルあたりの持ち時間。
+
+CancelToken は 1 回の実行全体の中断の合図で、cancel() すると待ち（レート制限・ブレーカー・再試行の間隔）を
+すぐに終わらせ、on_cancel() で登録された処理（通信中のソケットを閉じるなど）を呼ぶ。
+中断は Cancelled 例外で伝わる。asyncio.CancelledError と同じく BaseException の派生なので、
+通信エラーを except Exception でまとめて扱っている箇所でも握りつぶされない。
+
+Deadline は 1 ファイル分の持ち時間で、中断は親の CancelToken に従う。期限を過ぎると DeadlineExceeded になる。
+パイプラインのワーカーは処理中のジョブのトークンを activate() しておき、http_client は current_token() で参照する。
+"""
+import threading, time
+from contextlib import contextmanager
+
+
+class Cancelled(BaseException):
+    """実行が中断された"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """1 ファイルの持ち時間を使い切った"""
+
+
+class CancelToken:
+    """実行全体の中断の合図。どのスレッドから cancel() してもよい"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.cancelled_at = None
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.cancelled_at = time.monotonic()
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception:
+                pass
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def on_cancel(self, fn):
+        """中断時に fn() を呼ぶ（既に中断されていればすぐ呼ぶ）。remove() で解除する"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def remove(self, fn):
+        with self._lock:
+            try:
+                self._callbacks.remove(fn)
+            except ValueError:
+                pass
+
+    def check(self):
+        """中断されていれば Cancelled を送出する"""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def sleep(self, seconds, deadline=False):
+        """seconds 秒待つ。途中で中断されたら Cancelled を送出する"""
+        if self._event.wait(seconds):
+            raise Cancelled()
+
+    # 持ち時間のない実行全体のトークンとしても Deadline と同じように使えるようにする
+    def expired(self):
+        return False
+
+    def remaining(self):
+        return None
+
+    def extend(self, seconds):
+        pass
+
+    def timeout(self, timeout):
+        return timeout
+
+    def child(self, budget):
+        """このトークンに従う、budget 秒の持ち時間を作る"""
+        return Deadline(self, budget)
+
+
+class Deadline:
+    """1 ファイル分の持ち時間（budget 秒）。中断は親の CancelToken に従う"""
+
+    def __init__(self, token, budget):
+        self.token = token
+        self.budget = budget
+        self.expires = time.monotonic() + budget
+
+    def is_cancelled(self):
+        return self.token.is_cancelled()
+
+    def on_cancel(self, fn):
+        self.token.on_cancel(fn)
+
+    def remove(self, fn):
+        self.token.remove(fn)
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def remaining(self):
+        return max(self.expires - time.monotonic(), 0.0)
+
+    def extend(self, seconds):
+        """ファイル自身のせいではない待ち（共有のレート制限・ブレーカー）の分だけ期限を延ばす"""
+        self.expires += seconds
+
+    def _exceeded(self):
+        return DeadlineExceeded(f"1 ファイルの持ち時間 {self.budget:g} 秒を超えました")
+
+    def check(self):
+        """中断されていれば Cancelled、期限を過ぎていれば DeadlineExceeded を送出する"""
+        self.token.check()
+        if self.expired():
+            raise self._exceeded()
+
+    def sleep(self, seconds, deadline=False):
+        """
+        seconds 秒待つ。中断されたら Cancelled を送出する。
+        deadline=True なら期限までに待ち終わらない場合、待たずに DeadlineExceeded を送出する
+        """
+        if deadline and seconds >= self.remaining():
+            raise self._exceeded()
+        self.token.sleep(seconds)
+
+    def timeout(self, timeout):
+        """requests に渡すタイムアウト（秒、または (接続, 受信)）を残りの持ち時間に収める"""
+        remaining = max(self.remaining(), 0.01)
+        if isinstance(timeout, tuple):
+            return tuple(min(t, remaining) for t in timeout)
+        return min(timeout, remaining)
+
+
+_local = threading.local()
+
+
+def current_token():
+    """このスレッドで activate() されているトークン。なければ None"""
+    return getattr(_local, "token", None)
+
+
+@contextmanager
+def activate(token):
+    """with の中でこのスレッドの current_token() を token にする"""
+    previous = current_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
@@ -0,0 +1,124 @@
+"""
+変更プラン（ドライラン）の書き出しと適用。
+
+ドライラン（options["dry_run"]）で取得まで行ったジョブを plan_record() で 1 行 1 件の JSON にし、
+確認・編集した後で apply_plan() に渡すと、実際に値が変わるファイルだけを書き込む。
+通信（取得）とディスク（書き込み）を別の時間に実行でき、変化のないファイルには触れない。
+
+1 件の形式:
+    {"path": ..., "size": バイト数, "mtime_ns": 更新時刻, "status": "planned" など,
+     "title": ..., "artist": ..., "song_id": ...,
+     "changes": {ロール: {"before": 現在の値, "after": 書き込む値}, ...}}
+適用時にサイズか更新時刻がプラン作成時と違うファイルは、古いプランとして書き込まない。
+changes から項目を消せば、そのロールは書き込まない。
+"""
+import json, os
+
+from credit_core import (
+    open_tags, apply_credit_tags, snapshot_from_tags, ROLES, ROLE_FIELDS,
+    STATUS_UPDATED, STATUS_STALE, STATUS_ERROR,
+)
+from library_index import get_library_index
+
+
+def plan_record(job):
+    """ドライランのジョブをプランの 1 件にする（変更がないファイル・見つからなかった曲も含める）"""
+    size, mtime_ns = job.data.get("stat", (None, None))
+    before = job.data.get("before")
+    changes = {
+        role: {"before": getattr(before, ROLE_FIELDS[role]) if before else "", "after": value}
+        for role, value in job.data.get("changes", {}).items()
+    }
+    record = {
+        "path": job.item,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "status": STATUS_ERROR if job.error is not None else job.data.get("status", STATUS_ERROR),
+        "title": job.data.get("title", ""),
+        "artist": job.data.get("artist", ""),
+        "song_id": job.data.get("song_id"),
+        "changes": changes,
+    }
+    if job.error is not None:
+        record["message"] = f"{type(job.error).__name__}: {job.error}"
+    elif "message" in job.data:
+        record["message"] = job.data["message"]
+    return record
+
+
+def load_plan(path):
+    """プランを読み込み、変更があるものだけを返す"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: プランの形式が正しくありません: {e}") from None
+            if record.get("changes"):
+                records.append(record)
+    return records
+
+
+def apply_plan_record(record):
+    """
+    プランの 1 件を書き込む。(結果の辞書, ログ行, TreeView の行または None) を返す。
+    結果の辞書は credit_core.job_record() と同じ形式
+    """
+    path = record["path"]
+    name = os.path.basename(path)
+    values = {role: change["after"] for role, change in record["changes"].items() if role in ROLES}
+    result = {"path": path, "status": STATUS_UPDATED, "title": record.get("title", ""),
+              "artist": record.get("artist", ""), "song_id": record.get("song_id"), "values": values, "results": {}}
+    lines = []
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        result["status"] = STATUS_ERROR
+        result["message"] = str(e)
+        return result, [f"{name} → {e}"], None
+    if (st.st_size, st.st_mtime_ns) != (record.get("size"), record.get("mtime_ns")):
+        result["status"] = STATUS_STALE
+        result["message"] = "プラン作成後にファイルが変更されています"
+        return result, [f"{name} → プラン作成後にファイルが変更されているためスキップ"], None
+
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        parsed = open_tags(path)
+    except Exception:
+        # 解析できない場合のエラーメッセージは apply_credit_tags に任せる
+        parsed = None
+        before = None
+    else:
+        before = snapshot_from_tags(ext, parsed[1], st.st_size)
+    # 上書きするかどうかはプラン作成時に判定済み
+    results, changes = apply_credit_tags(path, values, {role: True for role in values}, parsed=parsed)
+    result["results"] = results
+    result["values"] = changes
+    lines.extend(results.values())
+    if before is None:
+        result["status"] = STATUS_ERROR
+        return result, lines, None
+
+    snapshot = before.applied(changes, size=os.path.getsize(path) if changes else None)
+    row = snapshot.row()
+    index = get_library_index()
+    if index:
+        index.update_file(path, row)
+    lines.append(f"更新完了: {name}")
+    return result, lines, row
+
+
+def apply_plan(records, on_result, should_stop=None):
+    """
+    records（load_plan() の結果）を順に書き込む。1 件ごとに on_result(結果, ログ行, 行) が呼ばれる。
+    中断した場合は True を返す
+    """
+    for record in records:
+        if should_stop and should_stop():
+            return True
+        on_result(*apply_plan_record(record))
+    return False
@@ -0,0 +1,496 @@
+"""
+タグ書い太郎のコマンドライン版（ヘッドレス実行用）。
+
+GUI と同じ credit_core を使い、tkinter は読み込まない。cron などから実行できる。
+各ファイルの結果は 1 行 1 件の JSON（JSONL）で出力し、ログは標準エラーに出す。
+
+例:
+    python credit_cli.py /music/anime --mode B --overwrite composer --concurrency 4 -o result.jsonl
+
+書き込まずに変更プランだけを作り、確認してから適用する:
+    python credit_cli.py /music/anime --mode B --plan plan.jsonl
+    python credit_cli.py --apply plan.jsonl
+
+手元の曲情報（CSV / JSONL）を取り込み、通信せずにタグを書き込む:
+    python credit_cli.py --import-credits credits.csv
+    python credit_cli.py /music/anime --source local-only
+
+フォルダを監視し、追加・変更されたファイルだけをその都度処理する（Ctrl+C / SIGTERM で終了）:
+    python credit_cli.py /music/inbox --mode B --watch --watch-interval 5 --settle 10
+
+大きなライブラリを 4 つのシャード（別プロセス）に分けて処理し、結果を 1 つにまとめる:
+    python credit_cli.py /vol1/music /vol2/music --mode B --shards 4 -o result.jsonl
+
+複数のマシンで分けて処理する（同じフォルダ・同じ総数を指定し、最後に結果をまとめる）:
+    python credit_cli.py /mnt/music --shard 1/2 -o shard1.jsonl     # マシン A
+    python credit_cli.py /mnt/music --shard 2/2 -o shard2.jsonl     # マシン B
+    python credit_cli.py --merge shard1.jsonl shard2.jsonl -o result.jsonl
+
+中断・異常終了した実行を、完了済みのファイルを飛ばして続ける:
+    python credit_cli.py /music/anime --mode B --resume
+
+処理ごとの件数・所要時間を node exporter の textfile collector 向けに書き出す:
+    python credit_cli.py /music/anime --metrics-prom /var/lib/node_exporter/textfile/creditget.prom
+
+終了コード: 0 = 正常 / 1 = 通信エラー・書き込みエラーなどの失敗あり / 2 = 引数エラー / 130 = 中断
+"""
+import argparse, json, os, signal, sys, time
+
+from credit_core import (
+    run_enrichment, default_options, job_record, ROLES, DEFAULT_B_TEMPLATE, FAILURE_STATUSES,
+    DEFAULT_MATCH_THRESHOLD, DEFAULT_FILE_DEADLINE, new_batch_resolver,
+    SOURCE_NETWORK, SOURCE_LOCAL_FIRST, SOURCE_LOCAL_ONLY,
+)
+from credit_store import get_credit_store, format_store_stats
+from change_plan import plan_record, load_plan, apply_plan
+from run_journal import open_run_journal, format_journal_skip
+from batch_resolver import format_batch_stats
+from http_client import get_client, format_stats, configure as configure_http, HTTP_CONFIG
+from lookup_cache import get_lookup_cache, format_cache_stats
+from library_scanner import iter_audio_files
+from enrich_engine import format_progress, DEFAULT_CONCURRENCY, MAX_CONCURRENCY
+from metrics import get_metrics, timed, format_metrics, write_snapshot
+from folder_watcher import FolderWatcher, watch, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE
+from shard_runner import (
+    parse_shard, select_shard, shard_rate, journal_path, run_shards, shard_outputs, metrics_path, merge_reports,
+    merge_metrics, SHARD_BY, DEFAULT_SHARD_DIR,
+)
+from cancel_token import CancelToken
+
+# --overwrite で指定できる英語名
+ROLE_ALIASES = {
+    "comment": "コメント",
+    "lyricist": "作詞者",
+    "composer": "作曲者",
+    "remixer": "リミキサー",
+    "year": "発売年",
+}
+
+# --source で指定できる名前
+SOURCE_ALIASES = {
+    "network": SOURCE_NETWORK,
+    "local-first": SOURCE_LOCAL_FIRST,
+    "local-only": SOURCE_LOCAL_ONLY,
+}
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_INTERRUPTED = 130
+
+
+def parse_role(value):
+    role = ROLE_ALIASES.get(value.lower(), value)
+    if role not in ROLES:
+        raise argparse.ArgumentTypeError(
+            f"未知のタグ: {value}（{', '.join(list(ROLE_ALIASES) + list(ROLES))} のいずれか）")
+    return role
+
+
+def shard_arg(value):
+    try:
+        return parse_shard(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_parser():
+    # --shards のコーディネーターは引数の名前でシャードに渡すものを選ぶので、省略形は受け付けない
+    parser = argparse.ArgumentParser(
+        prog="credit_cli.py",
+        allow_abbrev=False,
+        description="uta-net から曲情報を取得して音声ファイルのクレジットタグを書き込みます（GUI なし）。",
+    )
+    parser.add_argument("folders", nargs="*", help="音源フォルダ（.mp3/.flac/.m4a を再帰的に処理）")
+    parser.add_argument("--mode", choices=("A", "B"), default="A",
+                        help="書き込み形式 A=個別形式 / B=統合形式（既定: A）")
+    parser.add_argument("--template", default=DEFAULT_B_TEMPLATE,
+                        help="タイプB で作曲者タグに書き込む書式（{lyricist} {composer} {arranger}）")
+    parser.add_argument("--integrate", action="store_true",
+                        help="タイプA で、形式上書き込めないタグを作曲者タグに統合する")
+    parser.add_argument("--overwrite", action="append", type=parse_role, default=[], metavar="TAG",
+                        help="既存値を上書きするタグ（comment/lyricist/composer/remixer/year、複数指定可）")
+    parser.add_argument("--overwrite-all", action="store_true", help="すべてのタグを上書きする")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同時に問い合わせるファイル数（1〜{MAX_CONCURRENCY}、既定: {DEFAULT_CONCURRENCY}）")
+    parser.add_argument("--match-threshold", type=float, default=DEFAULT_MATCH_THRESHOLD,
+                        help=f"候補を採用する一致度のしきい値（0〜1、既定: {DEFAULT_MATCH_THRESHOLD:.2f}）")
+    parser.add_argument("--file-timeout", type=float, default=DEFAULT_FILE_DEADLINE, metavar="SECONDS",
+                        help="1 ファイルの取得にかける時間の上限（再試行を含む、0 で無制限、"
+                             f"既定: {DEFAULT_FILE_DEADLINE:g} 秒）")
+    parser.add_argument("--batch-by-artist", action="store_true",
+                        help="同じアーティストの曲は歌手ページの曲一覧から選び、曲ごとの検索を減らす")
+    parser.add_argument("--no-cache", action="store_true", help="キャッシュを読まずに再取得する")
+    parser.add_argument("--source", choices=tuple(SOURCE_ALIASES), default="network",
+                        help="曲情報の取得元 network=uta-net / local-first=取り込んだ曲情報を先に引き、なければ uta-net"
+                             " / local-only=取り込んだ曲情報のみ（通信しない）（既定: network）")
+    parser.add_argument("--import-credits", action="append", default=[], metavar="FILE",
+                        help="処理の前に CSV / JSONL の曲情報をローカルのストアに取り込む（複数指定可。"
+                             "フォルダを指定しなければ取り込みだけ行う）")
+    parser.add_argument("--replace-credits", action="store_true",
+                        help="--import-credits の前に、取り込み済みの曲情報をすべて消す")
+    parser.add_argument("--plan", metavar="FILE",
+                        help="タグを書き込まず、ファイルごとの変更予定（プラン）を JSONL で FILE に書き出す")
+    parser.add_argument("--apply", metavar="FILE",
+                        help="--plan で作ったプランのうち、値が変わるファイルだけを書き込む（取得は行わない）")
+    parser.add_argument("--resume", action="store_true",
+                        help="前回の実行で完了し、その後変更されていないファイルを飛ばして続きから処理する")
+    parser.add_argument("--watch", action="store_true",
+                        help="処理後も終了せずにフォルダを監視し、追加・変更されたファイルだけを処理する"
+                             "（--resume と併用すると、起動時に未完了のファイルも処理する）")
+    parser.add_argument("--watch-interval", type=float, default=DEFAULT_POLL_INTERVAL, metavar="SECONDS",
+                        help=f"--watch でフォルダを走査する間隔（既定: {DEFAULT_POLL_INTERVAL:g} 秒）")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE, metavar="SECONDS",
+                        help="--watch で、サイズと更新時刻がこの秒数変わらなくなったファイルを処理する"
+                             f"（コピー途中のファイルを避ける、既定: {DEFAULT_SETTLE:g} 秒）")
+    parser.add_argument("--rate-limit", type=float, default=None, metavar="PER_SEC",
+                        help="uta-net への平均リクエスト数の上限（件/秒、0 で無制限、"
+                             f"既定: {HTTP_CONFIG['rate_limit']:g}）。シャード実行では全シャードの合計の上限")
+    parser.add_argument("--shards", type=int, metavar="N",
+                        help="ファイルを N 個のシャードに分け、シャードごとのプロセスで並行して処理して結果をまとめる")
+    parser.add_argument("--shard", type=shard_arg, metavar="I/N",
+                        help="N 個に分けたうちの I 番目のシャードだけを処理する（複数のマシンで分けて処理する場合）")
+    parser.add_argument("--shard-by", choices=SHARD_BY, default="path",
+                        help="シャードの分け方 path=パスのハッシュ / volume=指定したフォルダごと（既定: path）")
+    parser.add_argument("--shard-dir", default=DEFAULT_SHARD_DIR, metavar="DIR",
+                        help="--shards で各シャードの結果・ログ・計測値を置くフォルダ")
+    parser.add_argument("--merge", nargs="+", metavar="FILE",
+                        help="シャードの結果（JSONL）を 1 つにまとめて出力する。.json のファイルは計測値としてまとめる")
+    parser.add_argument("--metrics-json", metavar="FILE", help="終了時に処理ごとの件数・所要時間を JSON で書き出す")
+    parser.add_argument("--metrics-prom", metavar="FILE",
+                        help="終了時に同じ計測値を Prometheus の textfile 形式で書き出す（node exporter 用）")
+    parser.add_argument("-o", "--output", help="JSONL の出力先（既定: 標準出力）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="ファイルごとのログを出さない")
+    return parser
+
+
+@timed("scan")
+def collect_files(folders):
+    files = []
+    for folder in folders:
+        files.extend(path for path, _, _ in iter_audio_files(folder))
+    return files
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.apply and (args.folders or args.plan):
+        parser.error("--apply はフォルダ・--plan と同時に指定できません")
+    if args.resume and (args.apply or args.plan):
+        parser.error("--resume は --plan / --apply と同時に指定できません")
+    if args.watch and (args.apply or args.plan):
+        parser.error("--watch は --plan / --apply と同時に指定できません")
+    if args.merge and (args.folders or args.apply or args.import_credits):
+        parser.error("--merge はフォルダ・--apply・--import-credits と同時に指定できません")
+    if args.shards is not None and not args.shards >= 1:
+        parser.error("--shards は 1 以上で指定してください")
+    if (args.shards or args.shard) and (args.watch or args.plan or args.apply):
+        parser.error("--shards / --shard は --watch / --plan / --apply と同時に指定できません")
+    if args.shards and args.shard:
+        parser.error("--shards と --shard は同時に指定できません")
+    if args.rate_limit is not None and args.rate_limit < 0:
+        parser.error("--rate-limit は 0 以上で指定してください")
+    if args.watch_interval <= 0 or args.settle < 0:
+        parser.error("--watch-interval は 0 より大きく、--settle は 0 以上で指定してください")
+    if args.replace_credits and not args.import_credits:
+        parser.error("--replace-credits は --import-credits と同時に指定してください")
+    if not args.apply and not args.merge and not args.folders and not args.import_credits:
+        parser.error("音源フォルダを指定してください")
+    for folder in args.folders:
+        if not os.path.isdir(folder):
+            parser.error(f"フォルダが見つかりません: {folder}")
+    if not 1 <= args.concurrency <= MAX_CONCURRENCY:
+        parser.error(f"--concurrency は 1〜{MAX_CONCURRENCY} で指定してください")
+    if not 0 <= args.match_threshold <= 1:
+        parser.error("--match-threshold は 0〜1 で指定してください")
+    if args.file_timeout < 0:
+        parser.error("--file-timeout は 0 以上で指定してください")
+
+    def log(msg):
+        print(msg, file=sys.stderr, flush=True)
+
+    if args.merge:
+        return run_merge(args, log)
+    rate_limit = HTTP_CONFIG["rate_limit"] if args.rate_limit is None else args.rate_limit
+    if args.shard:
+        # 全シャードの合計が全体の上限を超えないよう、1 シャード分に割る
+        rate_limit, burst = shard_rate(rate_limit, HTTP_CONFIG["rate_burst"], *args.shard)
+        configure_http(rate_limit=rate_limit, rate_burst=burst)
+    elif args.rate_limit is not None:
+        configure_http(rate_limit=rate_limit)
+
+    overwrite = {role: args.overwrite_all or role in args.overwrite for role in ROLES}
+    options = default_options(
+        use_cache=not args.no_cache,
+        mode=args.mode,
+        template=args.template,
+        integrate=args.integrate,
+        overwrite=overwrite,
+        match_threshold=args.match_threshold,
+        batch_by_artist=args.batch_by_artist,
+        dry_run=bool(args.plan),
+        file_deadline=args.file_timeout,
+        credit_source=SOURCE_ALIASES[args.source],
+    )
+    resolver = new_batch_resolver(options)
+
+    # Ctrl+C / SIGTERM では通信中のリクエストを打ち切って止める。書き込み中のファイルは最後まで処理する
+    stop = {"requested": False, "at": None}
+    cancel = CancelToken()
+
+    def request_stop(signum, frame):
+        if not stop["requested"]:
+            log("中断要求を受け付けました。書き込み中のファイルだけ最後まで処理して止めます...")
+            stop["at"] = time.monotonic()
+        stop["requested"] = True
+        cancel.cancel()
+
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, request_stop)
+    if hasattr(signal, "SIGBREAK"):
+        # Windows で --shards のコーディネーターから送られる CTRL_BREAK_EVENT
+        signal.signal(signal.SIGBREAK, request_stop)
+
+    if args.apply:
+        return run_apply(args, log, stop)
+
+    store = None
+    if args.import_credits or options["credit_source"] != SOURCE_NETWORK:
+        store = get_credit_store()
+        if store is None:
+            log("取り込んだ曲情報のストアを開けません")
+            return EXIT_FAILED
+    if args.import_credits:
+        if not import_credits(args, log, store):
+            return EXIT_FAILED
+        if not args.folders:
+            return EXIT_OK
+    if args.shards:
+        return run_coordinator(args, sys.argv[1:] if argv is None else argv, log, stop)
+    if store and options["credit_source"] != SOURCE_NETWORK and not store.count():
+        log("取り込んだ曲情報がありません（--import-credits で取り込めます）")
+
+    watcher = None
+    if args.watch:
+        # 起動時にあるファイルは処理済みとして扱う（--resume なら未完了のものだけ処理する）
+        watcher = FolderWatcher(args.folders, settle=args.settle)
+        existing = watcher.prime()
+        files = existing if args.resume else []
+    else:
+        files = collect_files(args.folders)
+    if args.shard:
+        index, count = args.shard
+        total_files = len(files)
+        files = select_shard(files, args.folders, index, count, args.shard_by)
+        log(f"シャード {index}/{count}: {total_files} 件のうち {len(files)} 件を担当します"
+            f"（レート制限 {rate_limit:g} 件/秒）")
+    # ドライランはジャーナルに記録しない（書き込んでいないので完了扱いにできない）。シャードは専用のジャーナルを使う
+    if args.plan:
+        journal = None
+    elif args.shard:
+        journal = open_run_journal(options, resume=args.resume, path=journal_path(*args.shard))
+    else:
+        journal = open_run_journal(options, resume=args.resume)
+    if journal and args.resume:
+        remaining = journal.pending(files)
+        log(format_journal_skip(len(files) - len(remaining), journal))
+        files = remaining
+    if files or not watcher:
+        log(f"{len(files)} 件のファイルを処理します...")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    plan = open(args.plan, "w", encoding="utf-8") if args.plan else None
+    counts = {}
+    total = [len(files)]
+
+    def on_result(job):
+        record = job_record(job)
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if plan:
+            plan.write(json.dumps(plan_record(job), ensure_ascii=False) + "\n")
+        if journal:
+            journal.record(job)
+        if not args.quiet:
+            log("\n".join(job.lines))
+            if job.error is not None:
+                log(f"エラー: {job.item} → {record['message']}")
+
+    def on_progress(snapshot):
+        # 端末で実行しているときだけ進捗を出す（cron のログを汚さない）
+        if not args.quiet and sys.stderr.isatty():
+            done = sum(counts.values())
+            log(f"{done}/{total[0]} 件 処理完了 | {format_progress(snapshot)}")
+
+    def process(paths):
+        return run_enrichment(paths, options, on_result, concurrency=args.concurrency,
+                              should_stop=lambda: stop["requested"], on_progress=on_progress,
+                              resolver=resolver, cancel=cancel)
+
+    def process_found(paths):
+        log(f"追加・変更されたファイル {len(paths)} 件を処理します...")
+        total[0] += len(paths)
+        stopped = process(paths)
+        # 常駐中も node exporter が最新の値を読めるよう、処理のたびに書き出す
+        export_metrics(args, log)
+        return stopped
+
+    try:
+        stopped = process(files) if files or not watcher else False
+        if watcher and not stopped:
+            log(f"{', '.join(args.folders)} の監視を始めます（{args.watch_interval:g} 秒ごとに走査し、"
+                f"{args.settle:g} 秒変化のないファイルを処理）。Ctrl+C で終了します")
+            stopped = watch(watcher, process_found, cancel, interval=args.watch_interval)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if plan:
+            plan.close()
+        if journal:
+            journal.close()
+
+    log(format_stats(get_client().stats()))
+    cache = get_lookup_cache()
+    if cache:
+        log(format_cache_stats(cache.stats))
+    if resolver:
+        log(format_batch_stats(resolver.stats))
+    if store and options["credit_source"] != SOURCE_NETWORK:
+        log(format_store_stats(store.stats))
+    if plan:
+        log(f"変更プランを書き出しました: {args.plan}")
+    return finish(args, log, counts, stopped, stop)
+
+
+def import_credits(args, log, store):
+    """--import-credits: 曲情報をストアに取り込む。失敗したら False"""
+    for i, path in enumerate(args.import_credits):
+        start = time.perf_counter()
+        try:
+            added, replaced, skipped = store.import_file(path, replace=args.replace_credits and i == 0)
+        except (OSError, ValueError) as e:
+            log(f"曲情報を取り込めません: {e}")
+            return False
+        log(f"{path}: {added} 件を追加し、{replaced} 件を置き換えました（タイトルかアーティストがなく飛ばした行 {skipped} 件、"
+            f"{time.perf_counter() - start:.1f} 秒）")
+    log(f"取り込み済みの曲情報: {store.count()} 件")
+    return True
+
+
+def run_coordinator(args, argv, log, stop):
+    """--shards: シャードごとに credit_cli.py のプロセスを起動し、結果と計測値を 1 つにまとめる"""
+    count = args.shards
+    log(f"{count} 個のシャードに分けて処理します（分け方: {args.shard_by}、作業フォルダ: {args.shard_dir}）...")
+    try:
+        codes = run_shards(argv, count, args.shard_dir, args.resume, log, should_stop=lambda: stop["requested"])
+    except OSError as e:
+        log(f"シャードを起動できません: {e}")
+        return EXIT_FAILED
+    for index, code in sorted(codes.items()):
+        if code not in (EXIT_OK, EXIT_FAILED, EXIT_INTERRUPTED):
+            log(f"シャード {index}/{count} が異常終了しました。ログ: "
+                f"{os.path.join(args.shard_dir, f'shard-{index}-of-{count}.log')}")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    counts = {}
+    try:
+        for index in range(1, count + 1):
+            for status, n in merge_reports(shard_outputs(args.shard_dir, index, count), out).items():
+                counts[status] = counts.get(status, 0) + n
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    write_merged_metrics(args, log, [metrics_path(args.shard_dir, i, count) for i in range(1, count + 1)])
+    log("結果: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if stop["requested"] or EXIT_INTERRUPTED in codes.values():
+        return EXIT_INTERRUPTED
+    if any(code != EXIT_OK for code in codes.values()) or any(counts.get(s) for s in FAILURE_STATUSES):
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def run_merge(args, log):
+    """--merge: 別々に実行したシャードの結果（と計測値）をまとめる"""
+    reports = [path for path in args.merge if not path.lower().endswith(".json")]
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        counts = merge_reports(reports, out)
+    except (OSError, ValueError, KeyError) as e:
+        log(f"結果をまとめられません: {e}")
+        return EXIT_FAILED
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    write_merged_metrics(args, log, [path for path in args.merge if path.lower().endswith(".json")])
+    log(f"{len(reports)} 個の結果をまとめました。結果: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if any(counts.get(status) for status in FAILURE_STATUSES):
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+def write_merged_metrics(args, log, paths):
+    snapshot = merge_metrics(paths) if paths else None
+    if snapshot is None:
+        return
+    if not args.quiet:
+        for line in format_metrics(snapshot):
+            log(line)
+    try:
+        write_snapshot(snapshot, args.metrics_json, args.metrics_prom)
+    except OSError as e:
+        log(f"計測値を書き出せません: {e}")
+
+
+def run_apply(args, log, stop):
+    """--apply: プランのうち変更があるファイルだけを書き込む"""
+    try:
+        records = load_plan(args.apply)
+    except (OSError, ValueError) as e:
+        log(f"プランを読み込めません: {e}")
+        return EXIT_FAILED
+    log(f"プランの {len(records)} 件のファイルに書き込みます...")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    counts = {}
+
+    def on_result(record, lines, row):
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if not args.quiet:
+            log("\n".join(lines))
+
+    try:
+        stopped = apply_plan(records, on_result, should_stop=lambda: stop["requested"])
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return finish(args, log, counts, stopped, stop)
+
+
+def export_metrics(args, log):
+    if args.metrics_json or args.metrics_prom:
+        try:
+            get_metrics().export(args.metrics_json, args.metrics_prom)
+        except OSError as e:
+            log(f"計測値を書き出せません: {e}")
+
+
+def finish(args, log, counts, stopped, stop):
+    if stopped and stop["at"] is not None:
+        latency = time.monotonic() - stop["at"]
+        get_metrics().observe("stop", latency)
+        log(f"中断しました。（中断要求から停止まで {latency * 1000:.0f} ms）")
+    if not args.quiet:
+        for line in format_metrics(get_metrics().snapshot()):
+            log(line)
+    export_metrics(args, log)
+    log("結果: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    if stopped:
+        return EXIT_INTERRUPTED
+    if any(counts.get(status) for status in FAILURE_STATUSES):
+        return EXIT_FAILED
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,852 @@
+"""
+タグ書い太郎のコア（uta-net からの取得とタグの読み書き）。
+
+tkinter に依存しないので、GUI（CreditGet_relese.py）とコマンドライン版（credit_cli.py）の
+両方からこのモジュールを使う。
+起動を速くするため、読み込みに時間のかかる mutagen と requests（http_client）は最初に使う関数の中で import する。
+"""
+import os, traceback
+from collections import namedtuple
+from urllib.parse import quote
+
+from fast_tags import read_tag_values
+from utanet_extract import SearchPageExtractor, SongPageExtractor, ArtistPageExtractor
+from song_matcher import CandidateIndex, normalize, DEFAULT_THRESHOLD as DEFAULT_MATCH_THRESHOLD
+from batch_resolver import ArtistBatchResolver
+from lookup_cache import get_lookup_cache
+from library_index import get_library_index
+from credit_store import get_credit_store
+from enrich_engine import EnrichPipeline, Stage, DEFAULT_CONCURRENCY, MAX_CONCURRENCY
+from metrics import get_metrics, timed
+
+SEARCH_URL = "https://www.uta-net.com/search/?Aselect=2&Keyword={}"
+SONG_PAGE_URL = "https://www.uta-net.com/song/{}/"
+ARTIST_PAGE_URL = "https://www.uta-net.com/artist/{}/"
+
+# 通信エラー時のメッセージの接頭辞（結果の分類にも使う）
+SEARCH_FETCH_ERROR = "検索ページ取得エラー"
+SONG_FETCH_ERROR = "曲ページ取得エラー"
+ARTIST_FETCH_ERROR = "歌手ページ取得エラー"
+
+# 書き込み対象のロール（GUI の上書きチェックボックスと同じ順）
+ROLES = ("コメント", "作詞者", "作曲者", "リミキサー", "発売年")
+
+DEFAULT_B_TEMPLATE = '作詞="{lyricist}" 作曲="{composer}" 編曲="{arranger}"'
+
+# 1 ファイル分の処理結果の分類（job.data["status"]）
+STATUS_UPDATED = "updated"            # タグを書き込んだ（変更なしも含む）
+STATUS_MISSING_TAGS = "missing_tags"  # タイトル/アーティストがない
+STATUS_NOT_FOUND = "not_found"        # uta-net に候補がない
+STATUS_TEMPLATE_ERROR = "template_error"
+STATUS_ERROR = "error"                # 通信エラー・例外
+STATUS_PLANNED = "planned"            # ドライラン: 変更あり（書き込みはしていない）
+STATUS_UNCHANGED = "unchanged"        # ドライラン: 書き込んでも値が変わらない
+STATUS_STALE = "stale"                # プラン適用: プラン作成後にファイルが変更されていたので適用しない
+FAILURE_STATUSES = (STATUS_ERROR, STATUS_TEMPLATE_ERROR, STATUS_STALE)
+
+# ロール → TagSnapshot のフィールド名
+ROLE_FIELDS = {
+    "コメント": "comment",
+    "作詞者": "lyricist",
+    "作曲者": "composer",
+    "リミキサー": "remixer",
+    "発売年": "year",
+}
+
+
+def _no_log(msg):
+    pass
+
+
+def build_integrated_composer(ext, info):
+    composer = info.get("composer", "").strip()
+    if ext == ".m4a":
+        remixer = info.get("arranger", "").strip()
+        if remixer == composer:
+            return composer
+        elif remixer:
+            return f"{composer} / {remixer}"
+        return composer
+    elif ext == ".flac":
+        lyricist = info.get("lyricist", "").strip()
+        if lyricist == composer:
+            return composer
+        elif lyricist:
+            return f"{lyricist} / {composer}"
+        return composer
+    return composer
+
+def build_composer_tag(lyricist=None, composer=None, arranger=None):
+    parts = []
+    if lyricist:
+        parts.append(f'作詞="{lyricist}"')
+    if composer:
+        parts.append(f'作曲="{composer}"')
+    if arranger:
+        parts.append(f'編曲="{arranger}"')
+    return " ".join(parts)
+
+
+def _get_page(op, url, extractor):
+    """url を extractor に流しながら取得する。通信の時間を op に、そのうちの抽出の時間を extract に記録する"""
+    from http_client import get_client
+    with timed(op):
+        resp = get_client().get(url, consumer=extractor)
+        resp.raise_for_status()
+    get_metrics().observe("extract", resp.timing.parse)
+    return resp
+
+
+@timed("song_id")
+def get_uta_net_song_id(title, artist, use_cache=True, threshold=DEFAULT_MATCH_THRESHOLD, resolver=None):
+    """
+    uta-net を検索して曲 ID を返す。(song_id, err)
+    use_cache=False の場合はキャッシュを読まずに再取得する（結果はキャッシュへ保存する）
+    threshold は候補の採用しきい値（song_matcher 参照）。既定値以外ではキャッシュを使わない
+    resolver（new_batch_resolver 参照）を渡すと、同じアーティストの曲は歌手ページの曲一覧から選ぶ
+    """
+    cache = get_lookup_cache() if threshold == DEFAULT_MATCH_THRESHOLD else None
+    key = (normalize(title), normalize(artist))
+    if cache and use_cache:
+        hit = cache.get_search(*key)
+        if hit is not None:
+            get_metrics().inc("song_id_cache_hit")
+            return hit
+
+    if resolver is not None:
+        song_id, err, cacheable = resolver.resolve(title, artist)
+    else:
+        song_id, err, cacheable, _ = _search_uta_net_song_id(title, artist, threshold)
+    if cache and cacheable:
+        cache.put_search(*key, song_id, err)
+    return song_id, err
+
+
+def _search_uta_net_song_id(title, artist, threshold=DEFAULT_MATCH_THRESHOLD):
+    """
+    検索ページから曲 ID を選ぶ。(song_id, err, cacheable, (歌手 ID, 歌手名) または None) を返す。
+    通信エラーはキャッシュしない
+    """
+    q = quote(title)
+    search_url = SEARCH_URL.format(q)
+    # 検索結果の表を読み終えた時点で受信を打ち切る
+    extractor = SearchPageExtractor()
+    try:
+        _get_page("search_http", search_url, extractor)
+    except Exception as e:
+        return None, f"{SEARCH_FETCH_ERROR}: {e}", False, None
+
+    matches = extractor.rows
+    if not matches:
+        return None, "候補が見つかりませんでした。", True, None
+
+    chosen, top = CandidateIndex(matches).best(title, artist, threshold)
+    if chosen:
+        artist_id = extractor.artist_ids.get(chosen.song_id)
+        found_artist = (artist_id, chosen.candidate.artist) if artist_id is not None else None
+        return chosen.song_id, None, True, found_artist
+    if top is None:
+        return None, "候補が見つかりませんでした。", True, None
+
+    # しきい値に届かなければスキップ
+    c = top.candidate
+    return None, (f"一致度がしきい値 {threshold:.2f} 以上の候補が見つかりませんでした。"
+                  f"（最高 {top.score:.2f}: {c.title} / {c.artist}）"), True, None
+
+
+def fetch_artist_songs(artist_id):
+    """歌手ページの曲一覧を取得する。([(曲 ID, タイトル), ...], err)"""
+    url = ARTIST_PAGE_URL.format(artist_id)
+    # 曲一覧の表を読み終えた時点で受信を打ち切る
+    extractor = ArtistPageExtractor()
+    try:
+        _get_page("artist_http", url, extractor)
+    except Exception as e:
+        return [], f"{ARTIST_FETCH_ERROR}: {e}"
+    return extractor.rows, None
+
+
+def new_batch_resolver(options):
+    """
+    options["batch_by_artist"] が有効ならアーティスト単位のまとめ検索（batch_resolver 参照）を作る。
+    無効なら None。1 回の実行ごとに作り、run_enrichment に渡す
+    """
+    if not options.get("batch_by_artist"):
+        return None
+    threshold = options["match_threshold"]
+    return ArtistBatchResolver(lambda title, artist: _search_uta_net_song_id(title, artist, threshold),
+                               fetch_artist_songs, threshold)
+
+
+@timed("song_page")
+def get_song_page_info(song_id, use_cache=True):
+    """
+    曲ページから info 辞書を取得する。(info, msg)
+    use_cache=False の場合はキャッシュを読まずに再取得する（結果はキャッシュへ保存する）
+    """
+    cache = get_lookup_cache()
+    if cache and use_cache:
+        hit = cache.get_song(song_id)
+        if hit is not None:
+            get_metrics().inc("song_page_cache_hit")
+            return hit
+
+    info, msg = _fetch_song_page_info(song_id)
+    if cache and info:
+        cache.put_song(song_id, info, msg)
+    return info, msg
+
+
+def _fetch_song_page_info(song_id):
+    url = SONG_PAGE_URL.format(song_id)
+    # 詳細ブロック（作詞・作曲・編曲・発売日）を読み終えた時点で受信を打ち切る
+    extractor = SongPageExtractor()
+    try:
+        _get_page("song_http", url, extractor)
+    except Exception as e:
+        return None, f"{SONG_FETCH_ERROR}: {e}"
+
+    info = extractor.info()
+    return info, _info_message(info)
+
+
+def _info_message(info):
+    msg = f"取得結果 → アニメ='{info['anime']}', 作詞='{info['lyricist']}', 作曲='{info['composer']}', 編曲='{info['arranger']}'"
+    if not info["anime"]:
+        msg = "タイアップ情報が見つかりませんでした。 " + msg
+    return msg
+
+
+@timed("local_lookup")
+def lookup_local_credit(title, artist, threshold=DEFAULT_MATCH_THRESHOLD):
+    """
+    取り込んだ曲情報（credit_store）から引く。(info, song_id) を返す。
+    見つからなければ None、ストアを開けなければ LookupError
+    """
+    store = get_credit_store()
+    if store is None:
+        raise LookupError("取り込んだ曲情報のストアを開けません")
+    hit = store.lookup(title, artist, threshold)
+    get_metrics().inc("local_hit" if hit else "local_miss")
+    return hit
+
+
+
+
+def _apply_mp3_role(id3, role, value, force_overwrite):
+    """ID3 に 1 ロール分の変更を適用する。(updated, msg) を返す。"""
+    from mutagen.id3 import TXXX, TCOM, COMM, TDRC
+    updated = False
+    msg = ""
+    if role == "作詞者":
+        frames = id3.getall("TXXX:LYRICIST")
+        existing = frames[0].text[0] if frames and frames[0].text else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                id3.delall("TXXX:LYRICIST")
+                id3.add(TXXX(encoding=3, desc="LYRICIST", text=[value]))
+                updated = True
+            msg = f"作詞者 上書き (既存='{existing}') → '{value}'"
+        else:
+            msg = f"作詞者 既存='{existing}' → スキップ"
+
+    elif role == "作曲者":
+        existing = id3.getall("TCOM")[0].text[0] if id3.getall("TCOM") and id3.getall("TCOM")[0].text else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                id3.delall("TCOM")
+                id3.add(TCOM(encoding=3, text=[value]))
+                updated = True
+            msg = f"作曲者 上書き (既存='{existing}') → '{value}'"
+        else:
+            msg = f"作曲者 既存='{existing}' → スキップ"
+
+    elif role == "コメント":
+        comms = [c for c in id3.getall("COMM") if c.lang == "eng" and c.desc == ""]
+        if not comms:
+            id3.add(COMM(encoding=3, lang="eng", desc="", text=[value]))
+            updated = True
+            msg = f"コメント 新規書き込み → '{value}'"
+        else:
+            existing = " ".join(str(t) for t in comms[0].text if t).strip()
+            if force_overwrite or existing in ("", "0"):
+                if existing != value:
+                    comms[0].encoding = 3
+                    comms[0].text = [value]
+                    updated = True
+                msg = f"コメント 上書き (既存='{existing}') → '{value}'"
+            else:
+                msg = f"コメント 既存='{existing}' → スキップ"
+
+    elif role == "リミキサー":
+        frames = id3.getall("TXXX:MIXARTIST")
+        existing = frames[0].text[0] if frames and frames[0].text else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                id3.delall("TXXX:MIXARTIST")
+                id3.add(TXXX(encoding=3, desc="MIXARTIST", text=[value]))
+                updated = True
+            msg = f"リミキサー 上書き (既存='{existing}') → '{value}'"
+        else:
+            msg = f"リミキサー 既存='{existing}' → スキップ"
+
+    elif role == "発売年":
+        # TDRC フレームで扱う（ID3v2.3/2.4 の Year/Recording time）
+        existing = str(id3.getall("TDRC")[0].text[0]) if id3.getall("TDRC") and id3.getall("TDRC")[0].text else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                # 既存の TDRC を削除して新規追加
+                id3.delall("TDRC")
+                id3.add(TDRC(encoding=3, text=[value]))
+                updated = True
+            msg = f"発売年 上書き (既存='{existing}') → '{value}'"
+        else:
+            msg = f"発売年 既存='{existing}' → スキップ"
+
+    return updated, msg
+
+
+def _apply_flac_role(flac, role, value, force_overwrite):
+    """FLAC (Vorbis コメント) に 1 ロール分の変更を適用する。(updated, msg) を返す。"""
+    key = {"作曲者": "COMPOSER", "コメント": "COMMENT", "リミキサー": "MIXARTIST", "発売年": "DATE"}.get(role)
+    if key is None:
+        # 作詞者は FLAC では書き込まない
+        return False, ""
+    existing = flac.get(key, [""])[0] if key in flac else ""
+    if force_overwrite or not existing:
+        updated = existing != value
+        if updated:
+            flac[key] = value
+        return updated, f"{role} 書き込み → '{value}'"
+    return False, f"{role} 既存='{existing}' → スキップ"
+
+
+def _apply_m4a_role(tags, role, value, force_overwrite):
+    """MP4 タグに 1 ロール分の変更を適用する。(updated, msg) を返す。"""
+    updated = False
+    msg = ""
+    if role == "作詞者":
+        existing = tags.get("©lyr", [""])[0] if "©lyr" in tags else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                tags["©lyr"] = [value]
+                updated = True
+            msg = f"作詞者 書き込み → '{value}'"
+        else:
+            msg = f"作詞者 既存='{existing}' → スキップ"
+
+    elif role == "作曲者":
+        existing = tags.get("©wrt", [""])[0] if "©wrt" in tags else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                tags["©wrt"] = [value]
+                updated = True
+            msg = f"作曲者 書き込み → '{value}'"
+        else:
+            msg = f"作曲者 既存='{existing}' → スキップ"
+
+    elif role == "コメント":
+        existing = tags.get("©cmt", [""])[0] if "©cmt" in tags else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                tags["©cmt"] = [value]
+                updated = True
+            msg = f"コメント 書き込み → '{value}'"
+        else:
+            msg = f"コメント 既存='{existing}' → スキップ"
+
+    elif role == "リミキサー":
+        # m4a はリミキサー非対応
+        pass
+
+    elif role == "発売年":
+        existing = tags.get("©day", [""])[0] if "©day" in tags else ""
+        if force_overwrite or existing in ("", "0"):
+            if existing != value:
+                tags["©day"] = [value]
+                updated = True
+            msg = f"発売年 書き込み → '{value}'"
+        else:
+            msg = f"発売年 既存='{existing}' → スキップ"
+
+    return updated, msg
+
+
+@timed("open_tags")
+def open_tags(filepath):
+    """
+    タグを 1 回だけ解析する。(audio, target) を返す。
+    target はロールの読み書きに使うタグオブジェクト、audio は保存に使うオブジェクト。
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    if ext == ".mp3":
+        from mutagen.id3 import ID3, ID3NoHeaderError
+        try:
+            audio = ID3(filepath)
+        except ID3NoHeaderError:
+            audio = ID3()
+        return audio, audio
+    elif ext == ".flac":
+        from mutagen.flac import FLAC
+        audio = FLAC(filepath)
+        return audio, audio
+    elif ext == ".m4a":
+        from mutagen.mp4 import MP4, MP4Tags
+        audio = MP4(filepath)
+        return audio, audio.tags if audio.tags is not None else MP4Tags()
+    raise ValueError(f"未対応フォーマット '{ext}'")
+
+
+@timed("write_tags")
+def apply_credit_tags(filepath, values, overwrite_flags=None, parsed=None, dry_run=False):
+    """
+    複数ロールをまとめて書き込む。ファイルの解析は 1 回、保存は実際に値が変わった場合のみ 1 回。
+    values: {role: 値} （role は set_credit_tag と同じ。辞書の順序でログを返す）
+    overwrite_flags: {role: bool}。True のロールは既存値があっても上書きする
+    parsed: open_tags() の結果。読み込み時に解析済みならそれを使い、再解析しない
+    dry_run: True なら変更を計算するだけで保存しない（parsed のタグオブジェクトは書き換わる）
+    戻り値: ({role: ログ用メッセージ}, {role: 実際に書き込んだ値（dry_run では書き込む予定の値）})
+    """
+    overwrite_flags = overwrite_flags or {}
+    name = os.path.basename(filepath)
+    ext = os.path.splitext(filepath)[1].lower()
+    results = {}
+    pending = {}
+    for role, value in values.items():
+        if not value:
+            results[role] = f"[{name}] {role} の値なし → スキップ"
+        else:
+            pending[role] = value
+    if not pending:
+        return results, {}
+
+    if ext == ".mp3":
+        apply_role = _apply_mp3_role
+    elif ext == ".flac":
+        apply_role = _apply_flac_role
+    elif ext == ".m4a":
+        apply_role = _apply_m4a_role
+    else:
+        for role in pending:
+            results[role] = f"[{name}] 未対応フォーマット '{ext}'"
+        return {role: results[role] for role in values}, {}
+
+    try:
+        audio, target = parsed or open_tags(filepath)
+    except Exception as e:
+        for role in pending:
+            results[role] = f"[{name}] {role} 書き込み中エラー: {e}"
+        return {role: results[role] for role in values}, {}
+
+    changed = {}
+    for role, value in pending.items():
+        try:
+            updated, msg = apply_role(target, role, value, overwrite_flags.get(role, False))
+            if updated:
+                changed[role] = value
+        except Exception as e:
+            msg = f"{role} 書き込み中エラー: {e}"
+        results[role] = f"[{name}] {msg}"
+
+    if changed and not dry_run:
+        try:
+            with timed("save"):
+                if ext == ".mp3":
+                    audio.save(filepath, v2_version=3)
+                else:
+                    if ext == ".m4a":
+                        audio.tags = target
+                    audio.save()
+        except Exception as e:
+            for role in changed:
+                results[role] = f"[{name}] {role} 書き込み中エラー: {e}"
+            changed = {}
+
+    return {role: results[role] for role in values}, changed
+
+
+def set_credit_tags(filepath, values, overwrite_flags=None):
+    """apply_credit_tags のログ用メッセージだけを返す版"""
+    return apply_credit_tags(filepath, values, overwrite_flags)[0]
+
+
+def set_credit_tag(filepath, role, value, force_overwrite=False):
+    """
+    role: "作詞者" / "作曲者" / "コメント" / "リミキサー" / "発売年"
+    value: 書き込みたい値
+    force_overwrite: True の場合、既存値があっても強制的に上書きする
+    """
+    return set_credit_tags(filepath, {role: value}, {role: force_overwrite})[role]
+
+
+def format_size(size):
+    return f"{size/1024:.1f} KB"
+
+
+class TagSnapshot(namedtuple("TagSnapshot", "title artist comment lyricist composer remixer year size")):
+    """
+    1 ファイル分のタグの値（size はバイト数）。
+    1 回の解析で作り、一覧の行・取得ステージ・書き込み後の行更新で使い回す。
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row, size):
+        """TreeView の行（インデックスに保存した 8 列）から作る"""
+        return cls(*row[:7], size)
+
+    def row(self):
+        """TreeView 用の 8 列"""
+        return [self.title, self.artist, self.comment, self.lyricist, self.composer,
+                self.remixer, self.year, format_size(self.size)]
+
+    def applied(self, changes, size=None):
+        """changes（{role: 書き込んだ値}）を反映したスナップショットを返す"""
+        fields = {ROLE_FIELDS[role]: value for role, value in changes.items()}
+        if size is not None:
+            fields["size"] = size
+        return self._replace(**fields)
+
+    def describe(self):
+        return (f"title:{self.title} artist:{self.artist} year:{self.year} comment:{self.comment} "
+                f"lyricist:{self.lyricist} composer:{self.composer} size:{format_size(self.size)}")
+
+
+def _first_text(frames):
+    return str(frames[0].text[0]) if frames and frames[0].text else ""
+
+
+def snapshot_from_tags(ext, target, size):
+    """open_tags() の target から TagSnapshot を作る（ファイルは読まない）"""
+    if ext == ".mp3":
+        comment = ""
+        comms = [c for c in target.getall("COMM") if c.lang == "eng" and c.desc == ""]
+        if comms and comms[0].text:
+            comment = " ".join(str(t) for t in comms[0].text if t).strip()
+        return TagSnapshot(
+            title=_first_text(target.getall("TIT2")),
+            artist=_first_text(target.getall("TPE1")),
+            comment=comment,
+            lyricist=_first_text(target.getall("TXXX:LYRICIST")),
+            composer=_first_text(target.getall("TCOM")),
+            remixer=_first_text(target.getall("TXXX:MIXARTIST")),
+            year=_first_text(target.getall("TDRC")),
+            size=size,
+        )
+
+    if ext == ".flac":
+        keys = ("TITLE", "ARTIST", "COMMENT", "LYRICIST", "COMPOSER", "MIXARTIST", "DATE")
+    else:
+        # m4a はリミキサー非対応（None は常に空）
+        keys = ("©nam", "©ART", "©cmt", "©lyr", "©wrt", None, "©day")
+    values = [target.get(key, [""])[0] if key and key in target else "" for key in keys]
+    return TagSnapshot(*values, size)
+
+
+def read_tag_snapshot(filepath, size=None):
+    """
+    ファイルを 1 回だけ解析して (TagSnapshot, parsed) を返す。
+    parsed は apply_credit_tags にそのまま渡せるので、書き込み時に解析し直さずに済む。
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    parsed = open_tags(filepath)
+    if size is None:
+        size = os.path.getsize(filepath)
+    return snapshot_from_tags(ext, parsed[1], size), parsed
+
+
+@timed("read_tags")
+def scan_tag_snapshot(filepath, size=None):
+    """
+    一覧・取得用の TagSnapshot。タグ部分だけを読む fast_tags を使い、
+    扱えない構造や壊れたファイルは mutagen で読み直す。
+    """
+    if size is None:
+        size = os.path.getsize(filepath)
+    try:
+        return TagSnapshot(*read_tag_values(filepath), size)
+    except Exception:
+        return read_tag_snapshot(filepath, size=size)[0]
+
+
+def read_tag_row(filepath, log=None, size=None):
+    """
+    TreeView 用の 8 列（タイトル〜サイズ）を読む。
+    読み取りに失敗した場合はファイル名だけの行を返す（サイズ列が空になる）。
+    """
+    log = log or _no_log
+    try:
+        snapshot = scan_tag_snapshot(filepath, size=size)
+    except Exception:
+        log(f"タグ読み取りエラー: {filepath} → {traceback.format_exc()}")
+        return [os.path.basename(filepath), "", "", "", "", "", "", ""]
+    log(snapshot.describe())
+    return snapshot.row()
+
+
+def _indexed_snapshot(filepath, st):
+    """インデックスの行がファイルの現在の stat と一致すれば、その行から TagSnapshot を作る"""
+    index = get_library_index()
+    entry = index.get(filepath) if index else None
+    # 読み取りに失敗した行（サイズ列が空）は登録されないが、念のため除外する
+    if entry and entry[0] == st.st_size and entry[1] == st.st_mtime and entry[2][7]:
+        return TagSnapshot.from_row(entry[2], st.st_size)
+    return None
+
+
+# --- パイプラインの各ステージ（ワーカースレッドから呼ばれる） ---
+# ログは job.lines に溜め、完了時にファイル単位でまとめて出力する
+
+def read_stage(job, options):
+    """
+    タグ読み込み: タイトル/アーティストを取得する。
+    スキャン時のインデックスの行が最新ならファイルは読まない。そうでなければタグ部分だけを読む
+    （書き込む場合の解析は書き込みステージで 1 回だけ行う）
+    """
+    filepath = job.item
+    st = os.stat(filepath)
+    # プランに記録し、適用時にファイルが変わっていないかを確かめる
+    job.data["stat"] = (st.st_size, st.st_mtime_ns)
+    snapshot = _indexed_snapshot(filepath, st)
+    if snapshot is None:
+        snapshot = scan_tag_snapshot(filepath, size=st.st_size)
+    job.data["snapshot"] = snapshot
+
+    if not snapshot.title or not snapshot.artist:
+        job.lines.append(f"タイトル/アーティスト不足: {filepath}")
+        job.data["status"] = STATUS_MISSING_TAGS
+        job.finished = True
+        return
+    job.data["title"] = snapshot.title
+    job.data["artist"] = snapshot.artist
+
+
+def _finish_lookup(job, name, status, msg):
+    job.lines.append(f"{name} → {msg}")
+    job.data["status"] = status
+    job.data["message"] = msg
+    job.finished = True
+
+
+def _local_info(job, options, name):
+    """取り込んだ曲情報から引く。見つからなければ None（ローカルのみの場合はジョブを終える）"""
+    local_only = options["credit_source"] == SOURCE_LOCAL_ONLY
+    try:
+        hit = lookup_local_credit(job.data["title"], job.data["artist"], threshold=options["match_threshold"])
+    except LookupError as e:
+        if local_only:
+            _finish_lookup(job, name, STATUS_ERROR, str(e))
+        return None
+    if hit is None:
+        if local_only:
+            _finish_lookup(job, name, STATUS_NOT_FOUND, "取り込んだ曲情報に一致する曲がありません")
+        return None
+    info, song_id = hit
+    job.data["song_id"] = song_id
+    job.data["source"] = "local"
+    job.lines.append(f"{name} → （取り込んだ曲情報）{_info_message(info)}")
+    return info
+
+
+def _network_info(job, options, resolver, name):
+    """uta-net から取得する。失敗した場合はジョブを終えて None を返す"""
+    song_id, err = get_uta_net_song_id(job.data["title"], job.data["artist"], use_cache=options["use_cache"],
+                                       threshold=options["match_threshold"], resolver=resolver)
+    if err:
+        _finish_lookup(job, name, STATUS_ERROR if err.startswith(SEARCH_FETCH_ERROR) else STATUS_NOT_FOUND, err)
+        return None
+    job.data["song_id"] = song_id
+    job.data["source"] = "uta-net"
+    info, msg = get_song_page_info(song_id, use_cache=options["use_cache"])
+    if not info:
+        _finish_lookup(job, name, STATUS_ERROR, msg)
+        return None
+    job.lines.append(f"{name} → {msg}")
+    return info
+
+
+def lookup_stage(job, options, resolver=None):
+    """uta-net 取得: 曲情報を取得し、ロールごとの書き込み値を決める"""
+    filepath = job.item
+    name = os.path.basename(filepath)
+    info = None
+    if options["credit_source"] != SOURCE_NETWORK:
+        info = _local_info(job, options, name)
+        if job.finished:
+            return
+    if info is None:
+        info = _network_info(job, options, resolver, name)
+        if info is None:
+            return
+    job.data["info"] = info
+
+    lyricist = info.get("lyricist", "")
+    composer = info.get("composer", "")
+    arranger = info.get("arranger", "")
+    mode = options["mode"]
+    ext = os.path.splitext(filepath)[1].lower()
+
+    # ロールごとの書き込み値をまとめ、書き込みステージで 1 回の解析・保存で反映する
+    values = {}
+    # 作詞者
+    if lyricist:
+        values["作詞者"] = lyricist
+
+    # 作曲者
+    if mode == "B" and (composer or lyricist or arranger):
+        # ユーザー定義の書式文字列を展開
+        try:
+            values["作曲者"] = options["template"].format(
+                lyricist=lyricist or "",
+                composer=composer or "",
+                arranger=arranger or ""
+            )
+        except Exception as e:
+            job.lines.append(f"[{name}] フォーマット展開エラー: {e}")
+            job.data["status"] = STATUS_TEMPLATE_ERROR
+            job.data["message"] = str(e)
+            job.finished = True
+            return
+    elif mode == "A":
+        if composer and options["integrate"]:
+            values["作曲者"] = build_integrated_composer(ext, info)
+        elif composer:
+            values["作曲者"] = composer
+
+    # リミキサー（編曲者）
+    if arranger:
+        values["リミキサー"] = arranger
+
+    # コメント（アニメ情報）
+    if info.get("anime"):
+        values["コメント"] = info["anime"]
+
+    # 発売年（YEARタグ）
+    year = info.get("year", "")
+    if year:
+        values["発売年"] = year
+
+    job.data["values"] = values
+
+
+def write_stage(job, options):
+    """
+    タグ書き込み: まとめて書き込み、TreeView の行は書き込んだ値から作る（読み直さない）。
+    ドライランでは変更を計算して job.data["changes"] に残すだけで、ファイルも行も変えない
+    """
+    filepath = job.item
+    ext = os.path.splitext(filepath)[1].lower()
+    before = job.data["snapshot"]
+    try:
+        parsed = open_tags(filepath)
+    except Exception:
+        # 解析できない場合のエラーメッセージは apply_credit_tags に任せる
+        parsed = None
+    else:
+        # 書き込み直前の解析結果を基準にする（インデックスの行より新しい）
+        before = snapshot_from_tags(ext, parsed[1], before.size)
+    results, changes = apply_credit_tags(filepath, job.data["values"], options["overwrite"], parsed=parsed,
+                                         dry_run=options["dry_run"])
+    job.data["results"] = results
+    job.data["changes"] = changes
+    job.lines.extend(results.values())
+    if options["dry_run"]:
+        job.data["before"] = before
+        job.data["status"] = STATUS_PLANNED if changes else STATUS_UNCHANGED
+        job.lines.append(f"変更予定 {len(changes)} 項目（書き込みなし）: {os.path.basename(filepath)}")
+        return
+    job.data["status"] = STATUS_UPDATED
+
+    size = None
+    if changes:
+        # 書き込み後のサイズ・更新時刻（ジャーナルに記録する）
+        st = os.stat(filepath)
+        job.data["stat"] = (st.st_size, st.st_mtime_ns)
+        size = st.st_size
+    snapshot = before.applied(changes, size=size)
+    job.data["snapshot"] = snapshot
+    job.result = snapshot.row()
+    job.lines.append(snapshot.describe())
+    index = get_library_index()
+    if index:
+        index.update_file(filepath, job.result)
+    job.lines.append(f"更新完了: {os.path.basename(filepath)}")
+
+
+# 曲情報の取得元: uta-net のみ / 取り込んだ曲情報を先に引き、なければ uta-net / 取り込んだ曲情報のみ（通信しない）
+SOURCE_NETWORK = "network"
+SOURCE_LOCAL_FIRST = "local_first"
+SOURCE_LOCAL_ONLY = "local_only"
+SOURCES = (SOURCE_NETWORK, SOURCE_LOCAL_FIRST, SOURCE_LOCAL_ONLY)
+
+# 1 ファイルの取得にかける時間の上限（秒）。再試行を含む。共有のレート制限・ブレーカーの待ちは数えない
+DEFAULT_FILE_DEADLINE = 60.0
+
+
+def default_options(**overrides):
+    """run_enrichment に渡すオプション（GUI の各設定と同じ項目）"""
+    options = {
+        "use_cache": True,
+        "mode": "A",
+        "template": DEFAULT_B_TEMPLATE,
+        "integrate": False,
+        "overwrite": {role: False for role in ROLES},
+        "match_threshold": DEFAULT_MATCH_THRESHOLD,
+        "batch_by_artist": False,
+        "dry_run": False,
+        "file_deadline": DEFAULT_FILE_DEADLINE,
+        "credit_source": SOURCE_NETWORK,
+    }
+    options.update(overrides)
+    return options
+
+
+def build_stages(options, concurrency=DEFAULT_CONCURRENCY, resolver=None):
+    """読み込み・取得・書き込みの 3 ステージを作る"""
+    concurrency = max(1, min(int(concurrency), MAX_CONCURRENCY))
+    queue_size = concurrency * 2
+    return [
+        Stage("読込", lambda job: read_stage(job, options), workers=2, maxsize=queue_size),
+        Stage("取得", lambda job: lookup_stage(job, options, resolver), workers=concurrency, maxsize=queue_size,
+              budget=options["file_deadline"] or None),
+        Stage("書込", lambda job: write_stage(job, options), workers=1, maxsize=queue_size),
+    ]
+
+
+def run_enrichment(files, options, on_result, concurrency=DEFAULT_CONCURRENCY, should_stop=None, on_progress=None,
+                   resolver=None, cancel=None):
+    """
+    files を取得・書き込みパイプラインに流す。完了したジョブごとに on_result(job) が呼ばれる。
+    中断した場合は True を返す。resolver は new_batch_resolver() の戻り値。
+    中断は should_stop() か cancel（CancelToken）で伝える。まだ始めていないファイルは on_result に渡されない
+    """
+    metrics = get_metrics()
+
+    def counted(job):
+        # 結果の状態ごとの件数（files_updated など）
+        metrics.inc("files_" + (STATUS_ERROR if job.error is not None else job.data.get("status", STATUS_ERROR)))
+        on_result(job)
+
+    pipeline = EnrichPipeline(build_stages(options, concurrency, resolver), counted,
+                              should_stop=should_stop, on_progress=on_progress, cancel=cancel)
+    return pipeline.run(list(files))
+
+
+def job_record(job):
+    """ジョブの結果を JSONL 出力用の辞書にする"""
+    status = job.data.get("status", STATUS_ERROR)
+    record = {
+        "path": job.item,
+        "status": STATUS_ERROR if job.error is not None else status,
+        "title": job.data.get("title", ""),
+        "artist": job.data.get("artist", ""),
+        "song_id": job.data.get("song_id"),
+        "source": job.data.get("source"),
+        "values": job.data.get("values", {}),
+        "results": job.data.get("results", {}),
+    }
+    if job.error is not None:
+        record["message"] = f"{type(job.error).__name__}: {job.error}"
+    elif "message" in job.data:
+        record["message"] = job.data["message"]
+    return record
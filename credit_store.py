@@ -0,0 +1,210 @@
+"""
+取り込んだ曲情報（クレジット）のローカルストア（SQLite）。
+
+CSV / JSONL の曲情報（タイトル・アーティスト・作詞・作曲・編曲・タイアップ・発売日）を
+normalize() 済みの (タイトル, アーティスト) を主キーにして保存し、uta-net の代わりに引く。
+照合は get_uta_net_song_id と同じ CandidateIndex で行う。候補はタイトルの完全一致、なければ前方一致の行で、
+どちらも索引の範囲検索なので 100 万件規模でも 1 件あたり 1 ms かからない
+（uta-net の検索と違い、タイトルの途中に含まれるだけの曲は候補にならない）。
+"""
+import csv, json, os, re, sqlite3, threading
+
+from lookup_cache import app_dir
+from song_matcher import CandidateIndex, normalize, DEFAULT_THRESHOLD
+
+DEFAULT_PATH = os.path.join(app_dir(), "credit_store.sqlite3")
+
+# 1 回の照合で読む候補の上限
+MAX_CANDIDATES = 50
+# 取り込み時に 1 回の executemany で書き込む件数
+IMPORT_BATCH = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS credit (
+    id INTEGER PRIMARY KEY,
+    ntitle TEXT NOT NULL,
+    nartist TEXT NOT NULL,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    lyricist TEXT NOT NULL,
+    composer TEXT NOT NULL,
+    arranger TEXT NOT NULL,
+    anime TEXT NOT NULL,
+    release_date TEXT NOT NULL,
+    song_id INTEGER,
+    UNIQUE (ntitle, nartist)
+);
+"""
+
+# 取り込むファイルの列名（英語名・日本語名） -> 項目
+FIELD_ALIASES = {
+    "title": "title", "タイトル": "title", "曲名": "title",
+    "artist": "artist", "アーティスト": "artist", "歌手": "artist",
+    "lyricist": "lyricist", "作詞": "lyricist", "作詞者": "lyricist",
+    "composer": "composer", "作曲": "composer", "作曲者": "composer",
+    "arranger": "arranger", "編曲": "arranger", "編曲者": "arranger",
+    "tie-up": "anime", "tieup": "anime", "tie_up": "anime", "anime": "anime", "タイアップ": "anime",
+    "release": "release_date", "release_date": "release_date", "発売日": "release_date",
+    "song_id": "song_id", "uta_net_id": "song_id",
+}
+
+_YEAR_RE = re.compile(r"\d{4}")
+
+
+def _record_fields(record):
+    """1 件分の辞書（列名はそのまま）を項目名の辞書にする"""
+    fields = {}
+    for key, value in record.items():
+        name = FIELD_ALIASES.get(str(key).strip().lower()) if key is not None else None
+        if name and value is not None:
+            fields[name] = str(value).strip()
+    return fields
+
+
+def _iter_records(path):
+    """CSV（ヘッダ行あり）か JSONL（1 行 1 件のオブジェクト）を読み、1 件ずつ辞書で返す"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if ext == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: JSON の形式が正しくありません: {e}") from None
+            if isinstance(record, dict):
+                yield record
+
+
+def _info(row):
+    """ストアの 1 行を get_song_page_info と同じ形の info 辞書にする"""
+    lyricist, composer, arranger, anime, release_date = row
+    m = _YEAR_RE.search(release_date)
+    return {"anime": anime, "lyricist": lyricist, "composer": composer, "arranger": arranger,
+            "release_date": release_date, "year": m.group(0) if m else ""}
+
+
+class CreditStore:
+    """スレッド間で共有できる曲情報ストア"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.stats = {"hit": 0, "miss": 0}
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM credit").fetchone()[0]
+
+    def import_file(self, path, replace=False, on_progress=None):
+        """
+        CSV / JSONL を取り込む。同じ (タイトル, アーティスト) の曲は新しい内容で置き換える（ファイル内の重複も後の行が残る）。
+        replace=True なら先に全件を消す。
+        (追加した曲の数, 既存の曲を置き換えた件数, タイトルかアーティストがなく飛ばした件数) を返す。
+        on_progress(読んだ件数) は IMPORT_BATCH 件ごとに呼ばれる
+        """
+        rows = skipped = 0
+        batch = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if replace:
+                    self._conn.execute("DELETE FROM credit")
+                before = self._conn.execute("SELECT COUNT(*) FROM credit").fetchone()[0]
+                for record in _iter_records(path):
+                    fields = _record_fields(record)
+                    title, artist = fields.get("title", ""), fields.get("artist", "")
+                    if not title or not artist:
+                        skipped += 1
+                        continue
+                    song_id = fields.get("song_id", "")
+                    batch.append((
+                        normalize(title), normalize(artist), title, artist,
+                        fields.get("lyricist", ""), fields.get("composer", ""), fields.get("arranger", ""),
+                        fields.get("anime", ""), fields.get("release_date", ""),
+                        int(song_id) if song_id.isdigit() else None,
+                    ))
+                    if len(batch) >= IMPORT_BATCH:
+                        rows += self._insert(batch)
+                        if on_progress:
+                            on_progress(rows)
+                rows += self._insert(batch)
+                # INSERT OR REPLACE で置き換えた行は件数が増えないので、前後の件数の差が追加した曲の数
+                added = self._conn.execute("SELECT COUNT(*) FROM credit").fetchone()[0] - before
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added, rows - added, skipped
+
+    def _insert(self, batch):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO credit (ntitle, nartist, title, artist, lyricist, composer, arranger, anime,"
+            " release_date, song_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+        n = len(batch)
+        batch.clear()
+        return n
+
+    def lookup(self, title, artist, threshold=DEFAULT_THRESHOLD):
+        """(info, song_id) を返す。見つからなければ None。song_id は取り込んだデータにあれば uta-net の曲 ID"""
+        ntitle = normalize(title)
+        if not ntitle:
+            return None
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, title, artist FROM credit WHERE ntitle = ? LIMIT ?", (ntitle, MAX_CANDIDATES)
+            ).fetchall()
+            if not rows:
+                rows = self._conn.execute(
+                    "SELECT id, title, artist FROM credit WHERE ntitle > ? AND ntitle < ? LIMIT ?",
+                    (ntitle, ntitle + "\U0010ffff", MAX_CANDIDATES),
+                ).fetchall()
+            chosen = CandidateIndex(rows).best(title, artist, threshold)[0] if rows else None
+            if chosen is None:
+                self.stats["miss"] += 1
+                return None
+            row = self._conn.execute(
+                "SELECT lyricist, composer, arranger, anime, release_date, song_id FROM credit WHERE id = ?",
+                (chosen.song_id,),
+            ).fetchone()
+            self.stats["hit"] += 1
+        return _info(row[:5]), row[5]
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_credit_store():
+    """共有 CreditStore を返す。開けない場合（読み取り専用フォルダなど）は None"""
+    global _store, _store_failed
+    with _store_lock:
+        if _store is None and not _store_failed:
+            try:
+                _store = CreditStore()
+            except sqlite3.Error:
+                _store_failed = True
+        return _store
+
+
+def format_store_stats(stats):
+    """stats をログ用の 1 行にまとめる"""
+    return f"ローカルの曲情報: 一致 {stats['hit']} 件 / 見つからず {stats['miss']} 件"
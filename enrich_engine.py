@@ -0,0 +1,189 @@
+"""
+情報取得・タグ書き込みのステージ型パイプライン。
+
+タグ読み込み → uta-net 取得 → タグ書き込み のようにステージを分け、
+ステージ間を上限付きキューでつなぐ。各ステージは専用のワーカースレッドで動くため、
+NAS への書き込みが遅くても通信は止まらず、通信待ちの間もディスク側の処理が進む。
+完了したジョブは呼び出し元スレッドで 1 件ずつ on_result に渡されるので、
+ジョブに溜めたログはファイルごとにまとめて出力できる。
+
+中断すると、どのステージでもまだ始めていないジョブは捨て（on_result には渡さない）、
+通信中のリクエストは打ち切る。始めたタグの書き込みは途中で止めないので、保存中のファイルが壊れることはない。
+"""
+import queue, threading, time
+
+from cancel_token import CancelToken, Cancelled, activate
+
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 8
+
+# キューの終端を表す番兵
+_DONE = object()
+
+
+class Job:
+    """パイプラインを流れる 1 ファイル分の作業単位"""
+
+    def __init__(self, index, item):
+        self.index = index
+        self.item = item
+        self.data = {}        # ステージ間で受け渡す値
+        self.lines = []       # このファイルのログ
+        self.result = None    # 最終結果（呼び出し側で使う）
+        self.finished = False # True にすると以降のステージを飛ばして完了扱い
+        self.error = None
+        self.deadline = None  # 持ち時間のあるステージに入った時点で作る Deadline
+
+
+class Stage:
+    """
+    func(job) を workers 本のスレッドで実行するステージ。
+    入力キューは maxsize で上限を持ち、前段はキューが空くまで待たされる。
+    budget（秒）を指定すると、ジョブがこのステージに最初に入った時点から 1 ファイルの持ち時間を数え、
+    func の中の通信はその残り時間に収める（cancel_token.Deadline）。
+    """
+
+    def __init__(self, name, func, workers=1, maxsize=8, budget=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.budget = budget
+        self.inbox = queue.Queue(maxsize=maxsize)
+        self.processed = 0
+        self.dropped = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+        self._alive = 0
+
+    def depth(self):
+        return self.inbox.qsize()
+
+
+class EnrichPipeline:
+    """
+    stages を順に通してジョブを処理する。
+    should_stop() が True になるか cancel（CancelToken）が中断されたら、新しいジョブの投入をやめ、
+    まだ始めていないジョブを捨て、通信中のリクエストを打ち切る。始めた書き込みは最後まで行う。
+    """
+
+    PROGRESS_INTERVAL = 0.5
+    # should_stop() を見る間隔（中断の反応時間の上限）
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, stages, on_result, should_stop=None, on_progress=None, cancel=None):
+        self.stages = stages
+        self.on_result = on_result
+        self.should_stop = should_stop or (lambda: False)
+        self.on_progress = on_progress
+        self.cancel = cancel or CancelToken()
+        self._out = queue.Queue()
+        self._started = None
+
+    def run(self, items):
+        """items を処理する。中断した場合（処理中に should_stop() か cancel で中断を求められた場合）は True を返す"""
+        self._started = time.monotonic()
+        threads = []
+        for pos, stage in enumerate(self.stages):
+            stage._alive = stage.workers
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(pos,), name=f"{stage.name}-{n}", daemon=True)
+                t.start()
+                threads.append(t)
+        feeder = threading.Thread(target=self._feed, args=(items,), name="feeder", daemon=True)
+        feeder.start()
+
+        last_progress = 0.0
+        while True:
+            if not self.cancel.is_cancelled() and self.should_stop():
+                self.cancel.cancel()
+            try:
+                job = self._out.get(timeout=self.POLL_INTERVAL)
+            except queue.Empty:
+                job = None
+            if job is _DONE:
+                # 最後のジョブの後に押された中断も取りこぼさない
+                if not self.cancel.is_cancelled() and self.should_stop():
+                    self.cancel.cancel()
+                break
+            if job is not None:
+                self.on_result(job)
+            now = time.monotonic()
+            if self.on_progress and now - last_progress >= self.PROGRESS_INTERVAL:
+                last_progress = now
+                self.on_progress(self.snapshot())
+        feeder.join()
+        for t in threads:
+            t.join()
+        if self.on_progress:
+            self.on_progress(self.snapshot())
+        # 捨てたジョブがなくても（最後のジョブの処理中に押された場合など）中断は中断として返す
+        return self.cancel.is_cancelled()
+
+    def dropped(self):
+        """中断で捨てたジョブの数"""
+        return sum(stage.dropped for stage in self.stages)
+
+    def _feed(self, items):
+        first = self.stages[0]
+        for index, item in enumerate(items):
+            if self.cancel.is_cancelled():
+                break
+            first.inbox.put(Job(index, item))
+        for _ in range(first.workers):
+            first.inbox.put(_DONE)
+
+    def _worker(self, pos):
+        stage = self.stages[pos]
+        nxt = self.stages[pos + 1] if pos + 1 < len(self.stages) else None
+        while True:
+            job = stage.inbox.get()
+            if job is _DONE:
+                break
+            if self.cancel.is_cancelled():
+                # 中断後は、まだ始めていないジョブを捨てる
+                with stage._lock:
+                    stage.dropped += 1
+                continue
+            if stage.budget and job.deadline is None:
+                job.deadline = self.cancel.child(stage.budget)
+            start = time.monotonic()
+            cancelled = False
+            try:
+                with activate(job.deadline if stage.budget else self.cancel):
+                    stage.func(job)
+            except Cancelled:
+                cancelled = True
+            except Exception as e:
+                job.error = e
+                job.finished = True
+            with stage._lock:
+                stage.processed += not cancelled
+                stage.dropped += cancelled
+                stage.busy += time.monotonic() - start
+            if cancelled:
+                continue
+            if nxt is None or job.finished:
+                self._out.put(job)
+            else:
+                nxt.inbox.put(job)
+
+        # 最後に抜けたワーカーが次段へ終端を伝える
+        with stage._lock:
+            stage._alive -= 1
+            last = stage._alive == 0
+        if last:
+            if nxt is None:
+                self._out.put(_DONE)
+            else:
+                for _ in range(nxt.workers):
+                    nxt.inbox.put(_DONE)
+
+    def snapshot(self):
+        """各ステージの (名前, キュー待ち件数, 処理済み件数, 件/秒) のリスト"""
+        elapsed = max(time.monotonic() - (self._started or time.monotonic()), 1e-6)
+        return [(s.name, s.depth(), s.processed, s.processed / elapsed) for s in self.stages]
+
+
+def format_progress(snapshot):
+    """snapshot() を進捗ラベル用の文字列にする"""
+    return " | ".join(f"{name} 待ち{depth} {rate:.1f}件/s" for name, depth, _, rate in snapshot)
@@ -0,0 +1,398 @@
+"""
+タグ部分だけを読む軽量リーダー（一覧のスキャン用）。
+
+mutagen でファイル全体を開く代わりに、必要な範囲だけを読む。
+- mp3: ID3v2 のヘッダーが示すタグ領域（必要なフレームの本体だけ）と末尾の 128 バイト
+- flac: METADATA_BLOCK のヘッダーと VORBIS_COMMENT ブロック
+- m4a: トップレベルの atom ヘッダーをたどり、moov/udta/meta/ilst の必要な項目だけ
+       （mdat が moov より前にあっても mdat は読み飛ばす）
+
+画像（APIC / PICTURE / covr）や音声データは読まずにシークで飛ばすので、
+ネットワーク共有上でも 1 ファイルあたり数 KB の読み込みで済む。
+非同期化・圧縮フレーム・ID3v2.2・ID3v1 併用など、mutagen と同じ結果を保証できない構造は
+FastTagError を送出する。呼び出し側は mutagen で読み直すこと。
+"""
+import io, os, re, struct
+from itertools import zip_longest
+
+# 戻り値の並び（TagSnapshot の先頭 7 列と同じ）
+FIELDS = ("title", "artist", "comment", "lyricist", "composer", "remixer", "year")
+
+BUFFER_SIZE = 8192
+
+
+class FastTagError(ValueError):
+    """高速読み取りで扱えない構造（mutagen で読み直す）"""
+
+
+class _CountingRaw(io.RawIOBase):
+    """実際にディスクから読んだバイト数と回数を数える"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes = 0
+        self.reads = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.raw.readinto(b)
+        if n:
+            self.bytes += n
+            self.reads += 1
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self.raw.seek(offset, whence)
+
+    def tell(self):
+        return self.raw.tell()
+
+    def fileno(self):
+        return self.raw.fileno()
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def open_counting(filepath, buffer_size=BUFFER_SIZE):
+    """読み込み量を数えるバッファ付きファイルを開く。(file, counter) を返す（ベンチマークでも使う）"""
+    raw = _CountingRaw(io.FileIO(filepath, "rb"))
+    return io.BufferedReader(raw, buffer_size=buffer_size), raw
+
+
+def _read_exact(f, n):
+    data = f.read(n)
+    if len(data) != n:
+        raise FastTagError("ファイルが途中で終わっています")
+    return data
+
+
+def read_tag_values(filepath, stats=None):
+    """
+    タイトル〜発売年の 7 項目をタプルで返す（FIELDS の順、値がなければ空文字）。
+    stats を渡すと "bytes"（読み込んだバイト数）と "reads"（読み込み回数）を加算する。
+    """
+    ext = os.path.splitext(filepath)[1].lower()
+    reader = _READERS.get(ext)
+    if reader is None:
+        raise FastTagError(f"未対応フォーマット '{ext}'")
+    f, counter = open_counting(filepath)
+    try:
+        size = os.fstat(f.fileno()).st_size
+        values = reader(f, size)
+    finally:
+        f.close()
+        if stats is not None:
+            stats["bytes"] = stats.get("bytes", 0) + counter.bytes
+            stats["reads"] = stats.get("reads", 0) + counter.reads
+    return tuple(values.get(field, "") for field in FIELDS)
+
+
+# --- ID3v2 (mp3) ---
+
+_ID3_TEXT = {"TIT2": "title", "TPE1": "artist", "TCOM": "composer"}
+_ID3_TXXX = {"LYRICIST": "lyricist", "MIXARTIST": "remixer"}
+_ID3_WANTED = {"TIT2", "TPE1", "TCOM", "TXXX", "COMM", "TDRC", "TYER", "TDAT", "TIME"}
+_ID3_ENCODINGS = {0: "latin-1", 1: "utf-16", 2: "utf-16-be", 3: "utf-8"}
+_FRAME_ID = re.compile(rb"[A-Z0-9]{4}\Z")
+_TIMESTAMP_SPLIT = re.compile(r"[-T:/.]|\s+")
+_TIMESTAMP_FORMATS = ("%04d",) + ("%02d",) * 5
+_TIMESTAMP_SEPS = ("-", "-", " ", ":", ":", "x")
+
+
+def _synchsafe(data):
+    if any(b & 0x80 for b in data):
+        raise FastTagError("synchsafe 整数ではないサイズ")
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _split_terminated(enc, data):
+    """終端文字で区切られた文字列のリスト（最後の終端の後の空文字は含めない）"""
+    term = b"\x00\x00" if enc in (1, 2) else b"\x00"
+    parts = []
+    start = 0
+    while True:
+        pos = data.find(term, start)
+        # UTF-16 は 2 バイト境界の終端だけを区切りとみなす
+        while len(term) == 2 and pos != -1 and (pos - start) % 2:
+            pos = data.find(term, pos + 1)
+        if pos == -1:
+            if start < len(data):
+                parts.append(data[start:])
+            break
+        parts.append(data[start:pos])
+        start = pos + len(term)
+    try:
+        return [p.decode(_ID3_ENCODINGS[enc]) for p in parts]
+    except (KeyError, UnicodeDecodeError) as e:
+        raise FastTagError(f"テキストを復号できません: {e}")
+
+
+def _text_values(body):
+    if not body:
+        return []
+    return _split_terminated(body[0], body[1:])
+
+
+def _read_id3(f, size):
+    header = _read_exact(f, 10)
+    if header[:3] != b"ID3":
+        raise FastTagError("ID3v2 タグなし")
+    major, flags = header[3], header[5]
+    if major not in (3, 4):
+        raise FastTagError(f"ID3v2.{major} は未対応")
+    if flags & 0x80:
+        raise FastTagError("非同期化されたタグ")
+    end = 10 + _synchsafe(header[6:10])
+    if end > size:
+        raise FastTagError("タグサイズがファイルより大きい")
+    pos = 10
+    if flags & 0x40:
+        ext = _read_exact(f, 4)
+        pos += _synchsafe(ext) if major == 4 else 4 + struct.unpack(">I", ext)[0]
+        f.seek(pos)
+
+    frames = {}
+    while pos + 10 <= end:
+        fheader = _read_exact(f, 10)
+        fid = fheader[:4]
+        if fid[0] == 0:
+            break  # パディング
+        if not _FRAME_ID.match(fid):
+            raise FastTagError(f"不正なフレーム ID {fid!r}")
+        fsize = _synchsafe(fheader[4:8]) if major == 4 else struct.unpack(">I", fheader[4:8])[0]
+        fflags = struct.unpack(">H", fheader[8:10])[0]
+        pos += 10
+        if pos + fsize > end:
+            raise FastTagError("フレームがタグ領域を超えています")
+        fid = fid.decode("ascii")
+        if fid in _ID3_WANTED:
+            # 圧縮・暗号化・グループ化・フレーム単位の非同期化などは mutagen に任せる
+            if fflags & (0x004F if major == 4 else 0x00E0):
+                raise FastTagError(f"{fid} フレームのフラグが未対応")
+            frames.setdefault(fid, []).append(_read_exact(f, fsize))
+        else:
+            f.seek(fsize, io.SEEK_CUR)
+        pos += fsize
+
+    # mutagen は末尾の ID3v1 タグを足りないフレームの補完に使うので、その場合は任せる
+    if size >= end + 128:
+        f.seek(size - 128)
+        if f.read(3) == b"TAG":
+            raise FastTagError("ID3v1 タグ併用")
+
+    values = {}
+    for fid, field in _ID3_TEXT.items():
+        bodies = frames.get(fid, [])
+        if len(bodies) > 1:
+            raise FastTagError(f"{fid} フレームが複数あります")
+        if bodies:
+            texts = _text_values(bodies[0])
+            values[field] = texts[0] if texts else ""
+
+    for body in frames.get("TXXX", []):
+        if not body:
+            continue
+        desc, *texts = _split_terminated(body[0], body[1:]) or [""]
+        field = _ID3_TXXX.get(desc)
+        if field is None:
+            continue
+        if field in values:
+            raise FastTagError(f"TXXX:{desc} が複数あります")
+        values[field] = texts[0] if texts else ""
+
+    comments = []
+    for body in frames.get("COMM", []):
+        if len(body) < 4:
+            raise FastTagError("COMM フレームが短すぎます")
+        lang = body[1:4]
+        desc, *texts = _split_terminated(body[0], body[4:]) or [""]
+        if lang == b"eng" and desc == "":
+            comments.append(texts)
+    if len(comments) > 1:
+        raise FastTagError("COMM フレームが複数あります")
+    if comments:
+        values["comment"] = " ".join(t for t in comments[0] if t).strip()
+
+    # 発売年: TDRC。なければ mutagen と同じく TYER/TDAT/TIME から組み立てる
+    years = frames.get("TDRC", [])
+    if len(years) > 1 or any(len(frames.get(fid, [])) > 1 for fid in ("TYER", "TDAT", "TIME")):
+        raise FastTagError("発売年のフレームが複数あります")
+    if years:
+        texts = _text_values(years[0])
+        values["year"] = _timestamp_text(texts[0]) if texts else ""
+    elif "TYER" in frames:
+        values["year"] = _timestamp_text(_v23_timestamp(*(
+            _text_values(frames[fid][0]) if fid in frames else [] for fid in ("TYER", "TDAT", "TIME"))))
+    return values
+
+
+def _timestamp_text(text):
+    """mutagen の ID3TimeStamp と同じ正規化（"2019-05-01T12:30" → "2019-05-01 12:30"）"""
+    parts = _TIMESTAMP_SPLIT.split(text + ":::::")[:6]
+    pieces = []
+    for part, fmt, sep in zip(parts, _TIMESTAMP_FORMATS, _TIMESTAMP_SEPS):
+        try:
+            pieces.append(fmt % int(part) + sep)
+        except ValueError:
+            break
+    return "".join(pieces)[:-1]
+
+
+def _v23_timestamp(tyers, tdats, times):
+    """mutagen の update_to_v24 と同じ規則で TYER/TDAT/TIME から TDRC の最初の値を作る"""
+    for tyer, tdat, time in zip_longest(tyers, tdats, times, fillvalue=""):
+        ym = re.match(r"([0-9]{4})(-[0-9]{2}-[0-9]{2})?\Z", tyer)
+        if not ym:
+            continue
+        year, month_day = ym.groups()
+        dm = re.match(r"([0-9]{2})([0-9]{2})\Z", tdat)
+        tm = re.match(r"([0-9]{2})([0-9]{2})\Z", time)
+        if dm:
+            month_day = "-%s-%s" % dm.groups()[::-1]
+        timestamp = year
+        if month_day:
+            timestamp += month_day
+            if tm:
+                timestamp += "T%s:%s:00" % tm.groups()
+        return timestamp
+    return ""
+
+
+# --- FLAC ---
+
+_VORBIS_FIELDS = {
+    "title": "title",
+    "artist": "artist",
+    "comment": "comment",
+    "lyricist": "lyricist",
+    "composer": "composer",
+    "mixartist": "remixer",
+    "date": "year",
+}
+
+
+def _read_flac(f, size):
+    if _read_exact(f, 4) != b"fLaC":
+        raise FastTagError("fLaC マーカーなし")
+    values = {}
+    found = False
+    while True:
+        header = _read_exact(f, 4)
+        last, btype = header[0] & 0x80, header[0] & 0x7F
+        length = int.from_bytes(header[1:4], "big")
+        if btype == 4:
+            if found:
+                raise FastTagError("VORBIS_COMMENT ブロックが複数あります")
+            found = True
+            _parse_vorbis(_read_exact(f, length), values)
+        else:
+            # STREAMINFO・PICTURE などは読まずに飛ばす
+            f.seek(length, io.SEEK_CUR)
+        if last:
+            break
+        if f.tell() >= size:
+            raise FastTagError("最後のメタデータブロックがありません")
+    return values
+
+
+def _parse_vorbis(data, values):
+    try:
+        vendor = struct.unpack_from("<I", data, 0)[0]
+        pos = 4 + vendor
+        count = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+        for _ in range(count):
+            length = struct.unpack_from("<I", data, pos)[0]
+            pos += 4
+            entry = data[pos:pos + length]
+            pos += length
+            if len(entry) != length or b"=" not in entry:
+                raise FastTagError("不正なコメント")
+            key, value = entry.split(b"=", 1)
+            field = _VORBIS_FIELDS.get(key.decode("ascii").lower())
+            # 同じキーが複数あるときは mutagen と同じく最初の値を使う
+            if field and field not in values:
+                values[field] = value.decode("utf-8", "replace")
+    except (struct.error, UnicodeDecodeError) as e:
+        raise FastTagError(f"VORBIS_COMMENT を解析できません: {e}")
+
+
+# --- MP4 (m4a) ---
+
+_MP4_FIELDS = {
+    b"\xa9nam": "title",
+    b"\xa9ART": "artist",
+    b"\xa9cmt": "comment",
+    b"\xa9lyr": "lyricist",
+    b"\xa9wrt": "composer",
+    b"\xa9day": "year",
+}
+
+
+def _mp4_atoms(f, start, end):
+    """start〜end の範囲の子 atom を (名前, 本体の開始位置, 終了位置) で列挙する"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, name = struct.unpack(">I4s", _read_exact(f, 8))
+        body = pos + 8
+        if size == 1:
+            size = struct.unpack(">Q", _read_exact(f, 8))[0]
+            body += 8
+        elif size == 0:
+            size = end - pos
+        if size < body - pos or pos + size > end:
+            raise FastTagError(f"不正な atom サイズ ({name!r})")
+        yield name, body, pos + size
+        pos += size
+
+
+def _mp4_find(f, start, end, name):
+    for child, body, child_end in _mp4_atoms(f, start, end):
+        if child == name:
+            return body, child_end
+    return None
+
+
+def _read_mp4(f, size):
+    moov = _mp4_find(f, 0, size, b"moov")
+    if moov is None:
+        raise FastTagError("moov atom なし")
+    udta = _mp4_find(f, *moov, b"udta")
+    meta = udta and _mp4_find(f, *udta, b"meta")
+    # meta はフルボックス（4 バイトのバージョン・フラグの後に子 atom が続く）
+    ilst = meta and _mp4_find(f, meta[0] + 4, meta[1], b"ilst")
+    values = {}
+    if not ilst:
+        return values
+    for name, body, item_end in list(_mp4_atoms(f, *ilst)):
+        field = _MP4_FIELDS.get(name)
+        if field is None:
+            continue  # covr などは読まない
+        if field in values:
+            raise FastTagError(f"{name!r} が複数あります")
+        texts = []
+        for child, data_start, data_end in list(_mp4_atoms(f, body, item_end)):
+            if child != b"data":
+                raise FastTagError(f"{name!r} に data 以外の atom があります")
+            f.seek(data_start)
+            data = _read_exact(f, data_end - data_start)
+            if len(data) < 8 or struct.unpack(">I", data[:4])[0] != 1:
+                raise FastTagError(f"{name!r} が UTF-8 テキストではありません")
+            texts.append(data[8:].decode("utf-8", "replace"))
+        values[field] = texts[0] if texts else ""
+    return values
+
+
+_READERS = {
+    ".mp3": _read_id3,
+    ".flac": _read_flac,
+    ".m4a": _read_mp4,
+}
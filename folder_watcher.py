@@ -0,0 +1,105 @@
+"""
+フォルダの監視（常駐モード）。
+
+interval 秒ごとにフォルダを走査し（iter_audio_files と同じく 1 ファイル 1 回の stat だけで、タグは読まない）、
+前回から追加・変更された音源ファイルを見つける。コピー途中のファイルを拾わないよう、
+サイズと更新時刻が settle 秒以上変わらなくなったファイルだけを返す。
+取得・書き込みは返したファイルだけに行うので、処理量はライブラリの大きさではなく新しいファイルの数で決まる。
+処理し終えたファイルは mark_done() で現在のサイズ・更新時刻を覚え直し、自分の書き込みを変更として拾い直さない。
+"""
+import os, time
+
+from library_scanner import iter_audio_files
+from cancel_token import Cancelled
+from metrics import get_metrics, timed
+
+# 走査の間隔（秒）
+DEFAULT_POLL_INTERVAL = 5.0
+# この秒数サイズと更新時刻が変わらなければ、書き込みが終わったとみなす
+DEFAULT_SETTLE = 10.0
+
+
+class FolderWatcher:
+    """folders 以下の新規・変更ファイルを見つける。poll() は 1 つのスレッドから呼ぶ"""
+
+    def __init__(self, folders, settle=DEFAULT_SETTLE):
+        self.folders = list(folders)
+        self.settle = settle
+        self._known = {}    # path -> (size, mtime) 処理済み（または監視開始時からある）状態
+        self._pending = {}  # path -> ((size, mtime), その状態を最初に見た時刻)
+
+    @timed("watch_scan")
+    def _scan(self):
+        current = {}
+        for folder in self.folders:
+            for path, size, mtime in iter_audio_files(folder):
+                current[path] = (size, mtime)
+        return current
+
+    def prime(self):
+        """今あるファイルを処理済みとして覚える。見つかったファイルのリストを返す"""
+        self._known = self._scan()
+        self._pending.clear()
+        return list(self._known)
+
+    def poll(self, now=None):
+        """
+        1 回走査し、追加・変更されてから settle 秒以上変化のないファイルのリストを返す。
+        返したファイルは mark_done() されるまで処理中として扱い、二重には返さない
+        """
+        now = time.monotonic() if now is None else now
+        current = self._scan()
+        ready = []
+        for path, state in current.items():
+            if self._known.get(path) == state:
+                self._pending.pop(path, None)
+                continue
+            seen = self._pending.get(path)
+            if seen is None or seen[0] != state:
+                # 新しく見つかった、またはまだ書き込まれている
+                self._pending[path] = (state, now)
+            elif now - seen[1] >= self.settle:
+                ready.append(path)
+                self._known[path] = state
+                del self._pending[path]
+        for table in (self._known, self._pending):
+            for path in [p for p in table if p not in current]:
+                del table[path]
+        get_metrics().inc("watch_found", len(ready))
+        return ready
+
+    def waiting(self):
+        """変化が収まるのを待っているファイルの数"""
+        return len(self._pending)
+
+    def mark_done(self, paths):
+        """処理し終えたファイルの現在のサイズ・更新時刻を覚える（タグの書き込みを変更として拾わない）"""
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self._known.pop(path, None)
+                continue
+            self._known[path] = (st.st_size, st.st_mtime)
+
+
+def watch(watcher, process, cancel, interval=DEFAULT_POLL_INTERVAL, on_found=None):
+    """
+    cancel（CancelToken）が中断されるまで interval 秒ごとに watcher.poll() し、
+    見つかったファイルを process(paths) に渡す。process は 1 回ずつ順に呼ばれ、中断したら True を返す。
+    処理の途中で中断した場合は True、待機中に中断した場合は False を返す。
+    処理中に追加されたファイルは次の走査で拾う
+    """
+    while True:
+        try:
+            cancel.sleep(interval)
+        except Cancelled:
+            return False
+        paths = watcher.poll()
+        if not paths:
+            continue
+        if on_found:
+            on_found(paths)
+        if process(paths):
+            return True
+        watcher.mark_done(paths)
@@ -0,0 +1,591 @@
+"""
+uta-net 向けの共有 HTTP クライアント。
+
+requests.Session を 1 つだけ使い回し、接続プール（keep-alive）で
+TCP/TLS ハンドシェイクを検索・曲ページ取得の間で共有する。
+プールサイズ・タイムアウト・ヘッダは configure() でまとめて変更する。
+
+一時的な失敗（タイムアウト・接続リセット・429/5xx）は指数バックオフ＋ジッターで再試行し、
+Retry-After があればそれに従う。失敗率が急に上がったらサーキットブレーカーが開き、
+一定時間すべてのリクエストを止めてから 1 件だけ試し、成功すれば自動で再開する。
+
+呼び出し元スレッドの current_token()（cancel_token 参照）が中断されると、待ちはすぐに終わり、
+受信中のリクエストはソケットを閉じて打ち切る。持ち時間（Deadline）があれば、タイムアウトと再試行をその中に収める。
+"""
+import email.utils, random, socket, threading, time
+from collections import deque, namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from cancel_token import CancelToken, Cancelled, current_token
+
+USER_AGENT = "PythonTagEnricher/1.0"
+HEADERS = {"User-Agent": USER_AGENT}
+
+# HTTP 設定（変更は configure() 経由で行う）
+HTTP_CONFIG = {
+    "pool_connections": 4,   # ホストごとのプール数
+    "pool_maxsize": 8,       # 1 ホストあたりの保持接続数
+    "connect_timeout": 5,    # 接続タイムアウト（秒）
+    "read_timeout": 10,      # 受信タイムアウト（秒）
+    "headers": HEADERS,
+    "rate_limit": 4.0,       # uta-net への平均リクエスト数（件/秒）。0 で無制限
+    "rate_burst": 4,         # 連続して送ってよい最大件数
+    "chunk_size": 2048,      # consumer へ渡す受信チャンクの大きさ（バイト）。小さいほど早く打ち切れる
+    # 受信を打ち切ったとき、残りがこれ以下なら読み捨てて接続を再利用する（超えたら接続を閉じる）。
+    # 大きくすると打ち切った分まで読むことになるので、ページの末尾（閉じタグ程度）だけにとどめる
+    "drain_limit": 2048,
+    "max_retries": 3,        # 一時的な失敗の再試行回数。0 で再試行しない
+    "backoff_base": 0.5,     # 再試行の待ち時間の基準（秒）。回数ごとに倍にし、半分〜全体の間でばらつかせる
+    "backoff_max": 30.0,     # 再試行の待ち時間の上限（秒）
+    "retry_after_max": 120.0,  # Retry-After がこれより長ければ再試行しない（秒）
+    "retry_statuses": (429, 500, 502, 503, 504),
+    "breaker_window": 20,    # 失敗率を見る直近のリクエスト数
+    "breaker_min_requests": 8,  # 直近がこれ未満の件数ならブレーカーは開かない
+    "breaker_error_rate": 0.5,  # 直近の失敗率がこれ以上でブレーカーを開く
+    "breaker_cooldown": 30.0,   # ブレーカーを開いておく時間（秒）。再開の試行に失敗するたびに倍にする
+    "breaker_max_cooldown": 300.0,
+}
+
+# 再試行する通信エラー（タイムアウト・接続リセット・受信途中の切断）
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# 1 リクエスト分の計測値（秒）
+# connect: TCP+TLS 接続に要した時間（keep-alive で再利用した場合は 0）
+# wait: 送信からレスポンスヘッダ受信まで（connect を除く）
+# transfer: ボディ受信に要した時間（consumer の処理時間を含む）
+# parse: transfer のうち consumer（HTML の抽出）に要した時間
+RequestTiming = namedtuple(
+    "RequestTiming",
+    ["url", "status", "reused", "connect", "wait", "transfer", "total", "bytes", "parse"],
+)
+
+# 接続時間はワーカースレッドごとに記録し、リクエスト単位で回収する
+_local = threading.local()
+
+
+# 中断されることのない既定のトークン
+_NEVER = CancelToken()
+
+
+def _record_connect(elapsed):
+    _local.connect = getattr(_local, "connect", 0.0) + elapsed
+    _local.connects = getattr(_local, "connects", 0) + 1
+
+
+class _InFlight:
+    """
+    実行中の 1 リクエストが使っている接続。abort() は別スレッドから呼ばれ、
+    ソケットを閉じて受信待ちを終わらせる（接続前に呼ばれた場合は接続した時点で閉じる）
+    """
+
+    def __init__(self):
+        self.conn = None
+        self.aborted = False
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self.conn = conn
+            aborted = self.aborted
+        if aborted:
+            _shutdown(conn)
+
+    def abort(self):
+        with self._lock:
+            self.aborted = True
+            conn = self.conn
+        if conn is not None:
+            _shutdown(conn)
+
+
+def _shutdown(conn):
+    sock = getattr(conn, "sock", None)
+    if sock is not None:
+        try:
+            # SSLSocket の shutdown() は TLS の状態を捨ててしまうので、下の socket を直接閉じる
+            socket.socket.shutdown(sock, socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+def _attach_in_flight(conn):
+    in_flight = getattr(_local, "in_flight", None)
+    if in_flight is not None:
+        in_flight.attach(conn)
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+        _attach_in_flight(self)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            _record_connect(time.perf_counter() - start)
+        _attach_in_flight(self)
+
+
+class _AbortablePoolMixin:
+    """プールから取り出した接続を、このスレッドで実行中のリクエストに結びつける"""
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        _attach_in_flight(conn)
+        return conn
+
+
+class _TimedHTTPConnectionPool(_AbortablePoolMixin, HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_AbortablePoolMixin, HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """新規接続の確立時間を計測できるプールを使うアダプタ"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class TokenBucket:
+    """
+    トークンバケット方式のレート制限。全スレッドで共有し、
+    acquire() はトークンが貯まるまで待ってから 1 つ消費する。
+    burst=0 ならトークンを貯めず、どのリクエストも頼んだ時点から 1/rate 秒待ち、
+    前のリクエストとも 1/rate 秒以上あける（暇な間に貯めた分をまとめて送ることがない）。
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(burst, 0)
+        self._tokens = float(self.burst)
+        self._stamp = time.monotonic()
+        self._next = self._stamp  # burst=0 のとき、次のリクエストを送ってよい最も早い時刻
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=_NEVER):
+        """トークンを 1 つ取得する。待った秒数を返す。cancel が中断されたら Cancelled を送出する"""
+        if not self.rate:
+            return 0.0
+        if not self.burst:
+            return self._acquire_paced(cancel)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            cancel.sleep(delay)
+            waited += delay
+
+    def _acquire_paced(self, cancel):
+        interval = 1 / self.rate
+        with self._lock:
+            now = time.monotonic()
+            # 送る時刻を先に予約する（中断しても予約した枠は使わずに捨てる）
+            slot = max(now, self._next) + interval
+            self._next = slot
+        delay = slot - now
+        cancel.sleep(delay)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    全スレッドで共有するサーキットブレーカー。
+    直近 window 件の失敗率が error_rate 以上になると開き（open）、cooldown 秒間 wait() で全員を待たせる。
+    その後 1 件だけ試行を通し（half-open）、成功すれば閉じ、失敗すれば cooldown を倍にして開き直す。
+    """
+
+    def __init__(self, window, min_requests, error_rate, cooldown, max_cooldown):
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opens = 0
+        self._results = deque(maxlen=max(window, 1))
+        self._open_until = 0.0
+        self._opened_at = None
+        self._open_time = 0.0
+        self._probing = False
+        self._cond = threading.Condition()
+
+    def wait(self, cancel=_NEVER):
+        """ブレーカーが開いている間は待つ。待った秒数を返す。cancel が中断されたら Cancelled を送出する"""
+        start = time.monotonic()
+        cancel.on_cancel(self._wake)
+        try:
+            self._wait(cancel)
+        finally:
+            cancel.remove(self._wake)
+        return time.monotonic() - start
+
+    def _wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def _wait(self, cancel):
+        with self._cond:
+            while True:
+                # ブレーカーの待ちは持ち時間に数えないので、見るのは中断だけ
+                if cancel.is_cancelled():
+                    raise Cancelled()
+                if self.state == "closed":
+                    break
+                if self.state == "open":
+                    remaining = self._open_until - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    self.state = "half_open"
+                    self._probing = False
+                if not self._probing:
+                    # 再開を試す 1 件。結果が record() されるまで他は待つ
+                    self._probing = True
+                    break
+                self._cond.wait()
+
+    def record(self, ok):
+        """試行の結果を記録する。ok=None は通信以外の理由で終わった（判定しない）"""
+        with self._cond:
+            if self.state == "half_open":
+                if ok is None:
+                    self._probing = False
+                elif ok:
+                    self._close()
+                else:
+                    self._open(min(self.cooldown * 2, self.max_cooldown))
+                self._cond.notify_all()
+                return
+            if self.state == "open" or ok is None:
+                # 開く前に送ったリクエストの結果は数えない
+                return
+            self._results.append(ok)
+            if ok:
+                return
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_requests and failures >= len(self._results) * self.error_rate:
+                self._open(self.base_cooldown)
+                self.opens += 1
+
+    def _open(self, cooldown):
+        now = time.monotonic()
+        self.state = "open"
+        self.cooldown = cooldown
+        self._open_until = now + cooldown
+        if self._opened_at is None:
+            self._opened_at = now
+
+    def _close(self):
+        self.state = "closed"
+        self.cooldown = self.base_cooldown
+        self._results.clear()
+        self._open_time += time.monotonic() - self._opened_at
+        self._opened_at = None
+
+    def stats(self):
+        """(開いた回数, 開いていた合計秒数) を返す（開いている最中の時間も含む）"""
+        with self._cond:
+            open_time = self._open_time
+            if self._opened_at is not None:
+                open_time += time.monotonic() - self._opened_at
+            return self.opens, open_time
+
+    def reset_stats(self):
+        with self._cond:
+            self.opens = 0
+            self._open_time = 0.0
+            if self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+def parse_retry_after(value):
+    """Retry-After ヘッダ（秒数または HTTP 日付）を秒数にする。解釈できなければ None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def _empty_totals():
+    return {"requests": 0, "connections": 0, "throttle": 0.0, "connect": 0.0, "wait": 0.0, "transfer": 0.0, "bytes": 0,
+            "early_stops": 0, "failures": 0, "retries": 0, "retry_wait": 0.0, "breaker_wait": 0.0}
+
+
+class HttpClient:
+    """接続プール付きの HTTP クライアント。スレッド間で共有してよい。"""
+
+    HISTORY_SIZE = 1000
+
+    def __init__(self, config=None):
+        self.config = dict(HTTP_CONFIG)
+        if config:
+            self.config.update(config)
+        self.session = requests.Session()
+        self.session.headers.update(self.config["headers"])
+        adapter = _TimedAdapter(
+            pool_connections=self.config["pool_connections"],
+            pool_maxsize=self.config["pool_maxsize"],
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.limiter = TokenBucket(self.config["rate_limit"], self.config["rate_burst"])
+        self.breaker = CircuitBreaker(
+            self.config["breaker_window"], self.config["breaker_min_requests"], self.config["breaker_error_rate"],
+            self.config["breaker_cooldown"], self.config["breaker_max_cooldown"],
+        )
+        self.history = deque(maxlen=self.HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._totals = _empty_totals()
+
+    def get(self, url, consumer=None, cancel=None, **kwargs):
+        """
+        GET してボディまで読み込んだレスポンスを返す。計測値は resp.timing に入る。
+        consumer を渡すと、成功したレスポンスのボディを受信しながら consumer.feed(resp, chunk) に渡し、
+        True が返った時点で受信をやめる（resp.content は使えない）。最後に consumer.finish() を呼ぶ。
+        一時的な失敗は再試行する（再試行の前に consumer.reset() を呼ぶ）。
+        再試行しきれなかった 429/5xx はそのレスポンスを返し、通信エラーは例外を送出する。
+        cancel（省略時は current_token()）が中断されたら Cancelled、持ち時間を超えたら DeadlineExceeded を送出する
+        """
+        cancel = cancel or current_token() or _NEVER
+        kwargs.setdefault("timeout", (self.config["connect_timeout"], self.config["read_timeout"]))
+        attempt = 0
+        while True:
+            cancel.check()
+            paused = self.breaker.wait(cancel)
+            if paused:
+                self._add("breaker_wait", paused)
+                # 全体の一時停止なので、このファイルの持ち時間には数えない
+                cancel.extend(paused)
+            try:
+                resp = self._get_once(url, consumer, cancel, **kwargs)
+            except RETRY_EXCEPTIONS:
+                if cancel.is_cancelled() or cancel.expired():
+                    # こちらから打ち切った（ソケットを閉じた・タイムアウトを縮めた）のでサーバーの失敗とは数えない
+                    self.breaker.record(None)
+                    cancel.check()
+                self.breaker.record(False)
+                self._add("failures", 1)
+                delay = self._retry_delay(attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                self.breaker.record(None)
+                raise
+            else:
+                failed = resp.status_code in self.config["retry_statuses"]
+                self.breaker.record(not failed)
+                if not failed:
+                    return resp
+                self._add("failures", 1)
+                delay = self._retry_delay(attempt, resp.headers.get("Retry-After"))
+                if delay is None:
+                    return resp
+                resp.close()
+            attempt += 1
+            if consumer is not None:
+                consumer.reset()
+            self._add("retries", 1)
+            self._add("retry_wait", delay)
+            cancel.sleep(delay, deadline=True)
+
+    def _retry_delay(self, attempt, retry_after=None):
+        """attempt 回目の失敗の後に待つ秒数。再試行しない場合は None"""
+        if attempt >= self.config["max_retries"]:
+            return None
+        seconds = parse_retry_after(retry_after)
+        if seconds is not None:
+            return seconds if seconds <= self.config["retry_after_max"] else None
+        cap = min(self.config["backoff_max"], self.config["backoff_base"] * 2 ** attempt)
+        return random.uniform(cap / 2, cap)
+
+    def _get_once(self, url, consumer, cancel, timeout, **kwargs):
+        throttle = self.limiter.acquire(cancel)
+        # 共有のレート制限の待ちも持ち時間には数えない
+        cancel.extend(throttle)
+        _local.connect = 0.0
+        _local.connects = 0
+        in_flight = _InFlight()
+        _local.in_flight = in_flight
+        cancel.on_cancel(in_flight.abort)
+        try:
+            return self._send(url, consumer, cancel, throttle, timeout=cancel.timeout(timeout), **kwargs)
+        finally:
+            cancel.remove(in_flight.abort)
+            _local.in_flight = None
+
+    def _send(self, url, consumer, cancel, throttle, **kwargs):
+        start = time.perf_counter()
+        resp = self.session.get(url, stream=True, **kwargs)
+        headers_at = time.perf_counter()
+        received = 0
+        parse = 0.0
+        stopped = False
+        try:
+            if consumer is not None and resp.ok:
+                for chunk in resp.iter_content(self.config["chunk_size"]):
+                    cancel.check()
+                    received += len(chunk)
+                    fed = time.perf_counter()
+                    done = consumer.feed(resp, chunk)
+                    parse += time.perf_counter() - fed
+                    if done:
+                        stopped = True
+                        break
+                if stopped:
+                    received += self._release_early(resp)
+                fed = time.perf_counter()
+                consumer.finish()
+                parse += time.perf_counter() - fed
+            else:
+                received = len(resp.content)
+        except BaseException:
+            resp.close()
+            raise
+        finally:
+            end = time.perf_counter()
+            connect = _local.connect
+            connects = _local.connects
+            timing = RequestTiming(
+                url=url,
+                status=resp.status_code,
+                reused=connects == 0,
+                connect=connect,
+                wait=max(headers_at - start - connect, 0.0),
+                transfer=end - headers_at,
+                total=end - start,
+                bytes=received,
+                parse=parse,
+            )
+            self._record(timing, connects, throttle, stopped)
+            resp.timing = timing
+        return resp
+
+    def _release_early(self, resp):
+        """
+        途中で読むのをやめたレスポンスの接続を片付ける。
+        残りが少なければ読み捨ててプールへ戻し、多ければ接続ごと閉じる（次回は新規接続になる）。
+        読み捨てたバイト数を返す
+        """
+        length = resp.headers.get("Content-Length")
+        remaining = int(length) - resp.raw.tell() if length and length.isdigit() else None
+        if remaining is not None and remaining <= self.config["drain_limit"]:
+            resp.raw.drain_conn()
+            resp.raw.release_conn()
+            return remaining
+        resp.close()
+        return 0
+
+    def _record(self, timing, connects, throttle, stopped=False):
+        with self._lock:
+            self.history.append(timing)
+            t = self._totals
+            t["requests"] += 1
+            t["connections"] += connects
+            t["throttle"] += throttle
+            t["connect"] += timing.connect
+            t["wait"] += timing.wait
+            t["transfer"] += timing.transfer
+            t["bytes"] += timing.bytes
+            t["early_stops"] += stopped
+
+    def _add(self, name, value):
+        with self._lock:
+            self._totals[name] += value
+
+    def stats(self):
+        """累計の計測値を辞書で返す"""
+        with self._lock:
+            totals = dict(self._totals)
+        totals["breaker_opens"], totals["breaker_open"] = self.breaker.stats()
+        return totals
+
+    def reset_stats(self):
+        with self._lock:
+            self.history.clear()
+            self._totals = _empty_totals()
+        self.breaker.reset_stats()
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def configure(**kwargs):
+    """
+    HTTP 設定を変更する。次回 get_client() から新しい設定のクライアントを使う。
+    例: configure(pool_maxsize=16, read_timeout=20, rate_limit=2.0, headers={"User-Agent": "..."})
+    """
+    global _client
+    unknown = set(kwargs) - set(HTTP_CONFIG)
+    if unknown:
+        raise ValueError(f"未知の HTTP 設定: {', '.join(sorted(unknown))}")
+    with _client_lock:
+        HTTP_CONFIG.update(kwargs)
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_client():
+    """共有 HttpClient を返す（初回呼び出し時に生成）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def format_stats(stats):
+    """stats() の結果をログ用の 1 行にまとめる"""
+    n = stats["requests"]
+    if not n:
+        return "通信統計: リクエストなし"
+    line = (
+        f"通信統計: リクエスト {n} 件 / 新規接続 {stats['connections']} 件 / "
+        f"レート制限待ち {stats['throttle']:.2f}s / 接続 {stats['connect']:.2f}s / 応答待ち {stats['wait']:.2f}s / "
+        f"転送 {stats['transfer']:.2f}s / 受信 {stats['bytes'] / 1024:.1f} KB"
+        f"（途中終了 {stats['early_stops']} 件）"
+    )
+    if stats["failures"] or stats["breaker_opens"]:
+        line += (
+            f" / 失敗 {stats['failures']} 件・再試行 {stats['retries']} 件（待ち {stats['retry_wait']:.2f}s）"
+            f" / 遮断 {stats['breaker_opens']} 回（遮断中 {stats['breaker_open']:.2f}s）"
+        )
+    return line
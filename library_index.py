@@ -0,0 +1,109 @@
+"""
+ライブラリの永続インデックス（SQLite）。
+
+ファイルごとにパス・サイズ・更新時刻と read_tags が返す 8 列を保存しておき、
+再スキャン時はサイズか更新時刻が変わったファイルだけタグを読み直す。
+"""
+import json, os, sqlite3, threading
+
+from lookup_cache import app_dir
+
+DEFAULT_PATH = os.path.join(app_dir(), "library_index.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    row TEXT NOT NULL
+);
+"""
+
+
+def _prefix_range(folder):
+    """folder 以下のパスを path の範囲検索で取り出すための (下限, 上限)"""
+    prefix = os.path.join(os.path.abspath(folder), "")
+    return prefix, prefix + "\U0010ffff"
+
+
+class LibraryIndex:
+    """スレッド間で共有できるライブラリインデックス"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def load_folder(self, folder):
+        """folder 以下の登録内容を {path: (size, mtime, 行)} で返す"""
+        low, high = _prefix_range(folder)
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT path, size, mtime, row FROM files WHERE path >= ? AND path < ?", (low, high)
+            )
+            return {p: (size, mtime, json.loads(row)) for p, size, mtime, row in cur}
+
+    def get(self, filepath):
+        """1 件の登録内容を (size, mtime, 行) で返す。未登録なら None"""
+        with self._lock:
+            hit = self._conn.execute(
+                "SELECT size, mtime, row FROM files WHERE path = ?", (os.path.abspath(filepath),)
+            ).fetchone()
+        if hit is None:
+            return None
+        return hit[0], hit[1], json.loads(hit[2])
+
+    def put_many(self, entries):
+        """entries: [(path, size, mtime, 行), ...] をまとめて登録・更新する"""
+        if not entries:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime, row) VALUES (?, ?, ?, ?)",
+                [(os.path.abspath(p), size, mtime, json.dumps(row, ensure_ascii=False)) for p, size, mtime, row in entries],
+            )
+
+    def update_file(self, filepath, row):
+        """書き込み後など、ファイルの現在の stat で 1 件更新する"""
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return
+        self.put_many([(filepath, st.st_size, st.st_mtime, row)])
+
+    def prune(self, folder, seen):
+        """folder 以下で seen に含まれないパス（削除されたファイル）を取り除く。削除件数を返す"""
+        seen = {os.path.abspath(p) for p in seen}
+        low, high = _prefix_range(folder)
+        with self._lock, self._conn:
+            stale = [
+                (p,) for (p,) in self._conn.execute(
+                    "SELECT path FROM files WHERE path >= ? AND path < ?", (low, high)
+                ) if p not in seen
+            ]
+            self._conn.executemany("DELETE FROM files WHERE path = ?", stale)
+        return len(stale)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_index = None
+_index_failed = False
+_index_lock = threading.Lock()
+
+
+def get_library_index():
+    """共有 LibraryIndex を返す。開けない場合は None（毎回すべて読み直す）"""
+    global _index, _index_failed
+    with _index_lock:
+        if _index is None and not _index_failed:
+            try:
+                _index = LibraryIndex()
+            except sqlite3.Error:
+                _index_failed = True
+        return _index
@@ -0,0 +1,87 @@
+"""
+音源フォルダのスキャナ。
+
+os.scandir で再帰的に走査し、DirEntry が持つ stat 情報（サイズ・更新時刻）をそのまま使う。
+タグの読み取りはスレッドプールで並列に行い、結果は発見順に 1 件ずつ返す。
+"""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+AUDIO_EXTS = (".mp3", ".flac", ".m4a")
+DEFAULT_SCAN_WORKERS = 8
+
+
+def iter_audio_files(folder, exts=AUDIO_EXTS):
+    """
+    folder 以下の音源ファイルを (path, size, mtime) で発見順に返す。
+    os.walk と同じく各フォルダの直下のファイルを先に返し、その後サブフォルダへ降りる。
+    シンボリックリンクのフォルダには入らない。
+    """
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        subdirs = []
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if not entry.name.lower().endswith(exts):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, st.st_size, st.st_mtime
+        stack.extend(reversed(subdirs))
+
+
+class LibraryScanner:
+    """
+    read_fn(path, size, mtime) -> 行 をワーカースレッドで並列に呼び出すスキャナ。
+    cached(path, size, mtime) が行を返した場合はタグを読まずにその行を使う。
+    先読みは workers の数倍までに抑え、巨大なライブラリでもメモリを使いすぎないようにする。
+    """
+
+    def __init__(self, read_fn, workers=DEFAULT_SCAN_WORKERS, should_stop=None, cached=None):
+        self.read_fn = read_fn
+        self.workers = max(1, int(workers))
+        self.should_stop = should_stop or (lambda: False)
+        self.cached = cached or (lambda path, size, mtime: None)
+
+    def scan(self, folder):
+        """(path, 行) を発見順に返すジェネレータ"""
+        window = self.workers * 4
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scan") as pool:
+            for path, size, mtime in iter_audio_files(folder):
+                if self.should_stop():
+                    break
+                row = self.cached(path, size, mtime)
+                if row is not None and not pending:
+                    # 読み込み待ちがなければ、そのまま返して順序を保つ
+                    yield path, row
+                    continue
+                if row is not None:
+                    pending.append((path, None, row))
+                else:
+                    pending.append((path, pool.submit(self.read_fn, path, size, mtime), None))
+                while len(pending) >= window:
+                    yield self._pop(pending)
+            while pending:
+                if self.should_stop():
+                    for _, future, _ in pending:
+                        if future is not None:
+                            future.cancel()
+                    break
+                yield self._pop(pending)
+
+    @staticmethod
+    def _pop(pending):
+        path, future, row = pending.popleft()
+        return path, (row if future is None else future.result())
@@ -0,0 +1,167 @@
+"""
+uta-net の検索結果・曲ページ情報の永続キャッシュ（SQLite）。
+
+検索結果は normalize() 済みの (タイトル, アーティスト) をキーに、
+曲ページの info 辞書は曲 ID をキーに保存する。
+「候補が見つかりませんでした」などの否定的な結果は短い TTL で保存し、
+件数が上限を超えたら最終参照が古いものから削除する。
+"""
+import json, os, sqlite3, sys, threading, time
+
+DEFAULT_TTL = 30 * 24 * 3600      # 通常の結果: 30 日
+NEGATIVE_TTL = 3 * 24 * 3600      # 候補なしなどの否定的な結果: 3 日
+MAX_ENTRIES = 100000              # テーブルごとの最大件数
+EVICT_CHECK_INTERVAL = 200        # 件数チェックを行う書き込み間隔
+
+
+def app_dir():
+    """アプリ本体と同じフォルダ（PyInstaller ビルド時は実行ファイルのフォルダ）"""
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+DEFAULT_PATH = os.path.join(app_dir(), "lookup_cache.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search (
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    song_id INTEGER,
+    error TEXT,
+    expires REAL NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (title, artist)
+);
+CREATE INDEX IF NOT EXISTS search_used ON search (used);
+CREATE TABLE IF NOT EXISTS song (
+    song_id INTEGER PRIMARY KEY,
+    info TEXT NOT NULL,
+    msg TEXT,
+    expires REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS song_used ON song (used);
+"""
+
+
+class LookupCache:
+    """スレッド間で共有できる SQLite キャッシュ"""
+
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, negative_ttl=NEGATIVE_TTL, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._writes = 0
+        self.stats = {"search_hit": 0, "search_miss": 0, "song_hit": 0, "song_miss": 0}
+
+    def get_search(self, ntitle, nartist):
+        """(song_id, err) を返す。キャッシュにない・期限切れなら None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT song_id, error, expires FROM search WHERE title=? AND artist=?",
+                (ntitle, nartist),
+            ).fetchone()
+            if row is None or row[2] < now:
+                self.stats["search_miss"] += 1
+                return None
+            self._conn.execute("UPDATE search SET used=? WHERE title=? AND artist=?", (now, ntitle, nartist))
+            self.stats["search_hit"] += 1
+        return row[0], row[1]
+
+    def put_search(self, ntitle, nartist, song_id, err):
+        now = time.time()
+        ttl = self.ttl if song_id is not None else self.negative_ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search (title, artist, song_id, error, expires, used) VALUES (?, ?, ?, ?, ?, ?)",
+                (ntitle, nartist, song_id, err, now + ttl, now),
+            )
+            self._after_write()
+
+    def get_song(self, song_id):
+        """(info, msg) を返す。キャッシュにない・期限切れなら None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, msg, expires FROM song WHERE song_id=?", (song_id,)
+            ).fetchone()
+            if row is None or row[2] < now:
+                self.stats["song_miss"] += 1
+                return None
+            self._conn.execute("UPDATE song SET used=? WHERE song_id=?", (now, song_id))
+            self.stats["song_hit"] += 1
+        return json.loads(row[0]), row[1]
+
+    def put_song(self, song_id, info, msg):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO song (song_id, info, msg, expires, used) VALUES (?, ?, ?, ?, ?)",
+                (song_id, json.dumps(info, ensure_ascii=False), msg, now + self.ttl, now),
+            )
+            self._after_write()
+
+    def _after_write(self):
+        # 毎回 COUNT するのは重いので一定回数ごとに上限チェックする
+        self._writes += 1
+        if self._writes % EVICT_CHECK_INTERVAL == 0:
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for table in ("search", "song"):
+            self._conn.execute(f"DELETE FROM {table} WHERE expires < ?", (now,))
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} ORDER BY used LIMIT ?)",
+                    (excess,),
+                )
+
+    def reset_stats(self):
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search")
+            self._conn.execute("DELETE FROM song")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_failed = False
+_cache_lock = threading.Lock()
+
+
+def get_lookup_cache():
+    """共有 LookupCache を返す。開けない場合（読み取り専用フォルダなど）は None"""
+    global _cache, _cache_failed
+    with _cache_lock:
+        if _cache is None and not _cache_failed:
+            try:
+                _cache = LookupCache()
+            except sqlite3.Error:
+                _cache_failed = True
+        return _cache
+
+
+def format_cache_stats(stats):
+    """stats をログ用の 1 行にまとめる"""
+    return (
+        f"キャッシュ: 検索 ヒット {stats['search_hit']} / ミス {stats['search_miss']}, "
+        f"曲ページ ヒット {stats['song_hit']} / ミス {stats['song_miss']}"
+    )
@@ -0,0 +1,283 @@
+"""
+処理ごとの計測（件数・失敗数・所要時間のヒストグラム）。
+
+スキャン・タグ読み取り・検索・曲ページ取得・HTML 抽出・タグ解析・保存・一覧の更新など、
+時間のかかる箇所を timed() で囲むと、処理名ごとに件数と所要時間が集計される。
+GUI の統計欄は format_metrics() を定期的に表示し、実行の終わりに export() で
+JSON と Prometheus の textfile（node exporter の textfile collector 用）に書き出す。
+"""
+import bisect, json, os, threading, time
+from contextlib import contextmanager
+
+from lookup_cache import app_dir
+
+# ヒストグラムのバケット上限（秒）。インデックスからの読み取り（数十 µs）から通信の再試行（数十秒）まで
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 処理名と表示名（表示順）
+OPERATIONS = {
+    "startup": "起動（画面表示まで）",
+    "scan": "フォルダ読み込み",
+    "read_tags": "タグ読み取り",
+    "local_lookup": "取り込んだ曲情報の照合",
+    "song_id": "曲 ID 取得",
+    "search_http": "検索ページ通信",
+    "artist_http": "歌手ページ通信",
+    "song_page": "曲情報取得",
+    "song_http": "曲ページ通信",
+    "extract": "HTML 抽出",
+    "open_tags": "タグ解析",
+    "write_tags": "タグ書き込み",
+    "save": "ファイル保存",
+    "tree_refresh": "一覧の更新",
+    "watch_scan": "監視フォルダの走査",
+    "stop": "中断（要求から停止まで）",
+}
+
+PROM_PREFIX = "creditget"
+
+# GUI が実行の終わりに書き出す先（コマンドライン版は --metrics-json / --metrics-prom で指定する）
+DEFAULT_JSON_PATH = os.path.join(app_dir(), "run_metrics.json")
+DEFAULT_PROM_PATH = os.path.join(app_dir(), "creditget.prom")
+
+
+class Histogram:
+    """1 処理分の件数・失敗数・合計・最小・最大と、バケットごとの件数"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def observe(self, seconds, ok=True):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.errors += not ok
+        self.sum += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """バケット内を線形補間した q 分位点（Prometheus の histogram_quantile と同じ考え方。実測の最小・最大に収める）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS):
+                    return self.max
+                lower = BUCKETS[i - 1] if i else 0.0
+                value = lower + (BUCKETS[i] - lower) * (rank - seen) / n
+                return min(max(value, self.min), self.max)
+            seen += n
+        return self.max
+
+    def snapshot(self):
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(BUCKETS, self.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum": round(self.sum, 6),
+            "min": round(self.min or 0.0, 6),
+            "max": round(self.max, 6),
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "buckets": buckets,
+        }
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        """snapshot() の結果から作り直す（別プロセスの計測値をまとめるため）"""
+        hist = cls()
+        previous = 0
+        for i, bound in enumerate(BUCKETS):
+            cumulative = snap["buckets"].get(str(bound), previous)
+            hist.counts[i] = cumulative - previous
+            previous = cumulative
+        hist.counts[-1] = snap["count"] - previous
+        hist.count = snap["count"]
+        hist.errors = snap["errors"]
+        hist.sum = snap["sum"]
+        hist.min = snap.get("min", 0.0) if hist.count else None
+        hist.max = snap["max"]
+        return hist
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.errors += other.errors
+        self.sum += other.sum
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+
+class Metrics:
+    """処理名ごとのヒストグラムとカウンタ。どのスレッドから呼んでもよい"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.timings = {}
+            self.counters = {}
+            self.version = 0
+
+    def observe(self, name, seconds, ok=True):
+        with self._lock:
+            hist = self.timings.get(name)
+            if hist is None:
+                hist = self.timings[name] = Histogram()
+            hist.observe(seconds, ok)
+            self.version += 1
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            self.version += 1
+
+    @contextmanager
+    def timed(self, name):
+        """with の中の処理時間を name に記録する。例外で抜けた場合は失敗として数える"""
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.observe(name, time.perf_counter() - start, ok)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started": self.started,
+                "elapsed": round(time.time() - self.started, 3),
+                "counters": dict(self.counters),
+                "timings": {name: self.timings[name].snapshot() for name in _ordered(self.timings)},
+            }
+
+    def export(self, json_path=None, prom_path=None):
+        """JSON と Prometheus の textfile に書き出す。どちらも一時ファイルに書いてから置き換える"""
+        snapshot = self.snapshot()
+        write_snapshot(snapshot, json_path, prom_path)
+        return snapshot
+
+
+def merge_snapshots(snapshots):
+    """複数プロセス（シャード）の snapshot を 1 つにまとめる。件数・合計・バケットは足し、分位点は計算し直す"""
+    started = min(s["started"] for s in snapshots)
+    ended = max(s["started"] + s["elapsed"] for s in snapshots)
+    counters = {}
+    timings = {}
+    for snap in snapshots:
+        for name, n in snap["counters"].items():
+            counters[name] = counters.get(name, 0) + n
+        for name, t in snap["timings"].items():
+            hist = Histogram.from_snapshot(t)
+            if name in timings:
+                timings[name].merge(hist)
+            else:
+                timings[name] = hist
+    return {
+        "started": started,
+        "elapsed": round(ended - started, 3),
+        "counters": counters,
+        "timings": {name: timings[name].snapshot() for name in _ordered(timings)},
+    }
+
+
+def write_snapshot(snapshot, json_path=None, prom_path=None):
+    """snapshot を JSON と Prometheus の textfile に書き出す（Metrics.export() と同じ形式）"""
+    if json_path:
+        _write_atomic(json_path, json.dumps(snapshot, ensure_ascii=False, indent=2) + "\n")
+    if prom_path:
+        _write_atomic(prom_path, format_prometheus(snapshot))
+
+
+def _ordered(names):
+    known = [name for name in OPERATIONS if name in names]
+    return known + sorted(name for name in names if name not in OPERATIONS)
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_prometheus(snapshot):
+    """snapshot を Prometheus のテキスト形式にする"""
+    p = PROM_PREFIX
+    lines = [
+        f"# HELP {p}_operation_seconds 処理ごとの所要時間",
+        f"# TYPE {p}_operation_seconds histogram",
+    ]
+    for name, t in snapshot["timings"].items():
+        op = _label(name)
+        for bound, n in t["buckets"].items():
+            lines.append(f'{p}_operation_seconds_bucket{{op="{op}",le="{bound}"}} {n}')
+        lines.append(f'{p}_operation_seconds_bucket{{op="{op}",le="+Inf"}} {t["count"]}')
+        lines.append(f'{p}_operation_seconds_sum{{op="{op}"}} {t["sum"]}')
+        lines.append(f'{p}_operation_seconds_count{{op="{op}"}} {t["count"]}')
+    lines += [f"# HELP {p}_operation_errors_total 処理ごとの失敗数", f"# TYPE {p}_operation_errors_total counter"]
+    for name, t in snapshot["timings"].items():
+        lines.append(f'{p}_operation_errors_total{{op="{_label(name)}"}} {t["errors"]}')
+    lines += [f"# HELP {p}_events_total 件数（キャッシュのヒット・結果の状態など）", f"# TYPE {p}_events_total counter"]
+    for name, n in sorted(snapshot["counters"].items()):
+        lines.append(f'{p}_events_total{{event="{_label(name)}"}} {n}')
+    lines += [
+        f"# HELP {p}_run_start_timestamp_seconds 計測を始めた時刻",
+        f"# TYPE {p}_run_start_timestamp_seconds gauge",
+        f"{p}_run_start_timestamp_seconds {snapshot['started']:.3f}",
+        f"# HELP {p}_run_duration_seconds 計測を始めてから書き出すまでの時間",
+        f"# TYPE {p}_run_duration_seconds gauge",
+        f"{p}_run_duration_seconds {snapshot['elapsed']}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics(snapshot):
+    """統計欄・ログ用に、処理ごとの 1 行（件数・平均・p50/p95・失敗数）のリストにする"""
+    lines = []
+    for name, t in snapshot["timings"].items():
+        if not t["count"]:
+            continue
+        line = (f"{OPERATIONS.get(name, name)}: {t['count']} 件 平均 {t['sum'] / t['count'] * 1000:.1f} ms"
+                f" / p50 {t['p50'] * 1000:.1f} ms / p95 {t['p95'] * 1000:.1f} ms")
+        if t["errors"]:
+            line += f" / 失敗 {t['errors']}"
+        lines.append(line)
+    if snapshot["counters"]:
+        lines.append(", ".join(f"{k}={v}" for k, v in sorted(snapshot["counters"].items())))
+    return lines
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """共有 Metrics を返す"""
+    return _metrics
+
+
+def timed(name):
+    """共有 Metrics の timed()"""
+    return _metrics.timed(name)
@@ -0,0 +1,232 @@
+"""
+実行ジャーナル（追記専用の JSONL）。
+
+ファイルごとの取得結果・書き込み結果を、完了時点のサイズ・更新時刻と一緒に 1 行ずつ追記する。
+アプリが落ちたり中断したりした後に「続きから」実行すると、前回完了したファイルのうち
+その後変更されていないものを飛ばす。実行開始の行に書き込み設定とその ID を書き、各行には完了したときの設定 ID を残す。
+今回と設定が違うもの（上書きを有効にした、取得元を変えたなど）は飛ばさずにもう一度処理する。
+「続きから」でない実行は別のファイル（.new）に書き始め、最初の 1 件を記録した時点で差し替える。
+始めてすぐ落ちたり中断したりしても、前回のジャーナルは残る。
+
+書き込みはバッファし、BATCH_SIZE 件ごとか SYNC_INTERVAL 秒ごとにまとめて fsync する。
+落ちた場合に失うのは最後のまとまりだけで、そのファイルは次回もう一度処理される（同じ値なら書き込まない）。
+同じファイルの行が増えすぎたら、ファイルごとの最新の行だけに詰め直す（compact()）。
+"""
+import hashlib, json, os, threading, time
+
+from lookup_cache import app_dir
+from credit_core import STATUS_UPDATED, STATUS_NOT_FOUND, STATUS_MISSING_TAGS, STATUS_ERROR
+
+DEFAULT_PATH = os.path.join(app_dir(), "run_journal.jsonl")
+# GUI の監視モード用（通常の実行と履歴を消し合わないよう別のファイルにする）
+WATCH_PATH = os.path.join(app_dir(), "run_journal.watch.jsonl")
+
+BATCH_SIZE = 64
+SYNC_INTERVAL = 5.0
+# 行数がこれを超え、かつファイル数の 2 倍を超えたら詰め直す
+COMPACT_MIN_LINES = 1000
+
+# 続きから実行するときに飛ばしてよい結果（通信エラーなどはもう一度試す）
+COMPLETED_STATUSES = (STATUS_UPDATED, STATUS_NOT_FOUND, STATUS_MISSING_TAGS)
+
+# 前回と設定が違うかの比較に使うオプション
+_OPTION_KEYS = ("mode", "template", "integrate", "overwrite", "match_threshold", "credit_source")
+
+
+def _run_options(options):
+    # JSON に書いて読み直したものと比べられるよう、同じ変換をかけておく
+    return json.loads(json.dumps({key: options.get(key) for key in _OPTION_KEYS}))
+
+
+def _options_id(run_options):
+    """書き込み設定の ID（各行に設定そのものを書かずに済ませる）"""
+    text = json.dumps(run_options, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+class RunJournal:
+    """1 回の実行のジャーナル。on_result と同じスレッドから使う想定だが、ロックで保護している"""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.entries = {}        # path -> 最新の行
+        self.header = None       # 実行開始時の行（{"run": 開始時刻, "options": {...}, "options_id": ID}）
+        self.options_id = None   # 今回の書き込み設定の ID
+        self.options_changed = False
+        self.rerun = 0           # 前回完了したが設定が違うためもう一度処理するファイルの数
+        self.lines = 0
+        self._file = None
+        self._swap_pending = False  # .new に書いていて、まだ path と差し替えていない
+        self._pending = 0
+        self._synced_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def start(self, options, resume=False):
+        """
+        実行を始める。resume=True なら既存のジャーナルを読み込んで追記し、False なら空のジャーナルで始める
+        （前回のジャーナルは最初の 1 件を記録するまで残す）。
+        続きからの場合、前回と設定が違えば options_changed が True になる
+        """
+        run_options = _run_options(options)
+        self.options_id = _options_id(run_options)
+        torn = False
+        if resume:
+            torn = self._load()
+            if self.header is not None and self.header.get("options_id") != self.options_id:
+                self.options_changed = True
+            self._file = open(self.path, "a", encoding="utf-8")
+        else:
+            self._file = open(self.path + ".new", "w", encoding="utf-8")
+            self._swap_pending = True
+        if torn:
+            # 途中で切れた最後の行に続けて書かないよう改行しておく
+            self._file.write("\n")
+        self.header = {"run": time.time(), "options": run_options, "options_id": self.options_id}
+        self._write(self.header)
+        self.flush()
+
+    def _load(self):
+        """既存のジャーナルを読み込む。最後の行が改行で終わっていなければ True を返す"""
+        try:
+            f = open(self.path, encoding="utf-8")
+        except FileNotFoundError:
+            return False
+        line = ""
+        with f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 書き込み途中で落ちた最後の行
+                    continue
+                self.lines += 1
+                if "run" in entry:
+                    self.header = entry
+                elif "path" in entry:
+                    self.entries[entry["path"]] = entry
+        return bool(line) and not line.endswith("\n")
+
+    def _completed_entry(self, filepath):
+        """前回完了していて、その後サイズ・更新時刻が変わっていなければその行を返す"""
+        entry = self.entries.get(os.path.abspath(filepath))
+        if entry is None or entry.get("status") not in COMPLETED_STATUSES:
+            return None
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return None
+        if (st.st_size, st.st_mtime_ns) != (entry.get("size"), entry.get("mtime_ns")):
+            return None
+        return entry
+
+    def is_completed(self, filepath):
+        """今回と同じ設定で前回完了していて、その後サイズ・更新時刻が変わっていなければ True"""
+        entry = self._completed_entry(filepath)
+        return entry is not None and entry.get("options_id") == self.options_id
+
+    def pending(self, files):
+        """files のうち、まだ（今回と同じ設定で）完了していないものを返す"""
+        remaining = []
+        self.rerun = 0
+        for f in files:
+            entry = self._completed_entry(f)
+            if entry is None:
+                remaining.append(f)
+            elif entry.get("options_id") != self.options_id:
+                self.rerun += 1
+                remaining.append(f)
+        return remaining
+
+    def record(self, job):
+        """完了したジョブを 1 行追記する（ドライランのジョブは記録しない）"""
+        size, mtime_ns = job.data.get("stat", (None, None))
+        filepath = os.path.abspath(job.item)
+        entry = {
+            "path": filepath,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "status": STATUS_ERROR if job.error is not None else job.data.get("status", STATUS_ERROR),
+            "song_id": job.data.get("song_id"),
+            "written": list(job.data.get("changes", {})),
+            "options_id": self.options_id,
+        }
+        with self._lock:
+            self.entries[filepath] = entry
+            self._write(entry)
+            if self._swap_pending:
+                self._swap()
+            self._pending += 1
+            if self._pending >= BATCH_SIZE or time.monotonic() - self._synced_at >= SYNC_INTERVAL:
+                self._sync()
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.lines += 1
+
+    def _swap(self):
+        """.new に書いた内容で前回のジャーナルを置き換え、以降は path に追記する"""
+        self._sync()
+        self._file.close()
+        # Windows では開いたままのファイルは名前を変えられないので、閉じてから差し替えて開き直す
+        os.replace(self.path + ".new", self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._swap_pending = False
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._sync()
+
+    def compact(self):
+        """ファイルごとの最新の行と最後の実行開始行だけを残して書き直す"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            if self.header is not None:
+                f.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self.lines = len(self.entries) + (self.header is not None)
+
+    def close(self):
+        """残りを書き出して閉じる。行が増えすぎていれば詰め直す"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._sync()
+            self._file.close()
+            self._file = None
+            if self._swap_pending:
+                # 1 件も記録しなかったので、前回のジャーナルをそのまま残す
+                os.remove(self.path + ".new")
+                self._swap_pending = False
+                return
+            if self.lines > COMPACT_MIN_LINES and self.lines > 2 * len(self.entries):
+                self.compact()
+
+
+def open_run_journal(options, resume=False, path=DEFAULT_PATH):
+    """ジャーナルを開いて実行を始める。開けない場合（読み取り専用フォルダなど）は None"""
+    journal = RunJournal(path)
+    try:
+        journal.start(options, resume=resume)
+    except OSError:
+        return None
+    return journal
+
+
+def format_journal_skip(skipped, journal):
+    """続きから実行したときのログ用メッセージ"""
+    msg = f"前回完了済みで変更のない {skipped} 件をスキップします。"
+    if journal.rerun:
+        msg += f"（書き込み設定が異なる {journal.rerun} 件はもう一度処理します）"
+    elif journal.options_changed:
+        msg += "（前回と書き込み設定が異なります）"
+    return msg
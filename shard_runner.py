@@ -0,0 +1,207 @@
+"""
+シャード分割実行（大きなライブラリを複数のプロセス・マシンで分けて処理する）。
+
+ファイルの一覧をパスのハッシュ（またはボリューム＝指定したフォルダ）で決定的に N 個のシャードに分ける。
+同じフォルダ・同じ N なら、どのマシンで数えても同じファイルが同じシャードに入る（パスは指定フォルダからの相対パスで数える）。
+各シャードは専用のジャーナルを持つので、シャードごとに --resume で続きから実行できる。
+uta-net へのレート制限は全体の値を N 等分して各シャードに割り当て、合計が全体の値を超えないようにする
+（連続件数は N で割り切れない分を先頭のシャードから 1 件ずつ配り、シャードが多ければ 0 件のシャードもある）。
+
+コーディネーター（run_shards）は同じマシンでシャードごとに credit_cli.py のプロセスを起動し、
+終わったら各シャードの結果（JSONL）と計測値を 1 つにまとめる。
+別のマシンで実行したシャードの結果は merge_reports() でまとめる。
+"""
+import glob, json, os, signal, subprocess, sys, time, zlib
+
+from lookup_cache import app_dir
+from metrics import merge_snapshots
+
+SHARD_BY = ("path", "volume")
+# コーディネーターが各シャードの結果・ログ・計測値を置く場所
+DEFAULT_SHARD_DIR = os.path.join(app_dir(), "shards")
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "credit_cli.py")
+# 中断を伝えてからこの秒数待っても終わらないシャードは強制終了する（書き込み途中でも止まる最後の手段）
+STOP_GRACE = 60.0
+
+
+def parse_shard(value):
+    """'I/N'（1 始まり）を (I, N) にする"""
+    try:
+        index, count = (int(v) for v in value.split("/"))
+    except ValueError:
+        raise ValueError(f"シャードは 番号/総数 の形式で指定してください: {value}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"シャード番号は 1〜{count} で指定してください: {value}")
+    return index, count
+
+
+def shard_of(path, folders, count, by="path"):
+    """path が入るシャード番号（1 始まり）"""
+    path = os.path.abspath(path)
+    for i, folder in enumerate(folders):
+        root = os.path.join(os.path.abspath(folder), "")
+        if path.startswith(root):
+            if by == "volume":
+                return i % count + 1
+            rel = os.path.relpath(path, root).replace(os.sep, "/")
+            return zlib.crc32(rel.encode("utf-8")) % count + 1
+    return zlib.crc32(path.encode("utf-8")) % count + 1
+
+
+def select_shard(files, folders, index, count, by="path"):
+    """files のうちシャード index に入るものを返す（順序は保つ）"""
+    return [f for f in files if shard_of(f, folders, count, by) == index]
+
+
+def shard_rate(rate_limit, burst, index, count):
+    """
+    全体のレート制限 (件/秒, 連続件数) をシャード index の分にする。全シャードの連続件数の合計は burst になる。
+    連続件数が 0 のシャードはトークンを貯めず、1 件ごとに 1/件数 秒待って送る（TokenBucket）
+    """
+    return rate_limit / count, burst // count + (index <= burst % count)
+
+
+def journal_path(index, count):
+    """シャード専用のジャーナル"""
+    return os.path.join(app_dir(), f"run_journal.shard{index}-of-{count}.jsonl")
+
+
+def _shard_name(index, count):
+    return f"shard-{index}-of-{count}"
+
+
+def metrics_path(shard_dir, index, count):
+    return os.path.join(shard_dir, f"{_shard_name(index, count)}.metrics.json")
+
+
+def shard_outputs(shard_dir, index, count):
+    """shard_dir にあるシャード index の結果ファイル（古い順）"""
+    return sorted(glob.glob(os.path.join(shard_dir, f"{_shard_name(index, count)}.*.jsonl")))
+
+
+def merge_reports(paths, out):
+    """
+    結果の JSONL をまとめて out に書き出す。同じファイルの結果が複数あれば後のものを使う（続きから実行した分）。
+    状態ごとの件数を返す
+    """
+    latest = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 異常終了したシャードの書きかけの行
+                    continue
+                latest.pop(record["path"], None)
+                latest[record["path"]] = (record["status"], line if line.endswith("\n") else line + "\n")
+    counts = {}
+    for status, line in latest.values():
+        counts[status] = counts.get(status, 0) + 1
+        out.write(line)
+    return counts
+
+
+def merge_metrics(paths):
+    """各シャードの計測値（metrics.export() の JSON）を 1 つにまとめる。読めないファイルは飛ばす"""
+    snapshots = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return merge_snapshots(snapshots) if snapshots else None
+
+
+def _child_argv(argv, index, count, output, metrics_file):
+    """コーディネーターの引数から、シャード 1 つ分の credit_cli.py の引数を作る"""
+    # 出力先はシャードごとに変え、曲情報の取り込みはコーディネーターが先に済ませる
+    drop_value = {"--shards", "--shard-dir", "-o", "--output", "--metrics-json", "--metrics-prom", "--import-credits"}
+    drop_flag = {"--replace-credits"}
+    args = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        name = arg.split("=", 1)[0]
+        if name in drop_value:
+            skip = "=" not in arg
+            continue
+        if name in drop_flag:
+            continue
+        args.append(arg)
+    return [sys.executable, CLI_PATH] + args + [
+        "--shard", f"{index}/{count}", "-o", output, "--metrics-json", metrics_file]
+
+
+def run_shards(argv, count, shard_dir, resume, log, should_stop):
+    """
+    シャードごとに credit_cli.py を起動して終了を待つ。各シャードのログは shard_dir の .log に追記する。
+    続きからでなければ、前回の同じ総数のシャードの結果を消してから始める。
+    {シャード番号: 終了コード} を返す
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    if not resume:
+        for index in range(1, count + 1):
+            for path in shard_outputs(shard_dir, index, count):
+                os.remove(path)
+    # 続きから実行した分は別のファイルに書き、まとめるときに後の結果を優先する
+    stamp = time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+    procs = {}
+    for index in range(1, count + 1):
+        name = _shard_name(index, count)
+        output = os.path.join(shard_dir, f"{name}.{stamp}.jsonl")
+        log_file = open(os.path.join(shard_dir, f"{name}.log"), "a", encoding="utf-8")
+        child = _child_argv(argv, index, count, output, metrics_path(shard_dir, index, count))
+        # Windows では別のプロセスグループで起動し、CTRL_BREAK_EVENT で中断を伝えられるようにする
+        flags = subprocess.CREATE_NEW_PROCESS_GROUP if os.name == "nt" else 0
+        procs[index] = (subprocess.Popen(child, stdout=subprocess.DEVNULL, stderr=log_file, creationflags=flags),
+                        log_file)
+        log(f"シャード {index}/{count} を起動しました（pid {procs[index][0].pid}）")
+
+    codes = {}
+    forwarded = None
+    killed = False
+    while len(codes) < count:
+        if should_stop() and forwarded is None:
+            # 各シャードにも中断を伝える（書き込み中のファイルは最後まで処理される）
+            forwarded = time.monotonic()
+            for index, (proc, _) in procs.items():
+                if index not in codes:
+                    _interrupt(proc)
+        elif forwarded is not None and not killed and time.monotonic() - forwarded > STOP_GRACE:
+            killed = True
+            for index, (proc, _) in procs.items():
+                if index not in codes:
+                    log(f"シャード {index}/{count} が止まらないため強制終了します")
+                    _kill(proc)
+        for index, (proc, log_file) in procs.items():
+            if index not in codes and proc.poll() is not None:
+                codes[index] = proc.returncode
+                log_file.close()
+                log(f"シャード {index}/{count} が終了しました（終了コード {proc.returncode}）")
+        time.sleep(0.1)
+    return codes
+
+
+def _interrupt(proc):
+    """シャードに中断を伝える（シャードは Ctrl+C と同じく、書き込み中のファイルを最後まで処理してから止まる）"""
+    try:
+        if os.name == "nt":
+            # Windows の terminate() は書き込み中でも即座に終了させるので使わない
+            proc.send_signal(signal.CTRL_BREAK_EVENT)
+        else:
+            proc.send_signal(signal.SIGINT)
+    except OSError:
+        pass
+
+
+def _kill(proc):
+    try:
+        proc.terminate()
+    except OSError:
+        pass
@@ -0,0 +1,120 @@
+"""
+uta-net の候補から曲を選ぶマッチャー。
+
+候補ごとに正規化済みのタイトル・アーティストを 1 回だけ計算して Candidate に持ち、
+曲 ID で重複を除いた索引（CandidateIndex）を作る。照合は 1 つの採点関数で行う。
+
+    スコア = タイトル一致度 × アーティスト類似度
+    タイトル一致度: 完全一致 1.0 > 前方一致 0.8 > 部分一致 0.6（一致しなければ候補外）
+    アーティスト類似度: 完全一致 1.0 > 先頭 3 文字一致 0.9 > それ以外は文字列の類似度 × 0.8
+
+スコアがしきい値（既定 0.54 = 部分一致 × 先頭一致）以上の候補のうち最高点のものを採用する。
+同点なら検索結果の並び順が早いものを選ぶ。
+"""
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+TITLE_EXACT = 1.0
+TITLE_PREFIX = 0.8
+TITLE_PARTIAL = 0.6
+
+ARTIST_EXACT = 1.0
+ARTIST_PREFIX = 0.9
+ARTIST_FUZZY_WEIGHT = 0.8
+# アーティストの前方一致に使う文字数
+ARTIST_PREFIX_LEN = 3
+
+DEFAULT_THRESHOLD = TITLE_PARTIAL * ARTIST_PREFIX
+
+# 正規化済みの候補。order は検索結果での並び順
+Candidate = namedtuple("Candidate", ["song_id", "title", "artist", "ntitle", "nartist", "order"])
+# 照合結果
+Match = namedtuple("Match", ["song_id", "score", "candidate"])
+
+_CV_RE = re.compile(r"\s*\(CV[:\s][^\)]+\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(s):
+    if not s:
+        return ""
+    # CV表記削除
+    t = _CV_RE.sub("", s)
+    # 全角スペースを半角に統一
+    t = t.replace("　", " ")
+    # スペースはすべて削除
+    t = _SPACE_RE.sub("", t)
+    # 小文字化
+    return t.strip().lower()
+
+
+def title_score(ntitle, query):
+    if ntitle == query:
+        return TITLE_EXACT
+    if ntitle.startswith(query):
+        return TITLE_PREFIX
+    if query in ntitle:
+        return TITLE_PARTIAL
+    return 0.0
+
+
+def artist_score(nartist, query):
+    if nartist == query:
+        return ARTIST_EXACT
+    if nartist.startswith(query[:ARTIST_PREFIX_LEN]):
+        return ARTIST_PREFIX
+    return SequenceMatcher(None, nartist, query).ratio() * ARTIST_FUZZY_WEIGHT
+
+
+class CandidateIndex:
+    """
+    候補の索引。rows は [(曲 ID, タイトル, アーティスト), ...]（検索ページの抽出結果など）。
+    同じ曲 ID の候補は最初の 1 件だけを残す。
+    """
+
+    def __init__(self, rows):
+        self.candidates = []
+        self.by_title = {}
+        seen = set()
+        for song_id, title, artist in rows:
+            song_id = int(song_id)
+            if song_id in seen:
+                continue
+            seen.add(song_id)
+            title, artist = title.strip(), artist.strip()
+            c = Candidate(song_id, title, artist, normalize(title), normalize(artist), len(self.candidates))
+            self.candidates.append(c)
+            self.by_title.setdefault(c.ntitle, []).append(c)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def rank(self, title, artist):
+        """タイトルが一致する候補を [(スコア, Candidate), ...] の高い順で返す"""
+        qtitle, qartist = normalize(title), normalize(artist)
+        scored = []
+        for c in self.candidates:
+            ts = title_score(c.ntitle, qtitle)
+            if ts:
+                scored.append((ts * artist_score(c.nartist, qartist), c))
+        scored.sort(key=lambda sc: (-sc[0], sc[1].order))
+        return scored
+
+    def best(self, title, artist, threshold=DEFAULT_THRESHOLD):
+        """
+        (採用した Match, 最高点の Match) を返す。
+        しきい値に届く候補がなければ採用側は None、タイトルが一致する候補がなければ両方 None
+        """
+        qtitle, qartist = normalize(title), normalize(artist)
+        # タイトル・アーティストとも完全一致する候補があれば満点なので走査しない
+        for c in self.by_title.get(qtitle, ()):
+            if c.nartist == qartist:
+                m = Match(c.song_id, TITLE_EXACT * ARTIST_EXACT, c)
+                return (m if m.score >= threshold else None), m
+        ranked = self.rank(title, artist)
+        if not ranked:
+            return None, None
+        score, c = ranked[0]
+        top = Match(c.song_id, score, c)
+        return (top if score >= threshold else None), top
@@ -0,0 +1,4 @@
+import os, sys
+
+# リポジトリ直下のモジュール（credit_core など）を import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,50 @@
+from batch_resolver import ArtistBatchResolver
+from song_matcher import DEFAULT_THRESHOLD
+
+# 歌手ページの曲一覧（2 枚のアルバムの曲が混ざっている）
+LISTING = [(101, "紅蓮華"), (102, "炎"), (201, "ADAMAS"), (202, "crossing field")]
+
+
+def make_resolver():
+    searches = []
+    listings = []
+
+    def search(title, artist):
+        searches.append(title)
+        song_id = {"紅蓮華": 101, "存在しない曲": None}.get(title, 999)
+        return song_id, None, True, (7, "LiSA") if song_id else None
+
+    def fetch_listing(artist_id):
+        listings.append(artist_id)
+        return LISTING, None
+
+    return ArtistBatchResolver(search, fetch_listing, DEFAULT_THRESHOLD), searches, listings
+
+
+def test_tracks_from_other_albums_match_the_shared_listing():
+    resolver, searches, listings = make_resolver()
+    # 1 枚目のアルバムの曲で歌手 ID を調べ、2 枚目のアルバムの曲は一覧から選ぶ
+    assert resolver.resolve("紅蓮華", "LiSA")[:2] == (101, None)
+    assert resolver.resolve("ADAMAS", "LiSA")[:2] == (201, None)
+    assert resolver.resolve("crossing field", "LiSA")[:2] == (202, None)
+    # 表記ゆれのあるアーティスト名も同じグループ
+    assert resolver.resolve("炎", "lisa　")[:2] == (102, None)
+    assert searches == ["紅蓮華"]
+    assert listings == [7]
+    assert resolver.stats["local"] == 3
+
+
+def test_titles_missing_from_the_listing_fall_back_to_search():
+    resolver, searches, _ = make_resolver()
+    resolver.resolve("紅蓮華", "LiSA")
+    assert resolver.resolve("Catch the Moment", "LiSA")[0] == 999
+    assert searches == ["紅蓮華", "Catch the Moment"]
+    assert resolver.stats["searches"] == 2
+
+
+def test_artist_id_is_looked_up_again_when_the_first_search_fails():
+    resolver, searches, listings = make_resolver()
+    assert resolver.resolve("存在しない曲", "LiSA")[0] is None
+    assert listings == []
+    assert resolver.resolve("炎", "LiSA")[0] == 999
+    assert listings == [7]
@@ -0,0 +1,67 @@
+import json, os
+
+import pytest
+
+import change_plan
+from benchmarks.corpus import generate
+from change_plan import apply_plan, apply_plan_record, load_plan, plan_record
+from credit_core import STATUS_PLANNED, STATUS_STALE, STATUS_UPDATED, read_tag_snapshot
+from enrich_engine import Job
+
+
+@pytest.fixture
+def track(tmp_path, monkeypatch):
+    # 書き込んだ行をアプリのインデックスに残さない
+    monkeypatch.setattr(change_plan, "get_library_index", lambda: None)
+    return generate(str(tmp_path), 1, audio_kb=4, picture_kb=0, credited_rate=0)[0]
+
+
+def record_for(path, **changes):
+    st = os.stat(path)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "status": STATUS_PLANNED,
+            "changes": {role: {"before": "", "after": value} for role, value in changes.items()}}
+
+
+def test_plan_record_keeps_stat_and_before_values(track):
+    job = Job(0, track)
+    st = os.stat(track)
+    job.data.update(stat=(st.st_size, st.st_mtime_ns), status=STATUS_PLANNED, title="t", artist="a",
+                    before=read_tag_snapshot(track)[0], changes={"作詞者": "作詞 太郎"})
+    record = plan_record(job)
+    assert (record["size"], record["mtime_ns"]) == (st.st_size, st.st_mtime_ns)
+    assert record["changes"] == {"作詞者": {"before": "", "after": "作詞 太郎"}}
+
+
+def test_apply_writes_unchanged_files(track):
+    result, lines, row = apply_plan_record(record_for(track, 作曲者="作曲 花子", 発売年="2019"))
+    assert result["status"] == STATUS_UPDATED
+    snapshot = read_tag_snapshot(track)[0]
+    assert (snapshot.composer, snapshot.year) == ("作曲 花子", "2019")
+    assert row[4] == "作曲 花子"
+
+
+def test_apply_skips_files_changed_after_planning(track):
+    record = record_for(track, 作曲者="作曲 花子")
+    st = os.stat(track)
+    os.utime(track, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    result, lines, row = apply_plan_record(record)
+    assert result["status"] == STATUS_STALE
+    assert row is None
+    assert read_tag_snapshot(track)[0].composer == ""
+
+
+def test_apply_plan_stops_before_the_next_record(track):
+    seen = []
+    stopped = apply_plan([record_for(track, 作曲者="x")] * 3, lambda *r: seen.append(r),
+                         should_stop=lambda: len(seen) == 1)
+    assert stopped is True and len(seen) == 1
+
+
+def test_load_plan_keeps_only_records_with_changes(tmp_path, track):
+    path = tmp_path / "plan.jsonl"
+    path.write_text(json.dumps(record_for(track, 作詞者="x"), ensure_ascii=False) + "\n\n"
+                    + json.dumps(record_for(track)) + "\n", encoding="utf-8")
+    assert len(load_plan(str(path))) == 1
+    path.write_text("{壊れた行\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=":1:"):
+        load_plan(str(path))
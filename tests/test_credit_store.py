@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from credit_store import CreditStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CreditStore(str(tmp_path / "store.sqlite3"))
+    yield store
+    store.close()
+
+
+def write_csv(path, rows):
+    path.write_text("タイトル,アーティスト,作詞,作曲,発売日\n" + "".join(",".join(r) + "\n" for r in rows),
+                    encoding="utf-8")
+    return str(path)
+
+
+def test_import_counts_added_replaced_and_skipped(tmp_path, store):
+    path = write_csv(tmp_path / "a.csv", [
+        ("紅蓮華", "LiSA", "LiSA", "草野華余子", "2019/07/03"),
+        ("紅蓮華", "lisa", "LiSA", "別の作曲者", "2019/07/03"),   # 同じ曲（正規化後）なので置き換える
+        ("炎", "LiSA", "LiSA", "梶浦由記", "2020/10/14"),
+        ("", "LiSA", "", "", ""),                                    # タイトルなし
+    ])
+    assert store.import_file(path) == (2, 1, 1)
+    assert store.count() == 2
+    # もう一度取り込むと全件置き換え
+    assert store.import_file(path) == (0, 3, 1)
+    assert store.import_file(path, replace=True) == (2, 1, 1)
+    assert store.count() == 2
+
+
+def test_import_jsonl_and_progress(tmp_path, store, monkeypatch):
+    import credit_store
+    monkeypatch.setattr(credit_store, "IMPORT_BATCH", 2)
+    path = tmp_path / "a.jsonl"
+    path.write_text("\n".join(json.dumps({"title": f"曲{i}", "artist": "歌手", "composer": "作曲"}, ensure_ascii=False)
+                              for i in range(5)) + "\n", encoding="utf-8")
+    progress = []
+    assert store.import_file(str(path), on_progress=progress.append) == (5, 0, 0)
+    assert progress == [2, 4]
+
+
+def test_broken_jsonl_rolls_back(tmp_path, store):
+    path = tmp_path / "a.jsonl"
+    path.write_text('{"title": "曲", "artist": "歌手"}\n{壊れた行\n', encoding="utf-8")
+    with pytest.raises(ValueError, match=":2:"):
+        store.import_file(str(path))
+    assert store.count() == 0
+
+
+def test_lookup_matches_spacing_variants_and_prefixes(tmp_path, store):
+    store.import_file(write_csv(tmp_path / "a.csv", [("紅蓮華 (TV size)", "LiSA", "LiSA", "草野華余子", "2019/07/03")]))
+    info, song_id = store.lookup("紅蓮華　(TV size)", "ＬiSA".replace("Ｌ", "L"))
+    assert info["composer"] == "草野華余子" and info["year"] == "2019"
+    assert song_id is None
+    assert store.lookup("紅蓮華", "LiSA") is not None
+    assert store.lookup("炎", "LiSA") is None
+    assert store.stats == {"hit": 2, "miss": 1}
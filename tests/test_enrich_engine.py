@@ -0,0 +1,45 @@
+import threading
+
+from enrich_engine import EnrichPipeline, Stage
+
+
+def test_stop_during_the_last_job_is_reported():
+    started = threading.Event()
+    release = threading.Event()
+    stop = {"requested": False}
+
+    def slow(job):
+        started.set()
+        release.wait(5)
+
+    def press_stop():
+        started.wait(5)
+        stop["requested"] = True
+        release.set()
+
+    results = []
+    pipeline = EnrichPipeline([Stage("書き込み", slow)], results.append, should_stop=lambda: stop["requested"])
+    threading.Thread(target=press_stop).start()
+    # 1 件だけなので、中断が押された時点で捨てるジョブは残っていない
+    assert pipeline.run(["a.mp3"]) is True
+    assert pipeline.dropped() == 0
+    assert [job.item for job in results] == ["a.mp3"]
+
+
+def test_run_without_stop_is_not_reported_as_stopped():
+    results = []
+    pipeline = EnrichPipeline([Stage("読み込み", lambda job: None, workers=2)], results.append)
+    assert pipeline.run([f"{i}.mp3" for i in range(10)]) is False
+    assert sorted(job.index for job in results) == list(range(10))
+
+
+def test_stop_drops_jobs_that_have_not_started():
+    stop = {"requested": False}
+
+    def stage(job):
+        stop["requested"] = True
+
+    results = []
+    pipeline = EnrichPipeline([Stage("取得", stage, maxsize=1)], results.append, should_stop=lambda: stop["requested"])
+    assert pipeline.run([f"{i}.mp3" for i in range(50)]) is True
+    assert len(results) + pipeline.dropped() < 50 or pipeline.dropped() > 0
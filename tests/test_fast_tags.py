@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from benchmarks.corpus import generate
+from credit_core import apply_credit_tags, read_tag_snapshot, scan_tag_snapshot
+from fast_tags import FastTagError, read_tag_values
+
+
+@pytest.fixture(scope="module")
+def library(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("library"))
+    paths = generate(folder, 24, audio_kb=64, picture_kb=32, seed=3, credited_rate=0.5)
+    # 全ロールを書き込んだファイルも混ぜる（mp3 の TXXX / COMM、m4a の ---- atom など）
+    for path in paths[::4]:
+        apply_credit_tags(path, {"コメント": "テレビアニメ「夢」オープニングテーマ", "作詞者": "作詞 太郎",
+                                 "作曲者": "作曲 花子", "リミキサー": "編曲 次郎", "発売年": "2019"},
+                          {role: True for role in ("コメント", "作詞者", "作曲者", "リミキサー", "発売年")})
+    return paths
+
+
+def test_library_covers_every_format(library):
+    assert {os.path.splitext(p)[1] for p in library} == {".mp3", ".flac", ".m4a"}
+
+
+def test_fast_reader_matches_mutagen(library):
+    for path in library:
+        expected = tuple(read_tag_snapshot(path)[0])[:7]
+        assert read_tag_values(path) == expected, path
+
+
+def test_fast_reader_skips_pictures_and_audio(library):
+    for path in library:
+        stats = {}
+        read_tag_values(path, stats=stats)
+        # 埋め込み画像（32 KB）と音声（64 KB）は読まない（バッファ単位で読むので前後の数 KB は読む）
+        assert stats["bytes"] < os.path.getsize(path) / 3, path
+
+
+def test_unsupported_and_truncated_files_raise(tmp_path, library):
+    other = tmp_path / "a.wav"
+    other.write_bytes(b"RIFF")
+    with pytest.raises(FastTagError):
+        read_tag_values(str(other))
+    mp3 = next(p for p in library if p.endswith(".mp3"))
+    truncated = tmp_path / "cut.mp3"
+    truncated.write_bytes(open(mp3, "rb").read()[:40])
+    with pytest.raises(FastTagError):
+        read_tag_values(str(truncated))
+
+
+def test_scan_falls_back_to_mutagen(tmp_path, library, monkeypatch):
+    import credit_core
+
+    def unsupported(path):
+        raise FastTagError("扱えない構造")
+
+    monkeypatch.setattr(credit_core, "read_tag_values", unsupported)
+    path = library[0]
+    assert scan_tag_snapshot(path) == read_tag_snapshot(path)[0]
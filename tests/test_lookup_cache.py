@@ -0,0 +1,63 @@
+import pytest
+
+import lookup_cache
+from lookup_cache import LookupCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(lookup_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = LookupCache(str(tmp_path / "cache.sqlite3"), ttl=100, negative_ttl=10)
+    yield cache
+    cache.close()
+
+
+def test_search_hits_until_ttl_expires(cache, clock):
+    cache.put_search("紅蓮華", "lisa", 123, None)
+    clock.now += 99
+    assert cache.get_search("紅蓮華", "lisa") == (123, None)
+    clock.now += 2
+    assert cache.get_search("紅蓮華", "lisa") is None
+    assert cache.stats["search_hit"] == 1 and cache.stats["search_miss"] == 1
+
+
+def test_not_found_results_use_the_shorter_negative_ttl(cache, clock):
+    cache.put_search("存在しない曲", "lisa", None, "見つかりません")
+    clock.now += 9
+    assert cache.get_search("存在しない曲", "lisa") == (None, "見つかりません")
+    clock.now += 2
+    assert cache.get_search("存在しない曲", "lisa") is None
+
+
+def test_song_pages_expire_and_can_be_replaced(cache, clock):
+    info = {"lyricist": "LiSA", "composer": "草野華余子"}
+    cache.put_song(1, info, "ok")
+    assert cache.get_song(1) == (info, "ok")
+    clock.now += 101
+    assert cache.get_song(1) is None
+    cache.put_song(1, {"lyricist": "新しい値"}, "ok")
+    assert cache.get_song(1) == ({"lyricist": "新しい値"}, "ok")
+
+
+def test_entries_persist_across_instances(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    first = LookupCache(path)
+    first.put_search("夜に駆ける", "yoasobi", 5, None)
+    first.close()
+    second = LookupCache(path)
+    assert second.get_search("夜に駆ける", "yoasobi") == (5, None)
+    second.close()
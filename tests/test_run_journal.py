@@ -0,0 +1,100 @@
+import json, os
+
+import pytest
+
+from credit_core import STATUS_ERROR, STATUS_UPDATED, default_options
+from enrich_engine import Job
+from run_journal import RunJournal, format_journal_skip
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.mp3"
+        path.write_bytes(b"x" * (i + 1))
+        paths.append(str(path))
+    return paths
+
+
+def done_job(path, status=STATUS_UPDATED):
+    st = os.stat(path)
+    job = Job(0, path)
+    job.data.update(stat=(st.st_size, st.st_mtime_ns), status=status)
+    return job
+
+
+def run(journal_path, options, files, resume, completed=()):
+    journal = RunJournal(journal_path)
+    journal.start(options, resume=resume)
+    pending = journal.pending(files) if resume else list(files)
+    for path, status in completed:
+        journal.record(done_job(path, status))
+    journal.close()
+    return journal, pending
+
+
+def test_resume_skips_completed_unchanged_files(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    options = default_options()
+    run(path, options, files, False, [(files[0], STATUS_UPDATED), (files[1], STATUS_ERROR)])
+    journal, pending = run(path, options, files, True)
+    # 通信エラーなどは完了扱いにしない
+    assert pending == files[1:]
+    assert format_journal_skip(1, journal) == "前回完了済みで変更のない 1 件をスキップします。"
+
+
+def test_resume_retries_files_modified_since(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    options = default_options()
+    run(path, options, files, False, [(f, STATUS_UPDATED) for f in files])
+    with open(files[2], "ab") as f:
+        f.write(b"more")
+    assert run(path, options, files, True)[1] == files[2:]
+
+
+def test_resume_retries_files_completed_with_other_settings(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    run(path, default_options(), files, False, [(files[0], STATUS_UPDATED)])
+    changed = default_options(overwrite={"作詞者": True})
+    journal, pending = run(path, changed, files, True, [(files[1], STATUS_UPDATED)])
+    assert pending == files
+    assert journal.options_changed and journal.rerun == 1
+    # 次の続きからでも、前回の設定で完了したファイルは区別される
+    journal, pending = run(path, changed, files, True)
+    assert pending == [files[0], files[2]]
+
+
+def test_entries_carry_only_the_options_id(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    run(path, default_options(), files, False, [(files[0], STATUS_UPDATED)])
+    header, entry = [json.loads(line) for line in open(path, encoding="utf-8")]
+    assert "options" in header and "options" not in entry
+    assert entry["options_id"] == header["options_id"]
+
+
+def test_torn_last_line_is_ignored_and_not_continued(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    options = default_options()
+    run(path, options, files, False, [(files[0], STATUS_UPDATED)])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"path": "' + files[1])
+    journal, pending = run(path, options, files, True, [(files[2], STATUS_UPDATED)])
+    assert pending == files[1:]
+    lines = open(path, encoding="utf-8").read().splitlines()
+    # 切れた行の後ろに続けて書かれていない
+    assert json.loads(lines[-1])["path"] == files[2]
+    assert run(path, options, files, True)[1] == [files[1]]
+
+
+def test_fresh_run_keeps_previous_journal_until_first_record(tmp_path, files):
+    path = str(tmp_path / "j.jsonl")
+    options = default_options()
+    run(path, options, files, False, [(files[0], STATUS_UPDATED)])
+    # 1 件も記録せずに終わった実行は前回のジャーナルを消さない
+    run(path, options, files, False)
+    assert not os.path.exists(path + ".new")
+    assert run(path, options, files, True)[1] == files[1:]
+    # 記録した時点で新しいジャーナルに置き換わる
+    run(path, options, files, False, [(files[1], STATUS_UPDATED)])
+    assert run(path, options, files, True)[1] == [files[0], files[2]]
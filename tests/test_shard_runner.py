@@ -0,0 +1,71 @@
+import io, json, os, time
+
+import pytest
+
+from http_client import TokenBucket
+from shard_runner import merge_reports, parse_shard, select_shard, shard_of, shard_rate
+
+
+def library(root, n=200):
+    return [os.path.join(root, f"artist{i % 7}", f"album{i % 3}", f"{i:03d}.flac") for i in range(n)]
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("0/4", "5/4", "a/b", "3"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_shards_partition_the_library(tmp_path):
+    files = library(str(tmp_path))
+    shards = [select_shard(files, [str(tmp_path)], i, 4) for i in range(1, 5)]
+    assert sorted(f for shard in shards for f in shard) == sorted(files)
+    assert all(shards)
+
+
+def test_shard_depends_only_on_the_path_below_the_folder(tmp_path):
+    # 別のマシンで別の場所にマウントしても同じファイルは同じシャードに入る
+    a, b = str(tmp_path / "mnt" / "music"), str(tmp_path / "Volumes" / "NAS")
+    for fa, fb in zip(library(a), library(b)):
+        assert shard_of(fa, [a], 5) == shard_of(fb, [b], 5)
+
+
+def test_shard_by_volume_keeps_each_folder_together(tmp_path):
+    folders = [str(tmp_path / f"vol{i}") for i in range(3)]
+    for i, folder in enumerate(folders):
+        assert {shard_of(f, folders, 2, by="volume") for f in library(folder, 20)} == {i % 2 + 1}
+
+
+@pytest.mark.parametrize("burst", [1, 4, 7])
+@pytest.mark.parametrize("count", [1, 2, 3, 4, 8, 16])
+def test_shard_rates_add_up_to_the_global_limit(burst, count):
+    shares = [shard_rate(4.0, burst, index, count) for index in range(1, count + 1)]
+    assert sum(rate for rate, _ in shares) == pytest.approx(4.0)
+    assert sum(b for _, b in shares) == burst
+    assert all(b >= 0 for _, b in shares)
+
+
+def test_zero_burst_bucket_does_not_save_tokens_while_idle():
+    bucket = TokenBucket(50.0, 0)
+    assert bucket.acquire() == pytest.approx(0.02, abs=0.005)
+    time.sleep(0.1)
+    # 暇な間に貯めた分で即座に送ることはない
+    assert bucket.acquire() == pytest.approx(0.02, abs=0.005)
+
+
+def test_bucket_with_burst_sends_the_burst_at_once():
+    bucket = TokenBucket(50.0, 2)
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() > 0
+
+
+def test_merge_reports_prefers_later_results(tmp_path):
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    first.write_text("\n".join(json.dumps({"path": p, "status": s}) for p, s in
+                               [("x", "error"), ("y", "updated")]) + "\n", encoding="utf-8")
+    # 続きから実行した分（x をやり直した）と、異常終了で書きかけになった行
+    second.write_text(json.dumps({"path": "x", "status": "updated"}) + '\n{"path": "z"', encoding="utf-8")
+    out = io.StringIO()
+    assert merge_reports([str(first), str(second)], out) == {"updated": 2}
+    assert [json.loads(line)["path"] for line in out.getvalue().splitlines()] == ["y", "x"]
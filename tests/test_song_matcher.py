@@ -0,0 +1,48 @@
+from song_matcher import (
+    CandidateIndex, normalize, title_score, artist_score, DEFAULT_THRESHOLD,
+    TITLE_EXACT, TITLE_PREFIX, TITLE_PARTIAL, ARTIST_PREFIX,
+)
+
+
+def test_normalize_drops_cv_credit_spaces_and_case():
+    assert normalize("Ｌｅｔ　It Go (CV:松たか子)") == "ｌｅｔitgo"
+    assert normalize("") == ""
+    assert normalize(None) == ""
+
+
+def test_title_score_prefers_exact_then_prefix_then_partial():
+    assert title_score("紅蓮華", "紅蓮華") == TITLE_EXACT
+    assert title_score("紅蓮華(tvsize)", "紅蓮華") == TITLE_PREFIX
+    assert title_score("新・紅蓮華", "紅蓮華") == TITLE_PARTIAL
+    assert title_score("炎", "紅蓮華") == 0.0
+
+
+def test_artist_score_prefix_beats_fuzzy():
+    assert artist_score("lisa", "lisa") == 1.0
+    assert artist_score("lisa&aimer", "lisa") == ARTIST_PREFIX
+    assert artist_score("aimer", "lisa") < ARTIST_PREFIX
+
+
+def test_best_picks_exact_title_and_artist_over_earlier_partial_match():
+    index = CandidateIndex([
+        (1, "紅蓮華 (TV size)", "LiSA"),
+        (2, "紅蓮華", "Aimer"),
+        (3, "紅蓮華", "LiSA"),
+    ])
+    chosen, top = index.best("紅蓮華", "lisa")
+    assert chosen.song_id == 3 and chosen.score == 1.0
+    assert top is chosen
+
+
+def test_best_breaks_ties_by_search_order_and_dedupes_ids():
+    index = CandidateIndex([(5, "夜に駆ける", "YOASOBI"), (5, "夜に駆ける", "YOASOBI"), (7, "夜に駆ける", "YOASOBI")])
+    assert len(index) == 2
+    assert index.best("夜に駆ける", "YOASOBI")[0].song_id == 5
+
+
+def test_best_rejects_candidates_below_threshold_but_reports_top():
+    index = CandidateIndex([(9, "新・紅蓮華", "別の歌手")])
+    chosen, top = index.best("紅蓮華", "LiSA")
+    assert chosen is None
+    assert top.song_id == 9 and top.score < DEFAULT_THRESHOLD
+    assert index.best("存在しない曲", "LiSA") == (None, None)
@@ -0,0 +1,61 @@
+import logging
+
+from ui_queue import UIUpdateQueue
+
+
+class FakeRoot:
+    """Tk の after() の代わり。登録された関数は呼ばずに覚えておく"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+
+
+def drain(queue):
+    queue.start()
+    queue.root.scheduled.pop()()
+
+
+def test_runs_of_the_same_kind_are_batched_in_order():
+    calls = []
+    queue = UIUpdateQueue(FakeRoot(), {"log": lambda batch: calls.append(("log", batch)),
+                                       "update": lambda batch: calls.append(("update", batch))})
+    queue.put("log", "a")
+    queue.put("log", "b")
+    queue.put("update", 1, "row")
+    queue.put("log", "c")
+    drain(queue)
+    assert calls == [("log", [("a",), ("b",)]), ("update", [(1, "row")]), ("log", [("c",)])]
+    assert queue.pending() == 0
+
+
+def test_handler_errors_go_to_on_error_and_the_loop_continues():
+    errors = []
+    logged = []
+
+    def broken(batch):
+        raise ValueError("壊れた行")
+
+    queue = UIUpdateQueue(FakeRoot(), {"insert": broken, "log": logged.extend},
+                          on_error=lambda kind, text: errors.append((kind, text)))
+    queue.put("insert", 0, "x")
+    queue.put("log", "次のメッセージ")
+    drain(queue)
+    assert [kind for kind, _ in errors] == ["insert"]
+    assert "ValueError: 壊れた行" in errors[0][1]
+    assert logged == [("次のメッセージ",)]
+    # 次の取り出しも予約されている
+    assert len(queue.root.scheduled) == 1
+
+
+def test_handler_errors_are_logged_without_on_error(caplog):
+    def broken(batch):
+        raise RuntimeError("boom")
+
+    queue = UIUpdateQueue(FakeRoot(), {"call": broken})
+    queue.put("call", None)
+    with caplog.at_level(logging.ERROR, logger="ui_queue"):
+        drain(queue)
+    assert "call" in caplog.text and "RuntimeError: boom" in caplog.text
@@ -0,0 +1,167 @@
+"""
+大規模ライブラリ向けの仮想化トラック表。
+
+全行のデータはメモリ上の行ストアに持ち、ttk.Treeview には画面に見えている分の行だけを置く。
+スクロールすると表示中のアイテムの値を入れ替えるので、Treeview のアイテム数は
+ライブラリの大きさに関係なく一定になる。行はファイルパス（行 ID）から O(1) で引ける。
+"""
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTrackTable:
+    """
+    columns の各列を持つ表。行は (行 ID, 値のリスト) で管理する。
+    heading_command(列名) は列見出しクリック時に呼ばれる。
+    """
+
+    def __init__(self, parent, columns, heading_command=None, column_width=150):
+        self.columns = tuple(columns)
+        self.rows = []      # [[行 ID, 値], ...] 表示順
+        self.index = {}     # 行 ID -> rows 内の位置
+        self.top = 0        # 表示中の先頭行
+        self.visible = 1    # 表示できる行数
+        self._refresh_pending = False
+
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=self.columns, show="headings", selectmode="browse")
+        for col in self.columns:
+            if heading_command:
+                self.tree.heading(col, text=col, command=lambda c=col: heading_command(c))
+            else:
+                self.tree.heading(col, text=col)
+            self.tree.column(col, width=column_width, anchor=tk.W)
+
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self._row_height = self._lookup_row_height()
+        self.tree.bind("<Configure>", self._on_configure)
+        # Treeview 自身のスクロールは使わず、表示窓の位置を動かす
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3) or "break")
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3) or "break")
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.visible) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.visible) or "break")
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0) or "break")
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self.rows)) or "break")
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    # --- 行ストアの操作 ---
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ids(self):
+        """表示順の行 ID のリスト"""
+        return [row[0] for row in self.rows]
+
+    def exists(self, iid):
+        return iid in self.index
+
+    def get(self, iid):
+        return self.rows[self.index[iid]][1]
+
+    def clear(self):
+        self.rows = []
+        self.index = {}
+        self.top = 0
+        self._schedule_refresh()
+
+    def append_rows(self, rows):
+        """rows: [(行 ID, 値), ...] を末尾に追加する。既存の行 ID は値を更新する"""
+        for iid, values in rows:
+            pos = self.index.get(iid)
+            if pos is None:
+                self.index[iid] = len(self.rows)
+                self.rows.append([iid, values])
+            else:
+                self.rows[pos][1] = values
+        self._schedule_refresh()
+
+    def update_row(self, iid, values):
+        """行 ID の値を更新する。表示中の行ならそのアイテムだけ書き換える"""
+        pos = self.index.get(iid)
+        if pos is None:
+            return False
+        self.rows[pos][1] = values
+        if self.top <= pos < self.top + self.visible:
+            item = self._item_id(pos - self.top)
+            if self.tree.exists(item):
+                self.tree.item(item, values=values)
+        return True
+
+    def sort(self, key, reverse=False):
+        """key(値) で並べ替える"""
+        self.rows.sort(key=lambda row: key(row[1]), reverse=reverse)
+        self.index = {row[0]: pos for pos, row in enumerate(self.rows)}
+        self._schedule_refresh()
+
+    # --- 表示 ---
+
+    @staticmethod
+    def _item_id(slot):
+        return f"slot{slot}"
+
+    def _lookup_row_height(self):
+        height = ttk.Style().lookup("Treeview", "rowheight")
+        try:
+            return max(int(height), 1)
+        except (TypeError, ValueError):
+            return 20
+
+    def _on_configure(self, event):
+        # 見出し行の分を 1 行ぶん差し引いて表示できる行数を求める
+        visible = max(1, event.height // self._row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        # 同じイベントループの周回で何度呼ばれても描画は 1 回にまとめる
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            self.tree.after_idle(self._refresh)
+
+    def _refresh(self):
+        self._refresh_pending = False
+        total = len(self.rows)
+        self.top = max(0, min(self.top, total - self.visible))
+        window = self.rows[self.top:self.top + self.visible]
+        for slot, (_, values) in enumerate(window):
+            item = self._item_id(slot)
+            if self.tree.exists(item):
+                self.tree.item(item, values=values)
+            else:
+                self.tree.insert("", tk.END, iid=item, values=values)
+        # 余ったアイテムを削除する（行数が減った・表示行数が減った場合）
+        extra = [self._item_id(slot) for slot in range(len(window), len(self.tree.get_children()))]
+        if extra:
+            self.tree.delete(*extra)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top):
+        self.top = max(0, min(int(top), len(self.rows) - self.visible))
+        self._refresh()
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.top + delta)
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        # Windows は 120 単位、macOS は 1 単位で delta が来る
+        delta = event.delta if abs(event.delta) < 120 else event.delta // 120
+        self.scroll_by(-3 * delta)
+        return "break"
@@ -0,0 +1,101 @@
+"""
+ワーカースレッドからの UI 更新をまとめて反映するキュー。
+
+ワーカーは put() で更新内容を積むだけで、Tk には一切触れない。
+メインスレッドがタイマーでキューを取り出し、同じ種類の更新が続く分をまとめて
+ハンドラに渡す（TreeView の行挿入やログ追記を 1 回の呼び出しで処理できる）。
+1 回の取り出しにかける時間がフレーム予算に収まるよう、件数と間隔を自動調整する。
+ハンドラの例外は on_error（GUI ではログ欄）に渡す。.pyw では標準エラー出力が見えないため。
+"""
+import logging, time, traceback
+from collections import deque
+
+_log = logging.getLogger(__name__)
+
+
+class UIUpdateQueue:
+    """
+    handlers: {種類: callable(引数タプルのリスト)}
+    on_error(種類, トレースバックの文字列) はハンドラが例外を出したときにメインスレッドで呼ばれる
+    （省略時や on_error 自体が失敗した場合は logging に出す）。
+    put(種類, *引数) はどのスレッドから呼んでもよい。
+    """
+
+    FRAME_BUDGET = 0.015    # 1 回の反映にかける最大時間（秒）
+    BUSY_INTERVAL = 10      # キューが残っている間の呼び出し間隔（ミリ秒）
+    IDLE_INTERVAL = 50      # キューが空のときの呼び出し間隔（ミリ秒）
+    MIN_BATCH = 50
+    MAX_BATCH = 20000
+
+    def __init__(self, root, handlers, on_error=None):
+        self.root = root
+        self.handlers = handlers
+        self.on_error = on_error
+        self.batch = 500
+        self.interval = self.IDLE_INTERVAL
+        # deque の append / popleft はスレッドセーフ
+        self._queue = deque()
+        self._running = False
+
+    def put(self, kind, *args):
+        self._queue.append((kind, args))
+
+    def start(self):
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        self._running = False
+
+    def pending(self):
+        return len(self._queue)
+
+    def _drain(self):
+        if not self._running:
+            return
+        start = time.perf_counter()
+        taken = 0
+        run_kind, run_args = None, []
+        while taken < self.batch and self._queue:
+            kind, args = self._queue.popleft()
+            taken += 1
+            if kind != run_kind and run_args:
+                self._dispatch(run_kind, run_args)
+                run_args = []
+            run_kind = kind
+            run_args.append(args)
+            # 重いハンドラが続いたときに予算を大きく超えないよう途中でも確認する
+            if taken % 256 == 0 and time.perf_counter() - start > self.FRAME_BUDGET:
+                break
+        if run_args:
+            self._dispatch(run_kind, run_args)
+        self._adapt(time.perf_counter() - start, taken)
+        self.root.after(self.interval, self._drain)
+
+    def _dispatch(self, kind, args_list):
+        try:
+            self.handlers[kind](args_list)
+        except Exception:
+            # UI 更新の失敗で取り出しループ自体が止まらないようにする
+            if self.on_error is None:
+                _log.exception("UI の更新に失敗しました（%s）", kind)
+                return
+            try:
+                self.on_error(kind, traceback.format_exc())
+            except Exception:
+                _log.exception("UI の更新に失敗しました（%s）", kind)
+
+    def _adapt(self, elapsed, taken):
+        """処理時間に応じて次回の件数と間隔を調整する"""
+        if not self._queue:
+            self.interval = self.IDLE_INTERVAL
+            return
+        if elapsed > self.FRAME_BUDGET:
+            # 予算超過: 件数を減らし、イベントループに描画・入力処理の時間を渡す
+            self.batch = max(self.MIN_BATCH, self.batch // 2)
+            self.interval = min(self.IDLE_INTERVAL, self.interval * 2)
+        else:
+            if taken >= self.batch and elapsed < self.FRAME_BUDGET / 2:
+                self.batch = min(self.MAX_BATCH, self.batch * 2)
+            self.interval = self.BUSY_INTERVAL
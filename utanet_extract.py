@@ -0,0 +1,197 @@
+"""
+uta-net の検索ページ・曲ページからの抽出（受信しながら解析する）。
+
+パターンはモジュール読み込み時に一度だけコンパイルする。
+抽出器は HttpClient.get(url, consumer=...) に渡すと受信したチャンクごとに feed() され、
+必要な部分（検索結果の表・曲ページの詳細ブロック）を読み終えた時点で受信を打ち切らせる。
+HTML 全体が手元にある場合は extract_search_rows() / extract_song_info() を使う。
+どちらの経路でも結果は同じになる。
+"""
+import codecs, html, re
+
+SEARCH_ROW_RE = re.compile(
+    r'(?si)<tr[^>]*class="border-bottom"[^>]*>.*?'
+    r'/song/(\d+)/".*?songlist-title[^>]*>([^<]+)</span>.*?'
+    r'/artist/\d+/"[^>]*>([^<]+)</a>'
+)
+# 検索結果・曲一覧の行の終わり（これ以降に候補の行はない）
+SEARCH_TABLE_END_RE = re.compile(r"(?i)</tbody>|</table>")
+# 候補行の末尾にある歌手ページへのリンク（歌手 ID）
+ARTIST_LINK_RE = re.compile(r'/artist/(\d+)/"[^>]*>[^<]+</a>\Z')
+# 歌手ページの曲一覧の行（歌手名の列はない）
+ARTIST_SONG_ROW_RE = re.compile(
+    r'(?si)<tr[^>]*class="border-bottom"[^>]*>.*?'
+    r'/song/(\d+)/".*?songlist-title[^>]*>([^<]+)</span>'
+)
+
+ANIME_RE = re.compile(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+mb-0[^"]*"[^>]*>(.*?)</p>')
+DETAIL_RE = re.compile(r'(?s)<p[^>]*class="[^"]*ms-2\s+ms-md-3\s+detail\s+mb-0[^"]*"[^>]*>(.*?)</p>')
+# 歌詞の表示領域。タイアップ・詳細ブロックはこれより前にある
+LYRICS_AREA_RE = re.compile(r'id="kashi_area"')
+
+TAG_RE = re.compile(r"<[^>]+>")
+SPACE_RE = re.compile(r"\s+")
+LYRICIST_RE = re.compile(r"作詞：\s*(.+?)(?=\s*(作曲：|編曲：|発売日：|$))")
+COMPOSER_RE = re.compile(r"作曲：\s*(.+?)(?=\s*(作詞：|編曲：|発売日：|$))")
+ARRANGER_RE = re.compile(r"編曲：\s*(.+?)(?=\s*(作詞：|作曲：|発売日：|$))")
+RELEASE_RE = re.compile(r"発売日：\s*([0-9]{4})/([0-9]{2})/([0-9]{2})")
+
+
+def extract_search_rows(html_text):
+    """検索ページの候補行を [(曲 ID, タイトル, アーティスト), ...] で返す（文字列はすべて未加工）"""
+    return SEARCH_ROW_RE.findall(html_text)
+
+
+def extract_artist_songs(html_text):
+    """歌手ページの曲一覧を [(曲 ID, タイトル), ...] で返す"""
+    return ARTIST_SONG_ROW_RE.findall(html_text)
+
+
+def parse_song_info(anime_html, detail_html):
+    """タイアップと詳細ブロックの HTML（なければ None）から info 辞書を作る"""
+    info = {"anime": "", "lyricist": "", "composer": "", "arranger": ""}
+
+    # アニメ情報
+    if anime_html is not None:
+        info["anime"] = SPACE_RE.sub(" ", html.unescape(anime_html)).strip()
+
+    # 詳細情報 (作詞・作曲・編曲・発売日)
+    text = ""
+    if detail_html is not None:
+        text = TAG_RE.sub(" ", detail_html)
+        text = SPACE_RE.sub(" ", html.unescape(text)).strip()
+
+    m = LYRICIST_RE.search(text)
+    if m:
+        info["lyricist"] = m.group(1).strip()
+    m = COMPOSER_RE.search(text)
+    if m:
+        info["composer"] = m.group(1).strip()
+    m = ARRANGER_RE.search(text)
+    if m:
+        info["arranger"] = m.group(1).strip()
+
+    m = RELEASE_RE.search(text)
+    if m:
+        info["release_date"] = m.group(0).replace("発売日：", "").strip()
+        info["year"] = m.group(1)
+    else:
+        info["release_date"] = ""
+        info["year"] = ""
+    return info
+
+
+def extract_song_info(html_text):
+    anime = ANIME_RE.search(html_text)
+    detail = DETAIL_RE.search(html_text)
+    return parse_song_info(anime and anime.group(1), detail and detail.group(1))
+
+
+class _StreamExtractor:
+    """
+    受信したバイト列を文字列に復号しながら溜め、scan() で必要な部分を読み終えたか判定する。
+    feed(resp, chunk) が True を返したら、それ以降のボディは不要。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._decoder = None
+
+    def feed(self, resp, chunk):
+        if self._decoder is None:
+            # requests の resp.text と同じ文字コードを使う（ヘッダに指定がなければ UTF-8）
+            self._decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")("replace")
+        self.text += self._decoder.decode(chunk)
+        self.done = self.scan()
+        return self.done
+
+    def reset(self):
+        """再試行の前に呼ばれる。途中まで受信した内容を捨てて最初からやり直す"""
+        self.__init__()
+
+    def finish(self):
+        """ボディを最後まで受信した（または打ち切った）後に呼ぶ"""
+        if self._decoder is not None and not self.done:
+            self.text += self._decoder.decode(b"", final=True)
+        self.scan()
+
+    def scan(self):
+        raise NotImplementedError
+
+
+class _TableExtractor(_StreamExtractor):
+    """row_re の行を受信しながら取り出す。行を読んだ後に表の本体が閉じた時点で打ち切る"""
+
+    row_re = None
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._pos = 0
+
+    def scan(self):
+        while True:
+            m = self.row_re.search(self.text, self._pos)
+            if not m:
+                break
+            self.add_row(m)
+            self._pos = m.end()
+        # 行が 1 件もないうちは表の終わりを判定できないので最後まで読む
+        return bool(self.rows) and SEARCH_TABLE_END_RE.search(self.text, self._pos) is not None
+
+    def add_row(self, m):
+        self.rows.append(m.groups())
+
+
+class SearchPageExtractor(_TableExtractor):
+    """
+    検索ページの候補行を受信しながら取り出す。結果の表を閉じた時点で打ち切る。
+    artist_ids には {曲 ID: 歌手 ID} を記録する（歌手ページの一覧取得に使う）
+    """
+
+    row_re = SEARCH_ROW_RE
+
+    def __init__(self):
+        super().__init__()
+        self.artist_ids = {}
+
+    def add_row(self, m):
+        super().add_row(m)
+        link = ARTIST_LINK_RE.search(m.group(0))
+        if link:
+            self.artist_ids.setdefault(int(m.group(1)), int(link.group(1)))
+
+
+class ArtistPageExtractor(_TableExtractor):
+    """歌手ページの曲一覧を [(曲 ID, タイトル), ...] で取り出す"""
+
+    row_re = ARTIST_SONG_ROW_RE
+
+
+class SongPageExtractor(_StreamExtractor):
+    """
+    曲ページのタイアップと詳細ブロックを受信しながら取り出す。
+    詳細ブロックを読み終え、タイアップも見つかった（または歌詞の領域に入った）時点で打ち切る。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.anime = None
+        self.detail = None
+
+    def scan(self):
+        if self.anime is None:
+            m = ANIME_RE.search(self.text)
+            if m:
+                self.anime = m.group(1)
+        if self.detail is None:
+            m = DETAIL_RE.search(self.text)
+            if m:
+                self.detail = m.group(1)
+        if self.detail is None:
+            return False
+        return self.anime is not None or LYRICS_AREA_RE.search(self.text) is not None
+
+    def info(self):
+        return parse_song_info(self.anime, self.detail)